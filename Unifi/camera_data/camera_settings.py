@@ -1,38 +1,94 @@
 import json
 import os
+import asyncio
 import sys
+import atexit
 import socket
 import threading
 import logging
-import urllib.request
-import urllib.error
+import time
+from types import MappingProxyType
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from .camera_models import CameraModelDatabase
+from .settings_writer import SettingsWriter
+from .settings_snapshot import SettingsSnapshot, freeze, split_key, thaw
+from .settings_subscriptions import SubscriptionRegistry, Subscription
+from .firmware_lookup import FirmwareLookup
+
+
+def _derive_uptime(get):
+    """Seconds elapsed since `upSince` (epoch ms), 0 if not seeded yet."""
+    up_since = get("upSince")
+    if not up_since:
+        return 0
+    return max(0, int((time.time() * 1000 - up_since) / 1000))
+
 
 class CameraSettings:
-    def __init__(self, settings_file=None, logger=None):
+    # Runtime-only keys: live in memory, never written to settings.json
+    VOLATILE_KEYS = frozenset({"upSince", "lastSeen", "connectedSince"})
+
+    # Read-only keys computed on access from other settings
+    DERIVED_KEYS = {
+        "uptime": _derive_uptime,
+    }
+
+    def __init__(self, settings_file=None, logger=None, flush_interval=None, firmware_lookup=None):
         self.logger = logger or logging.getLogger(__name__)
         self.logger.setLevel(logging.NOTSET)
         self._lock = threading.RLock()
         self.settings_file = settings_file or os.path.join(os.path.dirname(__file__), "settings.json")
         self.settings = {}
+        self._volatile = {}
         self._dirty = False
 
+        # Copy-on-write read side: writers publish a new frozen snapshot,
+        # readers grab the current reference without locking.
+        self._version = 0
+        self._frozen = {}                 # top-level key -> frozen value
+        self._changed = set()             # dotted keys changed since last publish
+        self._snapshot = SettingsSnapshot(0, MappingProxyType({}), {}, self.VOLATILE_KEYS, self.DERIVED_KEYS)
+        self._subscriptions = SubscriptionRegistry(self.logger)
+
+        # Write-behind persistence: changes are coalesced and flushed every
+        # SETTINGS_FLUSH_INTERVAL seconds (<= 0 writes through synchronously).
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("SETTINGS_FLUSH_INTERVAL", "2.0"))
+        self._writer = SettingsWriter(self.settings_file, self._serialize, flush_interval, self.logger)
+
         self._load_or_initialize()
         self._get_ip_address()
         self._get_mac_address()
         self._ensure_platform_and_sysid()
+        # Firmware lookup never blocks startup: use the cached/persisted
+        # version now and refresh it in the background.
         status = os.environ.get("FIRMWARE_STATUS", "GA")  # GA | RC | EA | ALL
-        self._update_latest_firmware_version(status=status)
+        self._firmware_lookup = firmware_lookup or FirmwareLookup(
+            os.path.join(os.path.dirname(self.settings_file), "firmware_cache.json"),
+            status=status, logger=self.logger,
+        )
+        cached = self._firmware_lookup.cached(allow_stale=not self.settings.get("firmwareVersion"))
+        if cached:
+            self._update_latest_firmware_version(cached)
         if self._dirty:
             self._save()
+        self._publish(full=True)
+        self._writer.flush()
+        if not self._writer.write_through:
+            self._writer.start()
+        atexit.register(self.close)
+        self._firmware_lookup.start(self._on_firmware_lookup)
 
     def _load_or_initialize(self):
         if os.path.exists(self.settings_file):
             with open(self.settings_file, "r") as f:
                 self.settings = json.load(f)
             self.logger.info("Loaded existing settings from %s", self.settings_file)
+            # Older versions persisted runtime values; drop them from disk
+            for key in self.VOLATILE_KEYS.union(self.DERIVED_KEYS):
+                if self.settings.pop(key, None) is not None:
+                    self._dirty = True
         else:
             self.logger.info("Creating default settings...")
             self.settings = self._default_settings()
@@ -93,115 +149,25 @@ class CameraSettings:
                 self.logger.error(f"Failed to get IP address: {e}")
                 sys.exit(1)
 
-    def _update_latest_firmware_version(self, status="GA"):
-        """Set settings['firmwareVersion'] to the latest version string (e.g., '5.1.34')."""
-        info = self._fetch_latest_camera_firmware_api(status=status)
+    def _update_latest_firmware_version(self, info):
+        """Set settings['firmwareVersion'] to the looked-up version string (e.g., '5.1.34')."""
         if not info or not info.get("version"):
-            self.logger.info("Latest camera firmware: unavailable via API")
             return False
         version = str(info["version"])
-        if self._set_nested_value("firmwareVersion", version, overwrite_non_dict=True):
-            self.logger.info("Latest camera firmware: %s", version)
-            return True
+        with self._lock:
+            if self._set_nested_value("firmwareVersion", version, overwrite_non_dict=True):
+                self.logger.info("Latest camera firmware: %s", version)
+                return True
         return False
 
-    def _fetch_latest_camera_firmware_api(self, status="GA", limit=10, timeout=5.0):
-        """Return {'version','url','stage'} for latest Protect *Cameras* release, preferring `status` stage."""
-        preferred_stage = (status or "GA").upper()
-        api_url = "https://community.svc.ui.com/graphql"
-
-        query = (
-            "query ReleaseFeedListQuery($tags:[String!],$betas:[String!],$alphas:[String!],"
-            "$offset:Int,$limit:Int,$sortBy:ReleasesSortBy,$userIsFollowing:Boolean,$featuredOnly:Boolean,"
-            "$searchTerm:String,$filterTags:[String!],$filterEATags:[String!]){"
-            "releases(tags:$tags,betas:$betas,alphas:$alphas,offset:$offset,limit:$limit,sortBy:$sortBy,"
-            "userIsFollowing:$userIsFollowing,featuredOnly:$featuredOnly,searchTerm:$searchTerm,"
-            "filterTags:$filterTags,filterEATags:$filterEATags){pageInfo{offset limit}totalCount "
-            "items{id title slug tags stage version createdAt lastActivityAt}}}"
-        )
-
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Accept-Encoding": "identity",  # avoid br/gzip; urllib can't decode br
-            "Origin": "https://community.ui.com",
-            "Referer": "https://community.ui.com/RELEASES",
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) CameraSettings/1.0",
-        }
-
-        # progressively loosen filters
-        var_candidates = [
-            # Tightest: Protect + Cameras + search
-            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
-            "tags": ["unifi-protect"], "betas": [], "alphas": [],
-            "searchTerm": "camera", "filterTags": ["cameras"]},
-            # Drop filterTags
-            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
-            "tags": ["unifi-protect"], "betas": [], "alphas": [],
-            "searchTerm": "camera"},
-            # Only tag
-            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
-            "tags": ["unifi-protect"], "betas": [], "alphas": []},
-            # No tags, search by title keyword
-            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
-            "betas": [], "alphas": [], "searchTerm": "UniFi Protect Cameras"},
-            # Absolute fallback: no filters
-            {"limit": int(limit), "offset": 0, "sortBy": "LATEST"},
-        ]
-
-        def post_one(variables):
-            payload = {"query": query, "variables": variables, "operationName": "ReleaseFeedListQuery"}
-            req = urllib.request.Request(api_url, data=json.dumps(payload).encode("utf-8"),
-                                        method="POST", headers=headers)
-            with urllib.request.urlopen(req, timeout=timeout) as resp:
-                body = resp.read().decode("utf-8", "ignore")
-            try:
-                data = json.loads(body)
-            except json.JSONDecodeError:
-                self.logger.warning("Firmware API: non-JSON (head): %r", body[:300])
-                return []
-            if "errors" in data:
-                self.logger.warning("Firmware API: GraphQL errors: %s",
-                                    "; ".join(e.get("message", "?") for e in data["errors"]))
-                return []
-            items = (data.get("data") or {}).get("releases", {}).get("items", []) or []
-            if not items:
-                self.logger.debug("Firmware API: 0 items for vars=%s (totalCount=%s)",
-                                variables, (data.get("data") or {}).get("releases", {}).get("totalCount"))
-            return items
-
-        # try candidates until we get anything
-        items = []
-        for vars_ in var_candidates:
-            items = post_one(vars_)
-            if items:
-                break
-        if not items:
-            return None
-
-        # Prefer the "UniFi Protect Cameras" family, then prefer stage, then newest by version/createdAt
-        def is_cameras(item):
-            t = (item.get("title") or "").lower()
-            s = (item.get("slug") or "").lower()
-            return "unifi protect cameras" in t or "unifi-protect-cameras" in s or "cameras" in t
-
-        cam_items = [it for it in items if is_cameras(it)] or items
-        prefer_stage = [it for it in cam_items if (it.get("stage") or "").upper() == preferred_stage] or cam_items
-
-        def parse_semver(v):
-            try:
-                a, b, c = (v or "0.0.0").split(".")[:3]
-                return (int(a), int(b), int(c))
-            except Exception:
-                return (0, 0, 0)
-
-        picked = max(prefer_stage, key=lambda it: (parse_semver(it.get("version")), it.get("lastActivityAt") or ""))
-        version = picked.get("version")
-        if not version:
-            return None
-        slug = picked.get("slug")
-        url_page = f"https://community.ui.com/releases/{slug}" if slug else None
-        return {"version": version, "url": url_page, "stage": picked.get("stage")}
+    def _on_firmware_lookup(self, info):
+        """Background lookup result: apply, persist and notify subscribers."""
+        with self._lock:
+            self._update_latest_firmware_version(info)
+            if self._dirty:
+                self._save()
+            changed, snap = self._publish()
+        self._subscriptions.notify(changed, snap)
 
     def _default_settings(self):
         return {
@@ -217,60 +183,69 @@ class CameraSettings:
                 "level": "INFO",          # a root/fallback level
                 "api": { "level": "DEBUG" },
                 "discovery": { "level": "INFO" },
-                "uptime": { "level": "INFO" },
                 "wss": { "level": "DEBUG" }
             }
         }
 
+    def snapshot(self) -> SettingsSnapshot:
+        """
+        Lock-free, immutable view of the current settings. Prefer this when a
+        caller reads several keys that should be consistent with each other.
+
+        Usage:
+            s = settings.snapshot()
+            mac, host = s.get("mac"), s.get("host")
+        """
+        return self._snapshot
+
     def __getitem__(self, key):
         """
-        Thread-safe read access to a (possibly nested) setting.
+        Lock-free read access to a (possibly nested) setting.
+        Subtrees come back as plain dicts/lists the caller owns.
         
         Usage:
             mac = settings["uplinkDevice.mac"]
         """
-        with self._lock:
-            value = self._get_nested_value(key, default=None)
-            if value is None and not self.__contains__(key):
-                raise KeyError(key)
-            return value
+        return thaw(self._snapshot[key])
 
     def __setitem__(self, key, value):
         """
-        Thread-safe write access to a (possibly nested) setting. Automatically persists to disk.
+        Thread-safe write access to a (possibly nested) setting. Persisted by the write-behind writer.
 
         Usage:
             settings["uplinkDevice.mac"] = "00:11:22:33:44:55"
         """
         with self._lock:
-            if self._set_nested_value(key, value):
+            self._set_nested_value(key, value)
+            if self._dirty:
                 self._save()
+            changed, snap = self._publish()
+        self._subscriptions.notify(changed, snap)
 
     def __contains__(self, key):
         """
-        Thread-safe key existence check for nested keys.
+        Lock-free key existence check for nested keys.
 
         Usage:
             if "uplinkDevice.mac" in settings:
                 ...
         """
-        with self._lock:
-            return self._get_nested_value(key, default=None) is not None
+        return key in self._snapshot
 
     def get(self, key, default=None):
         """
-        Thread-safe retrieval with fallback for nested keys.
+        Lock-free retrieval with fallback for nested keys.
+        Subtrees come back as plain dicts/lists the caller owns.
 
         Usage:
             mac = settings.get("uplinkDevice.mac", "00:00:00:00:00:00")
         """
-        with self._lock:
-            return self._get_nested_value(key, default)
+        return thaw(self._snapshot.get(key, default))
 
     def update(self, updates: dict):
         """
         Thread-safe bulk update (flat keys only).
-        Automatically persists to disk.
+        Persisted by the write-behind writer (volatile keys stay in memory).
 
         Usage:
             settings.update({
@@ -279,31 +254,132 @@ class CameraSettings:
             })
         """
         with self._lock:
-            changed = False
             for k, v in updates.items():
-                changed |= self._set_nested_value(k, v)
-            if changed:
+                self._set_nested_value(k, v)
+            if self._dirty:
                 self._save()
+            changed, snap = self._publish()
+        self._subscriptions.notify(changed, snap)
+
+    def subscribe(self, pattern: str, callback) -> Subscription:
+        """
+        Call `callback(changed_keys, snapshot)` whenever a key under `pattern`
+        changes. Callbacks run on the writing thread, outside the lock.
+
+        Usage:
+            sub = settings.subscribe("mgmt.*", lambda keys, snap: event.set())
+            ...
+            sub.cancel()
+        """
+        return self._subscriptions.subscribe(pattern, callback)
+
+    async def wait_for(self, pattern: str, predicate=None, timeout=None) -> SettingsSnapshot:
+        """
+        Await the next change under `pattern` (asyncio-friendly).
+        With a `predicate(snapshot)`, return as soon as it holds, including
+        immediately if it already does. Raises asyncio.TimeoutError on timeout.
+
+        Usage:
+            snap = await settings.wait_for("mgmt.*", lambda s: s.get("mgmt.token"))
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def _resolve(snap):
+            if not fut.done():
+                fut.set_result(snap)
+
+        def _on_change(keys, snap):
+            if predicate is None or predicate(snap):
+                loop.call_soon_threadsafe(_resolve, snap)
+
+        sub = self.subscribe(pattern, _on_change)
+        try:
+            snap = self._snapshot
+            if predicate is not None and predicate(snap):
+                return snap
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            sub.cancel()
 
     def _get_nested_value(self, dotted_key, default=None):
         """Internal helper to retrieve nested values using dot-notation."""
-        keys = dotted_key.split(".")
+        derive = self.DERIVED_KEYS.get(dotted_key)
+        if derive is not None:
+            return derive(self._get_nested_value)
+        if dotted_key in self.VOLATILE_KEYS:
+            return self._volatile.get(dotted_key, default)
         value = self.settings
-        for key in keys:
+        for key in split_key(dotted_key):
             if not isinstance(value, dict) or key not in value:
                 return default
             value = value[key]
         return value
 
+    def _publish(self, full=False):
+        """
+        Publish a new snapshot reflecting the changes made since the last one.
+        Return (changed_keys, snapshot) for subscriber notification.
+        """
+        with self._lock:
+            if not full and not self._changed:
+                return (), self._snapshot
+            if full:
+                self._frozen = {k: freeze(v) for k, v in self.settings.items()}
+            else:
+                for top in {split_key(k)[0] for k in self._changed if k not in self.VOLATILE_KEYS}:
+                    if top in self.settings:
+                        self._frozen[top] = freeze(self.settings[top])
+                    else:
+                        self._frozen.pop(top, None)
+            changed = tuple(self._changed)
+            self._changed.clear()
+            self._version += 1
+            self._snapshot = SettingsSnapshot(
+                self._version,
+                MappingProxyType(dict(self._frozen)),
+                dict(self._volatile),
+                self.VOLATILE_KEYS,
+                self.DERIVED_KEYS,
+            )
+            return changed, self._snapshot
+
     def _save(self):
+        """Schedule a write of the current settings (coalesced by the writer)."""
         with self._lock:
-            with open(self.settings_file, "w") as f:
-                json.dump(self.settings, f, indent=4)
             self._dirty = False
+        self._writer.mark_dirty()
+
+    def _serialize(self) -> str:
+        with self._lock:
+            return json.dumps(self.settings, indent=4)
+
+    def flush(self):
+        """Synchronously persist any pending changes."""
+        self._writer.flush()
+
+    def close(self):
+        """Stop the background writer and flush pending changes (idempotent)."""
+        self._writer.stop()
+
+    def persistence_stats(self) -> dict:
+        """Write-count and flush-latency counters of the write-behind writer."""
+        return self._writer.stats()
 
     def _set_nested_value(self, dotted_key, value, overwrite_non_dict=False) -> bool:
-        """Set nested value using dot-notation. Return True if it changed."""
-        keys = dotted_key.split(".")
+        """Set nested value using dot-notation. Return True if it changed.
+
+        Volatile keys are kept in memory only and never mark the settings dirty.
+        """
+        if dotted_key in self.DERIVED_KEYS:
+            raise TypeError(f"'{dotted_key}' is derived and cannot be set")
+        if dotted_key in self.VOLATILE_KEYS:
+            if dotted_key in self._volatile and self._volatile[dotted_key] == value:
+                return False
+            self._volatile[dotted_key] = value
+            self._changed.add(dotted_key)
+            return True
+        keys = split_key(dotted_key)
         d = self.settings
         for key in keys[:-1]:
             cur = d.get(key)
@@ -321,40 +397,27 @@ class CameraSettings:
             return False
         d[last] = value
         self._dirty = True
+        self._changed.add(dotted_key)
         return True
 
     def mac_bytes(self, key="mac"):
         """
         Returns the MAC address (from key path) as raw bytes.
-        Returns None if value is missing or malformed.
+        Raises RuntimeError if value is missing or malformed.
 
         Usage:
             settings.mac_bytes("mac")
             settings.mac_bytes("uplinkDevice.mac")
         """
-        with self._lock:
-            mac_str = self._get_nested_value(key)
-        if not mac_str:
-            raise RuntimeError("MAC address is missing in settings.")
-        try:
-            return bytes.fromhex(mac_str.replace(":", ""))
-        except ValueError:
-            raise RuntimeError(f"Malformed MAC address: {mac_str!r}")
+        return self._snapshot.mac_bytes(key)
 
     def ip_bytes(self, key="host"):
         """
         Returns the IP address (from key path) as raw bytes.
-        Returns None if value is missing or malformed.
+        Raises RuntimeError if value is missing or malformed.
 
         Usage:
             settings.ip_bytes("host")
             settings.ip_bytes("wifiConnectionState.apMgmtIp")
         """
-        with self._lock:
-            ip_str = self._get_nested_value(key)
-        if not ip_str:
-            raise RuntimeError("IP address is missing in settings.")
-        try:
-            return socket.inet_aton(ip_str)
-        except OSError:
-            raise RuntimeError(f"Malformed IP address: {ip_str!r}")
\ No newline at end of file
+        return self._snapshot.ip_bytes(key)
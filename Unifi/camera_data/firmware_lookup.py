@@ -0,0 +1,196 @@
+import json
+import os
+import time
+import threading
+import logging
+import urllib.request
+
+
+def _urllib_post_json(url: str, payload: dict, headers: dict, timeout: float) -> str:
+    """Default transport: POST `payload` as JSON and return the response body as text."""
+    req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                 method="POST", headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read().decode("utf-8", "ignore")
+
+
+class FirmwareLookup:
+    """
+    Latest Protect camera firmware lookup with an on-disk TTL cache.
+
+    The GraphQL release feed is queried on a background thread so startup
+    never waits on the network; CameraSettings keeps using the cached or
+    persisted firmwareVersion until the lookup reports a newer one.
+
+    ENV overrides
+      FIRMWARE_API_URL="http://127.0.0.1:8080/graphql" → use a local stand-in endpoint
+      FIRMWARE_CACHE_TTL=21600 → seconds a cached result stays fresh (0 = always refetch)
+    """
+
+    DEFAULT_API_URL = "https://community.svc.ui.com/graphql"
+    DEFAULT_TTL_S = 6 * 3600
+
+    def __init__(self, cache_file, status="GA", api_url=None, ttl_s=None,
+                 post=None, timeout=5.0, logger=None):
+        self.cache_file = cache_file
+        self.status = (status or "GA").upper()
+        self.api_url = api_url or os.environ.get("FIRMWARE_API_URL") or self.DEFAULT_API_URL
+        if ttl_s is None:
+            ttl_s = float(os.environ.get("FIRMWARE_CACHE_TTL", self.DEFAULT_TTL_S))
+        self.ttl_s = float(ttl_s)
+        self.timeout = timeout
+        self.log = logger or logging.getLogger(__name__)
+        self._post = post or _urllib_post_json     # (url, payload, headers, timeout) -> body text
+        self._thread = None
+
+    # -------------------- cache --------------------
+
+    def cached(self, allow_stale=False):
+        """Return the cached {'version','url','stage'} if present (and fresh unless allow_stale)."""
+        try:
+            with open(self.cache_file, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not entry.get("version"):
+            return None
+        if entry.get("status") != self.status:
+            return None
+        if not allow_stale and time.time() - float(entry.get("fetchedAt", 0)) > self.ttl_s:
+            return None
+        return entry
+
+    def _store(self, info: dict):
+        entry = dict(info, status=self.status, fetchedAt=time.time())
+        tmp = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(entry, f, indent=4)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            self.log.warning("Firmware cache: could not write %s: %s", self.cache_file, e)
+
+    # -------------------- background refresh --------------------
+
+    def start(self, on_result):
+        """
+        Refresh in the background unless the cache is fresh. `on_result(info)`
+        is called from the lookup thread with the fetched {'version','url','stage'}.
+        """
+        if self.cached() is not None:
+            return None
+
+        def _run():
+            try:
+                info = self.fetch()
+            except Exception as e:
+                self.log.info("Latest camera firmware: lookup failed (%s)", e)
+                return
+            if not info:
+                self.log.info("Latest camera firmware: unavailable via API")
+                return
+            self._store(info)
+            on_result(info)
+
+        self._thread = threading.Thread(target=_run, daemon=True, name="FirmwareLookup")
+        self._thread.start()
+        return self._thread
+
+    # -------------------- GraphQL feed --------------------
+
+    def fetch(self, limit=10):
+        """Return {'version','url','stage'} for latest Protect *Cameras* release, preferring `status` stage."""
+        preferred_stage = self.status
+        api_url = self.api_url
+        timeout = self.timeout
+
+        query = (
+            "query ReleaseFeedListQuery($tags:[String!],$betas:[String!],$alphas:[String!],"
+            "$offset:Int,$limit:Int,$sortBy:ReleasesSortBy,$userIsFollowing:Boolean,$featuredOnly:Boolean,"
+            "$searchTerm:String,$filterTags:[String!],$filterEATags:[String!]){"
+            "releases(tags:$tags,betas:$betas,alphas:$alphas,offset:$offset,limit:$limit,sortBy:$sortBy,"
+            "userIsFollowing:$userIsFollowing,featuredOnly:$featuredOnly,searchTerm:$searchTerm,"
+            "filterTags:$filterTags,filterEATags:$filterEATags){pageInfo{offset limit}totalCount "
+            "items{id title slug tags stage version createdAt lastActivityAt}}}"
+        )
+
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "identity",  # avoid br/gzip; urllib can't decode br
+            "Origin": "https://community.ui.com",
+            "Referer": "https://community.ui.com/RELEASES",
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) CameraSettings/1.0",
+        }
+
+        # progressively loosen filters
+        var_candidates = [
+            # Tightest: Protect + Cameras + search
+            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
+            "tags": ["unifi-protect"], "betas": [], "alphas": [],
+            "searchTerm": "camera", "filterTags": ["cameras"]},
+            # Drop filterTags
+            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
+            "tags": ["unifi-protect"], "betas": [], "alphas": [],
+            "searchTerm": "camera"},
+            # Only tag
+            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
+            "tags": ["unifi-protect"], "betas": [], "alphas": []},
+            # No tags, search by title keyword
+            {"limit": int(limit), "offset": 0, "sortBy": "LATEST",
+            "betas": [], "alphas": [], "searchTerm": "UniFi Protect Cameras"},
+            # Absolute fallback: no filters
+            {"limit": int(limit), "offset": 0, "sortBy": "LATEST"},
+        ]
+
+        def post_one(variables):
+            payload = {"query": query, "variables": variables, "operationName": "ReleaseFeedListQuery"}
+            body = self._post(api_url, payload, headers, timeout)
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError:
+                self.log.warning("Firmware API: non-JSON (head): %r", body[:300])
+                return []
+            if "errors" in data:
+                self.log.warning("Firmware API: GraphQL errors: %s",
+                                 "; ".join(e.get("message", "?") for e in data["errors"]))
+                return []
+            items = (data.get("data") or {}).get("releases", {}).get("items", []) or []
+            if not items:
+                self.log.debug("Firmware API: 0 items for vars=%s (totalCount=%s)",
+                               variables, (data.get("data") or {}).get("releases", {}).get("totalCount"))
+            return items
+
+        # try candidates until we get anything; a transport error (offline,
+        # firewalled, timeout) aborts the walk instead of retrying every set
+        items = []
+        for vars_ in var_candidates:
+            items = post_one(vars_)
+            if items:
+                break
+        if not items:
+            return None
+
+        # Prefer the "UniFi Protect Cameras" family, then prefer stage, then newest by version/createdAt
+        def is_cameras(item):
+            t = (item.get("title") or "").lower()
+            s = (item.get("slug") or "").lower()
+            return "unifi protect cameras" in t or "unifi-protect-cameras" in s or "cameras" in t
+
+        cam_items = [it for it in items if is_cameras(it)] or items
+        prefer_stage = [it for it in cam_items if (it.get("stage") or "").upper() == preferred_stage] or cam_items
+
+        def parse_semver(v):
+            try:
+                a, b, c = (v or "0.0.0").split(".")[:3]
+                return (int(a), int(b), int(c))
+            except Exception:
+                return (0, 0, 0)
+
+        picked = max(prefer_stage, key=lambda it: (parse_semver(it.get("version")), it.get("lastActivityAt") or ""))
+        version = picked.get("version")
+        if not version:
+            return None
+        slug = picked.get("slug")
+        url_page = f"https://community.ui.com/releases/{slug}" if slug else None
+        return {"version": version, "url": url_page, "stage": picked.get("stage")}
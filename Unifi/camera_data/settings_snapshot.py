@@ -0,0 +1,95 @@
+import socket
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+
+
+@lru_cache(maxsize=1024)
+def split_key(dotted_key: str) -> tuple:
+    """Compiled (cached) path for a dotted key, e.g. "mgmt.token" -> ("mgmt", "token")."""
+    return tuple(dotted_key.split("."))
+
+
+def freeze(value):
+    """Return an immutable deep copy: dicts become read-only mappings, lists become tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Plain mutable deep copy of a frozen value: mappings become dicts, tuples become lists."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+class SettingsSnapshot:
+    """
+    Immutable, versioned view of CameraSettings.
+
+    Writers publish a new snapshot after every change; readers grab one
+    reference and read from it without taking any lock. Values are frozen
+    (read-only mappings / tuples), so a snapshot never changes under a reader;
+    thaw() a subtree before serialising or mutating it.
+
+    Usage:
+        s = settings.snapshot()
+        mac, host = s.get("mac"), s.get("host")
+    """
+
+    __slots__ = ("version", "_data", "_volatile", "_volatile_keys", "_derived")
+
+    def __init__(self, version: int, data, volatile: dict, volatile_keys: frozenset, derived: dict):
+        self.version = version
+        self._data = data
+        self._volatile = volatile
+        self._volatile_keys = volatile_keys
+        self._derived = derived
+
+    def get(self, key, default=None):
+        derive = self._derived.get(key)
+        if derive is not None:
+            return derive(self.get)
+        if key in self._volatile_keys:
+            return self._volatile.get(key, default)
+        value = self._data
+        for part in split_key(key):
+            try:
+                value = value[part]
+            except (KeyError, TypeError, IndexError):
+                return default
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def mac_bytes(self, key="mac") -> bytes:
+        """MAC address at `key` as 6 raw bytes; RuntimeError if missing or malformed."""
+        mac_str = self.get(key)
+        if not mac_str:
+            raise RuntimeError("MAC address is missing in settings.")
+        try:
+            return bytes.fromhex(mac_str.replace(":", ""))
+        except ValueError:
+            raise RuntimeError(f"Malformed MAC address: {mac_str!r}")
+
+    def ip_bytes(self, key="host") -> bytes:
+        """IPv4 address at `key` as 4 raw bytes; RuntimeError if missing or malformed."""
+        ip_str = self.get(key)
+        if not ip_str:
+            raise RuntimeError("IP address is missing in settings.")
+        try:
+            return socket.inet_aton(ip_str)
+        except OSError:
+            raise RuntimeError(f"Malformed IP address: {ip_str!r}")
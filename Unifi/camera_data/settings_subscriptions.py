@@ -0,0 +1,77 @@
+import threading
+import logging
+
+
+def _normalize(pattern: str) -> str:
+    """"mgmt.*" and "mgmt" both watch the mgmt subtree; "*" (or "") watches everything."""
+    if pattern in ("*", ""):
+        return ""
+    if pattern.endswith(".*"):
+        return pattern[:-2]
+    return pattern
+
+
+def key_matches(pattern: str, key: str) -> bool:
+    """
+    True if a change to dotted `key` affects the subtree watched by `pattern`:
+    the key itself, anything below it, or a parent that replaced it wholesale.
+    """
+    if not pattern:
+        return True
+    return (
+        key == pattern
+        or key.startswith(pattern + ".")
+        or pattern.startswith(key + ".")
+    )
+
+
+class Subscription:
+    """Handle returned by CameraSettings.subscribe(); call cancel() to stop receiving callbacks."""
+
+    __slots__ = ("pattern", "callback", "_registry")
+
+    def __init__(self, registry: "SubscriptionRegistry", pattern: str, callback):
+        self._registry = registry
+        self.pattern = pattern
+        self.callback = callback
+
+    def cancel(self):
+        self._registry._remove(self)
+
+
+class SubscriptionRegistry:
+    """
+    Key-prefix change subscriptions for CameraSettings.
+
+    Callbacks run synchronously on the writer's thread, after the settings
+    lock has been released, as callback(changed_keys, snapshot). They must be
+    quick and must not block; hand work off to a thread or event loop
+    (e.g. loop.call_soon_threadsafe) when needed.
+    """
+
+    def __init__(self, logger=None):
+        self.log = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._subs = ()  # copy-on-write tuple, iterated without the lock
+
+    def subscribe(self, pattern: str, callback) -> Subscription:
+        sub = Subscription(self, _normalize(pattern), callback)
+        with self._lock:
+            self._subs = self._subs + (sub,)
+        return sub
+
+    def _remove(self, sub: Subscription):
+        with self._lock:
+            self._subs = tuple(s for s in self._subs if s is not sub)
+
+    def notify(self, changed_keys, snapshot):
+        if not changed_keys:
+            return
+        for sub in self._subs:
+            matched = tuple(k for k in changed_keys if key_matches(sub.pattern, k))
+            if not matched:
+                continue
+            try:
+                sub.callback(matched, snapshot)
+            except Exception:
+                self.log.exception("Settings subscriber for %r failed", sub.pattern or "*")
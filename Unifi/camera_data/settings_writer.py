@@ -0,0 +1,140 @@
+import os
+import time
+import tempfile
+import threading
+import logging
+
+
+class SettingsWriter(threading.Thread):
+    """
+    Write-behind persister for CameraSettings.
+
+    Writers only call mark_dirty(); the background thread coalesces every
+    change made within `flush_interval` seconds into a single atomic write
+    (temp file + fsync + rename). flush() forces a synchronous write and
+    stop() drains whatever is pending before returning.
+
+    A flush_interval <= 0 disables the background thread and writes through
+    on every mark_dirty() call (legacy behaviour).
+    """
+
+    def __init__(self, path, serialize, flush_interval=2.0, logger=None):
+        super().__init__(daemon=True, name="SettingsWriter")
+        self.path = path
+        self.flush_interval = float(flush_interval)
+        self.log = logger or logging.getLogger(__name__)
+        self._serialize = serialize               # callable -> str (consistent snapshot)
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()          # one file write at a time
+        self._dirty = False
+        self._stopping = False
+
+        # counters (read via stats())
+        self._requests = 0
+        self._writes = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def write_through(self) -> bool:
+        return self.flush_interval <= 0
+
+    # -------------------- producer side --------------------
+
+    def mark_dirty(self):
+        with self._cond:
+            self._dirty = True
+            self._requests += 1
+            self._cond.notify()
+        if self.write_through:
+            self.flush()
+
+    # -------------------- consumer side --------------------
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    break
+                # coalesce everything that arrives during the interval
+                self._cond.wait_for(lambda: self._stopping, timeout=self.flush_interval)
+                if self._stopping:
+                    break
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write pending changes now. Return True if a file write happened."""
+        with self._io_lock:
+            with self._cond:
+                if not self._dirty:
+                    return False
+                self._dirty = False
+            start = time.perf_counter()
+            try:
+                self._atomic_write(self._serialize())
+            except Exception as e:
+                with self._cond:
+                    self._dirty = True
+                    self._errors += 1
+                self.log.error("Failed to persist settings to %s: %s", self.path, e)
+                return False
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            with self._cond:
+                self._writes += 1
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+            return True
+
+    def _atomic_write(self, data: str):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".settings.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        # make the rename itself durable
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def stop(self, timeout=5.0):
+        """Stop the background thread and flush anything still pending."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "flush_interval_s": self.flush_interval,
+                "write_requests": self._requests,
+                "writes": self._writes,
+                "write_errors": self._errors,
+                "pending": self._dirty,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._writes, 3) if self._writes else 0.0,
+            }
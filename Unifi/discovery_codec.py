@@ -0,0 +1,341 @@
+"""
+Codec for the UBNT discovery protocol (UDP 10001).
+
+Packet: VERSION(u8) CMD(u8) LENGTH(u16 BE) followed by LENGTH bytes of TLV
+fields, each ID(u8) LEN(u16 BE) VALUE. See the field table in
+discovery_responder.py / adoption-flow.md.
+
+Decoding walks the packet through a memoryview and hands out slices, so
+nothing is copied until a value is converted; encoding sizes the packet up
+front and packs every field into one preallocated bytearray. All lengths
+are validated and any malformed input raises DiscoveryCodecError.
+
+Usage:
+    buf = encode([(Field.HWADDR, "f4:92:bf:12:34:56"), (Field.UPTIME, 3600)])
+    msg = decode(buf)
+    msg.get(Field.UPTIME)   # 3600
+
+The codec has no dependency on the proxy, so a stand-in controller can use
+it to build probes and parse answers.
+"""
+import enum
+import socket
+import struct
+import uuid
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+HEADER = struct.Struct(">BBH")
+FIELD_HEADER = struct.Struct(">BH")
+_U16_BE = struct.Struct(">H")
+_U16_LE = struct.Struct("<H")
+_U32_BE = struct.Struct(">I")
+_WEBUI = struct.Struct(">HH")
+
+VERSION_1 = 1
+CMD_INFO = 0
+PROBE = HEADER.pack(VERSION_1, CMD_INFO, 0)
+
+
+class DiscoveryCodecError(ValueError):
+    """Malformed discovery packet or field value."""
+
+
+class Field(enum.IntEnum):
+    HWADDR = 0x01
+    IPINFO = 0x02
+    FWVERSION = 0x03
+    USERNAME = 0x06
+    SALT = 0x07
+    RND_CHALLENGE = 0x08
+    CHALLENGE = 0x09
+    UPTIME = 0x0A
+    HOSTNAME = 0x0B
+    PLATFORM = 0x0C
+    ESSID = 0x0D
+    WMODE = 0x0E
+    WEBUI = 0x0F
+    SYSTEM_ID = 0x10
+    MODEL = 0x14
+    MODEL_SHORT = 0x15
+    MGMT_IS_DEFAULT = 0x17
+    DEVICE_ID = 0x20
+    CONTROLLER_ID = 0x26
+    GUID = 0x2B
+    DEVICE_DEFAULT_CREDENTIALS = 0x2C
+    ADOPTED_BY_CONTROLLER_UID = 0x2E
+    PRIMARY_ADDRESS = 0x2F
+    CUSTOM_AIRMAX_FIELDS = 0x81
+    CUSTOM_UNIFI_FIELDS = 0x82
+    CUSTOM_EDGEMAX_FIELDS = 0x83
+    CUSTOM_AMPLIFY_FIELDS = 0x84
+
+
+class UnifiSubField(enum.IntEnum):
+    BLE_BRIDGE_PORT = 0x01
+
+
+# Value kinds and their allowed encoded sizes (None = variable length)
+MAC, MAC_IP, STRING, RAW16, UUID16, UINT, UINT16_LE, WEBUI, TLV = (
+    "mac", "mac_ip", "string", "raw16", "uuid16", "uint", "uint16_le", "webui", "tlv",
+)
+
+FIELD_SPECS = {
+    Field.HWADDR: (MAC, (6,)),
+    Field.IPINFO: (MAC_IP, (10,)),
+    Field.FWVERSION: (STRING, None),
+    Field.USERNAME: (STRING, None),
+    Field.SALT: (RAW16, (16,)),
+    Field.RND_CHALLENGE: (RAW16, (16,)),
+    Field.CHALLENGE: (RAW16, (16,)),
+    Field.UPTIME: (UINT, (4,)),
+    Field.HOSTNAME: (STRING, None),
+    Field.PLATFORM: (STRING, None),
+    Field.ESSID: (STRING, None),
+    Field.WMODE: (UINT, (1,)),
+    Field.WEBUI: (WEBUI, (4,)),
+    Field.SYSTEM_ID: (UINT16_LE, (2,)),
+    Field.MODEL: (STRING, None),
+    Field.MODEL_SHORT: (STRING, None),
+    Field.MGMT_IS_DEFAULT: (UINT, (1, 4)),      # 1 byte per spec, 4 bytes seen on G3 firmware
+    Field.DEVICE_ID: (STRING, None),
+    Field.CONTROLLER_ID: (UUID16, (16,)),
+    Field.GUID: (UUID16, (16,)),
+    Field.DEVICE_DEFAULT_CREDENTIALS: (UINT, (1,)),
+    Field.ADOPTED_BY_CONTROLLER_UID: (UUID16, (16,)),
+    Field.PRIMARY_ADDRESS: (MAC_IP, (10,)),
+    Field.CUSTOM_AIRMAX_FIELDS: (TLV, None),
+    Field.CUSTOM_UNIFI_FIELDS: (TLV, None),
+    Field.CUSTOM_EDGEMAX_FIELDS: (TLV, None),
+    Field.CUSTOM_AMPLIFY_FIELDS: (TLV, None),
+}
+
+
+class Message(NamedTuple):
+    version: int
+    cmd: int
+    fields: List[Tuple[int, object]]
+
+    def get(self, field_id: int, default=None):
+        """First value for `field_id` (fields such as IPINFO may repeat)."""
+        for fid, value in self.fields:
+            if fid == field_id:
+                return value
+        return default
+
+    def get_all(self, field_id: int) -> list:
+        return [value for fid, value in self.fields if fid == field_id]
+
+
+# -------------------- decoding --------------------
+
+def parse_header(buf) -> Tuple[int, int, int]:
+    """Return (version, cmd, payload_length); the length must match the buffer."""
+    if len(buf) < HEADER.size:
+        raise DiscoveryCodecError(f"packet too short for header: {len(buf)} bytes")
+    version, cmd, length = HEADER.unpack_from(buf, 0)
+    if HEADER.size + length != len(buf):
+        raise DiscoveryCodecError(
+            f"payload length {length} does not match packet size {len(buf)}")
+    return version, cmd, length
+
+
+def is_probe(buf) -> bool:
+    """True for a v1 discovery request (01 00 00 00)."""
+    return buf[:HEADER.size] == PROBE
+
+
+def iter_tlv(buf, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, memoryview]]:
+    """Yield (id, value view) for each TLV in buf[offset:end] without copying."""
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    end = len(mv) if end is None else end
+    pos = offset
+    while pos < end:
+        if end - pos < FIELD_HEADER.size:
+            raise DiscoveryCodecError(f"truncated field header at offset {pos}")
+        fid, flen = FIELD_HEADER.unpack_from(mv, pos)
+        pos += FIELD_HEADER.size
+        if pos + flen > end:
+            raise DiscoveryCodecError(
+                f"field 0x{fid:02x} length {flen} overruns packet at offset {pos}")
+        yield fid, mv[pos:pos + flen]
+        pos += flen
+
+
+def iter_fields(buf) -> Iterator[Tuple[int, memoryview]]:
+    """Validate the header, then yield (field id, value view) for every field."""
+    parse_header(buf)
+    return iter_tlv(buf, HEADER.size)
+
+
+def find_field(buf, field_id: int) -> Optional[Tuple[int, int]]:
+    """(offset, length) of the first `field_id` value in an encoded packet, or None."""
+    mv = memoryview(buf)
+    parse_header(mv)
+    pos = HEADER.size
+    for fid, value in iter_tlv(mv, HEADER.size):
+        pos += FIELD_HEADER.size
+        if fid == field_id:
+            return pos, len(value)
+        pos += len(value)
+    return None
+
+
+def _check_size(field_id: int, sizes, n: int):
+    if sizes is not None and n not in sizes:
+        raise DiscoveryCodecError(
+            f"field 0x{field_id:02x} has length {n}, expected {'/'.join(map(str, sizes))}")
+
+
+def _format_mac(mv) -> str:
+    return bytes(mv).hex(":")
+
+
+def decode_value(field_id: int, mv: memoryview):
+    """Convert one field value view to a Python value; unknown ids return the view itself."""
+    spec = FIELD_SPECS.get(field_id)
+    if spec is None:
+        return mv
+    kind, sizes = spec
+    _check_size(field_id, sizes, len(mv))
+    if kind == STRING:
+        return str(mv, "utf-8", "replace").rstrip("\0")
+    if kind == UINT:
+        return int.from_bytes(mv, "big")
+    if kind == MAC:
+        return _format_mac(mv)
+    if kind == MAC_IP:
+        return _format_mac(mv[:6]), socket.inet_ntoa(mv[6:10])
+    if kind == UINT16_LE:
+        return _U16_LE.unpack_from(mv)[0]
+    if kind == WEBUI:
+        return _WEBUI.unpack_from(mv)
+    if kind == UUID16:
+        return str(uuid.UUID(bytes=bytes(mv)))
+    if kind == RAW16:
+        return mv
+    if kind == TLV:
+        return list(iter_tlv(mv))
+    return mv
+
+
+def decode(buf) -> Message:
+    """Decode a whole packet into a Message of (field id, value) pairs."""
+    version, cmd, _ = parse_header(buf)
+    fields = [(fid, decode_value(fid, value)) for fid, value in iter_tlv(buf, HEADER.size)]
+    return Message(version, cmd, fields)
+
+
+# -------------------- encoding --------------------
+
+def _mac_bytes(value) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+    else:
+        try:
+            raw = bytes.fromhex(str(value).replace(":", "").replace("-", ""))
+        except ValueError:
+            raise DiscoveryCodecError(f"malformed MAC address: {value!r}")
+    if len(raw) != 6:
+        raise DiscoveryCodecError(f"MAC address must be 6 bytes: {value!r}")
+    return raw
+
+
+def _ip_bytes(value) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+    else:
+        try:
+            raw = socket.inet_aton(str(value))
+        except OSError:
+            raise DiscoveryCodecError(f"malformed IPv4 address: {value!r}")
+    if len(raw) != 4:
+        raise DiscoveryCodecError(f"IPv4 address must be 4 bytes: {value!r}")
+    return raw
+
+
+def _uuid_bytes(value) -> bytes:
+    try:
+        return bytes.fromhex(str(value).replace("-", ""))
+    except ValueError:
+        raise DiscoveryCodecError(f"malformed UUID: {value!r}")
+
+
+def encode_value(field_id: int, value) -> bytes:
+    """Encode one Python value for `field_id`; unknown ids (and sub-fields) take raw bytes."""
+    spec = FIELD_SPECS.get(field_id)
+    if spec is None:
+        if isinstance(value, int):
+            raise DiscoveryCodecError(f"field {field_id!r} needs a bytes value")
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return bytes(value)
+    kind, sizes = spec
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)      # pre-encoded; only the length is checked
+    elif kind == STRING:
+        raw = str(value).encode("utf-8")
+    elif kind == UINT:
+        size = sizes[0]
+        try:
+            raw = int(value).to_bytes(size, "big")
+        except OverflowError:
+            raise DiscoveryCodecError(f"field 0x{field_id:02x} value {value!r} exceeds {size} bytes")
+    elif kind == MAC:
+        raw = _mac_bytes(value)
+    elif kind == MAC_IP:
+        mac, ip = value
+        raw = _mac_bytes(mac) + _ip_bytes(ip)
+    elif kind == UINT16_LE:
+        num = int(value, 0) if isinstance(value, str) else int(value)
+        if not 0 <= num <= 0xFFFF:
+            raise DiscoveryCodecError(f"field 0x{field_id:02x} value {value!r} out of range")
+        raw = _U16_LE.pack(num)
+    elif kind == WEBUI:
+        raw = _WEBUI.pack(*value)
+    elif kind == UUID16:
+        raw = _uuid_bytes(value)
+    elif kind == TLV:
+        raw = bytes(encode_tlv((int(sid), encode_value(None, sval)) for sid, sval in value))
+    else:
+        raise DiscoveryCodecError(f"field 0x{field_id:02x} needs a bytes value")
+    _check_size(field_id, sizes, len(raw))
+    return raw
+
+
+def encode_tlv(fields) -> bytearray:
+    """Pack already-encoded (id, bytes) pairs into one preallocated TLV block."""
+    fields = list(fields)
+    total = 0
+    for fid, raw in fields:
+        if not 0 <= fid <= 0xFF:
+            raise DiscoveryCodecError(f"field id out of range: {fid}")
+        if len(raw) > 0xFFFF:
+            raise DiscoveryCodecError(f"field 0x{fid:02x} value too long: {len(raw)} bytes")
+        total += FIELD_HEADER.size + len(raw)
+    out = bytearray(total)
+    pos = 0
+    for fid, raw in fields:
+        FIELD_HEADER.pack_into(out, pos, fid, len(raw))
+        pos += FIELD_HEADER.size
+        out[pos:pos + len(raw)] = raw
+        pos += len(raw)
+    return out
+
+
+def encode(fields, version: int = VERSION_1, cmd: int = CMD_INFO) -> bytearray:
+    """Encode (field id, value) pairs into a complete packet (header + TLVs)."""
+    encoded = [(int(fid), encode_value(fid, value)) for fid, value in fields]
+    body_len = sum(FIELD_HEADER.size + len(raw) for _, raw in encoded)
+    if body_len > 0xFFFF:
+        raise DiscoveryCodecError(f"payload too long: {body_len} bytes")
+    out = bytearray(HEADER.size + body_len)
+    HEADER.pack_into(out, 0, version, cmd, body_len)
+    pos = HEADER.size
+    for fid, raw in encoded:
+        if len(raw) > 0xFFFF:
+            raise DiscoveryCodecError(f"field 0x{fid:02x} value too long: {len(raw)} bytes")
+        FIELD_HEADER.pack_into(out, pos, fid, len(raw))
+        pos += FIELD_HEADER.size
+        out[pos:pos + len(raw)] = raw
+        pos += len(raw)
+    return out
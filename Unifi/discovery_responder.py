@@ -1,6 +1,16 @@
+import time
 import socket
+import asyncio
 import struct
 import logging
+import threading
+
+import discovery_codec as codec
+from discovery_codec import Field
+from camera_data.camera_settings import CameraSettings
+from camera_data.camera_models import CameraModelDatabase
+from camera_data.settings_snapshot import SettingsSnapshot, freeze
+from camera_data.settings_subscriptions import SubscriptionRegistry
 
 '''
 13701
@@ -37,114 +47,493 @@ import logging
 '''
 
 
-class DiscoveryResponder:
-    DISCOVERY_PORT = 10001
-    VERSION = 1
-    CMD_INFO = 0
+_UPTIME = struct.Struct(">I")
 
-    def __init__(self, settings, logger=None):
-        self.settings = settings
-        self.log = logger or logging.getLogger("camera_app")
 
-    def build_field(self, field_id, data: bytes) -> bytes:
-        # 1 byte id, 2 byte length (big-endian), then data
-        return struct.pack(">BH", field_id, len(data)) + data
+class _TokenBucket:
+    """Per-source rate limiter: `rate` tokens/s, bursts of up to `burst`."""
 
-    def build_response(self):
-        payload = b""
+    __slots__ = ("rate", "burst", "tokens", "stamp")
 
-        # --- PRIMARY_ADDRESS (47): MAC(6) + IP(4)
-        mac_b = self.settings.mac_bytes("mac")
-        ip_b  = self.settings.ip_bytes("host")
-        if not mac_b or len(mac_b) != 6:
-            raise ValueError("Invalid MAC bytes for PRIMARY_ADDRESS")
-        if not ip_b or len(ip_b) != 4:
-            raise ValueError("Invalid IP bytes for PRIMARY_ADDRESS")
-        payload += self.build_field(47, mac_b + ip_b)
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """
+    asyncio discovery endpoint: validates probes, rate-limits per source
+    address, drops identical probes repeated within `dedup_window` seconds and
+    answers with the prebuilt packet of every camera in the server's registry.
+
+    Per-source state is bounded: rate buckets and dedup entries are keyed by
+    source IP (not port), each table is capped at MAX_TRACKED_SOURCES with
+    the oldest entry evicted, and idle entries are swept at most once per
+    PRUNE_INTERVAL rather than per datagram.
+    """
+
+    MAX_TRACKED_SOURCES = 1024
+    PRUNE_INTERVAL = 5.0
+
+    def __init__(self, server: "DiscoveryServer", rate: float, burst: float, dedup_window: float,
+                 local_host: str = "0.0.0.0"):
+        self.server = server
+        self.log = server.log
+        self.local_host = local_host    # alias-bound listeners only answer for cameras on that IP
+        self.rate = rate
+        self.burst = burst
+        self.dedup_window = dedup_window
+        self.transport = None
+        self._buckets = {}      # source ip -> _TokenBucket
+        self._last_probe = {}   # (source ip, probe bytes) -> monotonic time answered, oldest first
+        self._next_prune = 0.0
+        self.stats = server.stats
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        stats = self.stats
+        stats["received"] += 1
+
+        if not codec.is_probe(data):
+            stats["dropped_invalid"] += 1
+            return
+
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._prune(now)
 
-        # --- HWADDR (1) 6 bytes
-        payload += self.build_field(1, mac_b)
+        ip = addr[0]
+        key = (ip, data)
+        last = self._last_probe.get(key)
+        if last is not None and now - last < self.dedup_window:
+            stats["dropped_duplicate"] += 1
+            return
 
-        # --- HOSTNAME (11) string
-        host = self.settings.get("host", "")
-        payload += self.build_field(11, host.encode())
+        buckets = self._buckets
+        bucket = buckets.get(ip)
+        if bucket is None:
+            if len(buckets) >= self.MAX_TRACKED_SOURCES:
+                del buckets[next(iter(buckets))]
+            bucket = buckets[ip] = _TokenBucket(self.rate, self.burst, now)
+        if not bucket.take(now):
+            stats["dropped_rate"] += 1
+            return
 
-        # --- PLATFORM (12) string
-        platform = self.settings.get("platform", "")
-        payload += self.build_field(12, platform.encode())
+        responses = self.server.responses(self.local_host)
+        if not responses:
+            return
 
-        # --- WMODE (14) 1 = wired
-        payload += self.build_field(14, struct.pack("B", 1))
+        # one pass, no awaits: every camera's packet goes out back-to-back
+        sendto = self.transport.sendto
+        for packet in responses:
+            sendto(packet, addr)
+        last_probe = self._last_probe
+        if last is not None:
+            del last_probe[key]             # re-insert at the young end
+        elif len(last_probe) >= self.MAX_TRACKED_SOURCES:
+            del last_probe[next(iter(last_probe))]
+        last_probe[key] = now
+        stats["answered"] += 1
+        stats["responses_sent"] += len(responses)
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(f"Answered discovery from {addr} for {len(responses)} camera(s)")
 
-        # --- ESSID (13) empty
-        payload += self.build_field(13, b"")
+    def error_received(self, exc):
+        self.stats["errors"] += 1
+        self.log.warning("Discovery socket error: %s", exc)
 
-        # --- FWVERSION (3) string (ok if empty)
-        fw = self.settings.get("firmwareVersion", "v4.23.8")
-        payload += self.build_field(3, fw.encode())
+    def _prune(self, now: float):
+        self._next_prune = now + self.PRUNE_INTERVAL
+        idle = max(self.dedup_window, self.burst / self.rate if self.rate else 0.0)
+        self._buckets = {ip: b for ip, b in self._buckets.items() if now - b.stamp < idle}
+        self._last_probe = {k: t for k, t in self._last_probe.items() if now - t < self.dedup_window}
 
-        # --- DEVICE_ID (32) string; most devices send MAC as text
-        payload += self.build_field(32, self.settings.get("mac", "").encode())
 
-        # --- UPTIME (10) uint32 BE seconds
-        uptime = int(self.settings.get("uptime", 0)) & 0xFFFFFFFF
-        payload += self.build_field(10, struct.pack(">I", uptime))
+class DiscoveryPacket:
+    """
+    Prebuilt discovery response for one camera. The packet lives in a
+    bytearray and only the 4-byte UPTIME value is patched per send; the
+    template is rebuilt after one of TEMPLATE_KEYS changes.
+    """
 
-        # --- WEBUI (15): protocol + port (HTTPS=1, HTTP=0)
-        #     >HH  (proto_flag, port)
-        payload += self.build_field(15, struct.pack(">HH", 1, 443))
+    VERSION = codec.VERSION_1
+    CMD_INFO = codec.CMD_INFO
 
-        # --- SYSTEM_ID (16) uint16 LE  (e.g. "0xa573")
-        sysid_raw = self.settings.get("sysid")
+    # Settings baked into the prebuilt response; UPTIME is patched per send
+    TEMPLATE_KEYS = ("mac", "host", "platform", "firmwareVersion", "sysid", "controllerId")
+
+    def __init__(self, source, logger=None):
+        self.source = source    # CameraSettings or CameraIdentity
+        self.log = logger or logging.getLogger("camera_app")
+        self.mac = (source.get("mac") or "").lower()
+        self.host = source.get("host") or ""
+
+        # Prebuilt packet + offset of the 4-byte UPTIME value
+        # (generation guards against a rebuild racing an invalidation)
+        self._template = None
+        self._template_gen = 0
+        self._subs = []
+        if hasattr(source, "subscribe"):
+            self._subs = [source.subscribe(k, self._invalidate_template) for k in self.TEMPLATE_KEYS]
+
+    def close(self):
+        for sub in self._subs:
+            sub.cancel()
+        self._subs = []
+
+    def _invalidate_template(self, keys=None, snap=None):
+        self._template_gen += 1
+        self._template = None
+
+    def response(self) -> bytearray:
+        """Cached response packet with the current uptime patched in place."""
+        cached = self._template
+        if cached is None:
+            gen = self._template_gen
+            cached = self._build_template()
+            if gen == self._template_gen:
+                self._template = cached
+        packet, uptime_offset = cached
+        _UPTIME.pack_into(packet, uptime_offset, int(self.source.get("uptime", 0)) & 0xFFFFFFFF)
+        return packet
+
+    def _build_template(self):
+        """Build the full response once; return (packet, offset of UPTIME value)."""
+        s = self.source.snapshot()  # one consistent, lock-free view
+        mac_b = s.mac_bytes("mac")
+        ip_b = s.ip_bytes("host")
+        if not mac_b or len(mac_b) != 6:
+            raise ValueError("Invalid MAC bytes for PRIMARY_ADDRESS")
+        if not ip_b or len(ip_b) != 4:
+            raise ValueError("Invalid IP bytes for PRIMARY_ADDRESS")
+
+        fields = [
+            (Field.PRIMARY_ADDRESS, (mac_b, ip_b)),
+            (Field.HWADDR, mac_b),
+            (Field.HOSTNAME, s.get("host", "")),
+            (Field.PLATFORM, s.get("platform", "")),
+            (Field.WMODE, 1),                                   # wired
+            (Field.ESSID, ""),
+            (Field.FWVERSION, s.get("firmwareVersion", "v4.23.8")),
+            (Field.DEVICE_ID, s.get("mac", "")),                # most devices send MAC as text
+            (Field.UPTIME, 0),                                  # patched in response()
+            (Field.WEBUI, (1, 443)),                            # HTTPS=1, port
+        ]
+
+        # --- SYSTEM_ID uint16 LE (e.g. "0xa573" or "42355")
+        sysid_raw = s.get("sysid")
         if sysid_raw:
             try:
-                sysid_val = int(sysid_raw, 0)  # handles "0xa573" or "42355"
-                payload += self.build_field(16, struct.pack("<H", sysid_val))
+                fields.append((Field.SYSTEM_ID, codec.encode_value(Field.SYSTEM_ID, sysid_raw)))
             except (TypeError, ValueError):
                 self.log.warning("Skipping invalid sysid %r", sysid_raw)
 
-        # --- DEVICE_DEFAULT_CREDENTIALS (44) 1 byte (optional)
-        payload += self.build_field(44, struct.pack("B", 1))
+        fields.append((Field.DEVICE_DEFAULT_CREDENTIALS, 1))
 
-        # --- CONTROLLER_ID (38) 16 bytes UUID (optional)
-        cid = self.settings.get("controllerId")
+        # --- CONTROLLER_ID 16 bytes UUID (optional)
+        cid = s.get("controllerId")
         if cid:
             try:
-                payload += self.build_field(38, bytes.fromhex(cid.replace("-", "")))
+                fields.append((Field.CONTROLLER_ID, codec.encode_value(Field.CONTROLLER_ID, cid)))
             except ValueError:
                 self.log.warning("Invalid controllerId %r; expected hex/uuid", cid)
 
-        # Header: version, cmd, payload length
-        header = struct.pack(">BBH", self.VERSION, self.CMD_INFO, len(payload))
-        return header + payload
+        packet = codec.encode(fields, self.VERSION, self.CMD_INFO)
+        uptime_offset, _ = codec.find_field(packet, Field.UPTIME)
+        return packet, uptime_offset
 
-    def start(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.bind(("0.0.0.0", self.DISCOVERY_PORT))
 
-        listen_host = self.settings.get("host", "0.0.0.0")
-        self.log.info(f"Listening for discovery on {listen_host}:{self.DISCOVERY_PORT}")
+class CameraIdentity:
+    """
+    In-memory discovery identity of a virtual camera (MAC, IP alias, sysid,
+    ...) answered for by this process. Exposes the read, update and
+    subscribe API of CameraSettings (flat keys, nothing persisted), so the
+    advertised packet is rebuilt when a field changes and the camera leaves
+    discovery once update({"canAdopt": False}) is applied.
+
+    Usage:
+        cam = CameraIdentity.from_dict({
+            "mac": "f4:92:bf:00:00:01", "host": "192.168.1.61", "marketName": "UVC_G4_DOME",
+        })
+        server.add_camera(cam)
+        cam.update({"host": "192.168.1.62"})
+    """
+
+    def __init__(self, mac, host, sysid, platform="", firmware_version="",
+                 controller_id=None, up_since_ms=None):
+        data = {
+            "mac": mac,
+            "host": host,
+            "sysid": sysid,
+            "platform": platform,
+            "firmwareVersion": firmware_version,
+        }
+        if controller_id:
+            data["controllerId"] = controller_id
+        self._data = data
+        self._volatile = {"upSince": up_since_ms or int(time.time() * 1000)}
+        self._lock = threading.Lock()
+        self._subscriptions = SubscriptionRegistry()
+        self._snapshot = SettingsSnapshot(0, freeze(data), dict(self._volatile),
+                                          CameraSettings.VOLATILE_KEYS, CameraSettings.DERIVED_KEYS)
+
+    @classmethod
+    def from_dict(cls, d: dict, up_since_ms=None) -> "CameraIdentity":
+        """Build from a settings-style dict; platform/sysid default from marketName."""
+        market = d.get("marketName", "")
+        return cls(
+            mac=d["mac"],
+            host=d["host"],
+            sysid=d.get("sysid") or CameraModelDatabase.get_sysid(market) or "",
+            platform=d.get("platform") or CameraModelDatabase.get_platform(market) or "",
+            firmware_version=d.get("firmwareVersion", ""),
+            controller_id=d.get("controllerId"),
+            up_since_ms=up_since_ms,
+        )
 
-        while True:
-            if not self.settings.get("canAdopt", True):
-                self.log.warning("Exiting discovery loop because canAdopt is False.")
-                break
+    def snapshot(self) -> SettingsSnapshot:
+        return self._snapshot
 
-            sock.settimeout(1.0)
+    def get(self, key, default=None):
+        return self._snapshot.get(key, default)
+
+    def update(self, updates: dict):
+        """Apply flat key changes and notify subscribers of the ones that changed."""
+        with self._lock:
+            changed = []
+            for key, value in updates.items():
+                target = self._volatile if key in CameraSettings.VOLATILE_KEYS else self._data
+                if target.get(key) != value:
+                    target[key] = value
+                    changed.append(key)
+            if not changed:
+                return
+            snap = self._snapshot = SettingsSnapshot(
+                self._snapshot.version + 1, freeze(self._data), dict(self._volatile),
+                CameraSettings.VOLATILE_KEYS, CameraSettings.DERIVED_KEYS)
+        self._subscriptions.notify(tuple(changed), snap)
+
+    def subscribe(self, pattern: str, callback):
+        return self._subscriptions.subscribe(pattern, callback)
+
+
+class DiscoveryServer:
+    """
+    UDP listener(s) answering discovery for a registry of cameras.
+    A single probe is answered with every registered camera's packet.
+
+    Cameras backed by CameraSettings leave the registry once adopted
+    (canAdopt -> False); with stop_when_empty the server then exits.
+
+    Binding:
+      bind=("0.0.0.0",)        one wildcard listener answering for every camera
+      bind=("192.168.1.61", …) one listener per IP alias, each answering only
+                               for the cameras whose host is that alias
+      reuse_port=True          SO_REUSEPORT, so several worker processes can
+                               share the port; broadcast probes reach every
+                               worker and each answers for the cameras it owns
+      interface="eth0"         SO_BINDTODEVICE (Linux, needs CAP_NET_RAW)
+    Broadcast probes are only delivered to wildcard listeners, so keep one
+    in the bind list unless the controller probes the aliases directly.
+    """
+
+    DISCOVERY_PORT = 10001
+    WILDCARD = "0.0.0.0"
+
+    def __init__(self, logger=None, *, rate_limit=5.0, burst=10, dedup_window=0.5, stop_when_empty=False,
+                 bind=("0.0.0.0",), port=None, reuse_port=False, interface=None):
+        self.log = logger or logging.getLogger("camera_app")
+        self.bind = tuple(bind) or (self.WILDCARD,)
+        self.port = self.DISCOVERY_PORT if port is None else int(port)
+        self.reuse_port = reuse_port
+        self.interface = interface
+        self.rate_limit = float(rate_limit)       # answered probes/s per source address
+        self.burst = float(burst)
+        self.dedup_window = float(dedup_window)   # seconds; identical probes inside are dropped
+        self.stop_when_empty = stop_when_empty
+        self.stats = {
+            "received": 0,
+            "answered": 0,
+            "responses_sent": 0,
+            "dropped_invalid": 0,
+            "dropped_rate": 0,
+            "dropped_duplicate": 0,
+            "errors": 0,
+        }
+
+        self._lock = threading.Lock()
+        self._packets = {}          # mac -> DiscoveryPacket
+        self._source_subs = {}      # mac -> (canAdopt, host) Subscriptions
+        self._ordered = ()          # registry snapshot iterated by the protocol
+        self._by_host = {}          # camera host -> tuple of packets (alias listeners)
+        self._loop = None
+        self._empty = None
+
+    # -------------------- registry --------------------
+
+    def add_camera(self, source):
+        """Register a CameraSettings or CameraIdentity; return its DiscoveryPacket (None if adopted)."""
+        if not source.get("canAdopt", True):
+            self.log.info("Discovery: %s already adopted; not registering", source.get("mac"))
+            return None
+        packet = DiscoveryPacket(source, self.log)
+        with self._lock:
+            old = self._packets.pop(packet.mac, None)
+            self._packets[packet.mac] = packet
+            self._reindex()
+        if old is not None:
+            old.close()
+        if hasattr(source, "subscribe"):
+            def _on_can_adopt(keys, snap, mac=packet.mac):
+                if not snap.get("canAdopt", True):
+                    self.remove_camera(mac)
+
+            def _on_host(keys, snap, packet=packet):
+                self._rehost(packet, snap.get("host") or "")
+
+            self._replace_subs(packet.mac, (
+                source.subscribe("canAdopt", _on_can_adopt),
+                source.subscribe("host", _on_host),
+            ))
+        return packet
+
+    def remove_camera(self, mac: str):
+        mac = (mac or "").lower()
+        with self._lock:
+            packet = self._packets.pop(mac, None)
+            self._reindex()
+            empty = not self._packets
+        self._replace_subs(mac, ())
+        if packet is None:
+            return
+        packet.close()
+        self.log.info("Discovery: %s removed from registry", mac)
+        if empty and self.stop_when_empty and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._empty.set)
+
+    def _replace_subs(self, mac, subs):
+        with self._lock:
+            old = self._source_subs.pop(mac, ())
+            if subs:
+                self._source_subs[mac] = subs
+        for sub in old:
+            sub.cancel()
+
+    def _rehost(self, packet: DiscoveryPacket, host: str):
+        """Move a registered packet to the alias listener for its new host."""
+        with self._lock:
+            if self._packets.get(packet.mac) is not packet or packet.host == host:
+                return
+            old, packet.host = packet.host, host
+            self._reindex()
+        self.log.info("Discovery: %s moved from %s to %s", packet.mac, old or "-", host or "-")
+
+    def _reindex(self):
+        self._ordered = tuple(self._packets.values())
+        by_host = {}
+        for packet in self._ordered:
+            by_host.setdefault(packet.host, []).append(packet)
+        self._by_host = {h: tuple(p) for h, p in by_host.items()}
+
+    def cameras(self) -> tuple:
+        return self._ordered
+
+    def responses(self, local_host: str = WILDCARD) -> list:
+        """Current response packets for a listener bound to `local_host`."""
+        packets = self._ordered if local_host == self.WILDCARD else self._by_host.get(local_host, ())
+        out = []
+        for packet in packets:
             try:
-                data, addr = sock.recvfrom(1024)
-            except socket.timeout:
-                continue
-
-            self.log.debug(f"Received discovery from {addr} | Raw: {data.hex()}")
-
-            # Basic match for "\x01\x00\x00\x00" (version=1, cmd=0, length=0)
-            if data[:4] == b"\x01\x00\x00\x00":
-                try:
-                    response = self.build_response()
-                except Exception as e:
-                    self.log.error(f"Failed to build discovery response: {e}")
-                    continue
-
-                self.log.debug(f"Sending discovery response: {response.hex()}")
-                sock.sendto(response, addr)
\ No newline at end of file
+                out.append(packet.response())
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log.error(f"Failed to build discovery response for {packet.mac}: {e}")
+        return out
+
+    # -------------------- serving --------------------
+
+    async def serve(self):
+        """
+        Answer discovery probes on the running event loop until cancelled
+        (or, with stop_when_empty, until every camera has been adopted).
+        """
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._empty = asyncio.Event()
+        transports = []
+        try:
+            for host in self.bind:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda host=host: DiscoveryProtocol(self, self.rate_limit, self.burst,
+                                                        self.dedup_window, local_host=host),
+                    sock=self._make_socket(host),
+                )
+                transports.append(transport)
+                self.log.info(f"Listening for discovery on {host}:{self.port} "
+                              f"for {len(self.responses(host))} camera(s)")
+
+            if not (self.stop_when_empty and not self._ordered):
+                await (self._empty.wait() if self.stop_when_empty else loop.create_future())
+            self.log.warning("Exiting discovery loop because canAdopt is False.")
+        finally:
+            for transport in transports:
+                transport.close()
+            self._loop = None
+            self.log.info("Discovery stats: %s", self.stats)
+
+    def _make_socket(self, host: str) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                if hasattr(socket, "SO_REUSEPORT"):
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                else:
+                    self.log.warning("SO_REUSEPORT not supported on this platform")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if self.interface:
+                sock.setsockopt(socket.SOL_SOCKET, getattr(socket, "SO_BINDTODEVICE", 25),
+                                self.interface.encode() + b"\0")
+            sock.bind((host, self.port))
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def close(self):
+        for mac in [p.mac for p in self._ordered]:
+            self.remove_camera(mac)
+
+    def start(self):
+        """Blocking entry point for running discovery on its own thread/loop."""
+        asyncio.run(self.serve())
+
+
+class DiscoveryResponder(DiscoveryServer):
+    """Single-camera discovery for `settings`; stops once the camera is adopted."""
+
+    def __init__(self, settings, logger=None, **kwargs):
+        kwargs.setdefault("stop_when_empty", True)
+        super().__init__(logger, **kwargs)
+        self.settings = settings
+        # keep a packet for build_response() even when already adopted
+        self.packet = self.add_camera(settings) or DiscoveryPacket(settings, self.log)
+
+    def response(self) -> bytearray:
+        return self.packet.response()
+
+    def build_response(self) -> bytes:
+        return bytes(self.packet.response())
@@ -16,8 +16,9 @@ class CameraDriver(ABC):
 
     # --- stat queries shown in your logs ---
     async def get_system_stats(self) -> Dict[str, Any]:
-        # Optional override; provide sane defaults
-        return {"cpu": 5, "memory": 20, "temperature": 45}
+        # Optional override: camera-side figures (e.g. its temperature), layered
+        # over DEFAULT_STATS and under the proxy host's own cpu/memory/temperature
+        return {}
 
     # --- settings calls the controller may send; return what you applied/accepted ---
     async def apply_video_settings(self, payload: Dict[str, Any]) -> Dict[str, Any]:
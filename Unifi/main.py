@@ -1,11 +1,15 @@
 from camera_data.camera_settings import CameraSettings
-from discovery_responder import DiscoveryResponder
+from discovery_responder import DiscoveryServer
 from api_server import VerboseAPIServer
 from utils.logging_utils import setup_logger
-from utils.uptime_utils import increment_uptime
+from utils.tls_utils import TLSContexts
+from utils.metrics import MetricsRegistry
+from metrics_server import (MetricsServer, export_http_stats, export_runtime_health, export_system_stats,
+                            export_tls_stats)
+from runtime import Runtime
 from Unifi.wss_manager import WssManager
-import threading, time, logging, signal
-from Unifi.upload_server import start_upload_server
+import os, time, logging
+from Unifi.upload_server import UploadServer
 
 def main():
     if not logging.getLogger().handlers:
@@ -23,49 +27,69 @@ def main():
     wss_log_level = settings.get("logging.wss.level", logging.INFO)
     upload_server_log_level = settings.get("logging.upload_server.level", logging.INFO)
 
-    # Uptime seed
+    # Uptime seed (volatile; "uptime" itself is derived from upSince on read)
     now_ms = int(time.time() * 1000)
-    settings.update({"upSince": now_ms, "lastSeen": None, "uptime": 0, "connectedSince": None})
-    threading.Thread(target=increment_uptime, args=(settings, setup_logger("uptime", settings.get("logging.uptime.level", logging.INFO))),
-                     daemon=True, name="UptimeThread").start()
-    main_log.info("Uptime counter started")
+    settings.update({"upSince": now_ms, "lastSeen": None, "connectedSince": None})
 
-    # Discovery
+    # One supervised event loop hosts every subsystem as a task; services
+    # stop in reverse order on SIGINT/SIGTERM
+    runtime = Runtime(logger=main_log)
+
+    # Prometheus metrics: GET /metrics on the API server, and on plain HTTP
+    # when METRICS_PORT is set (e.g. METRICS_PORT=9102)
+    metrics = MetricsRegistry()
+
+    # TLS contexts shared by the API/upload servers and the WSS client;
+    # cert.pem/key.pem are loaded once and reloaded when they change
+    tls = TLSContexts(logger=main_log)
+    tls.ensure_cert(host=settings.get("host"), mac=settings.get("mac"))
+    runtime.add("tls-reload", tls.watch)
+
+    # Discovery for this camera. DiscoveryServer can answer for several
+    # identities, but manage/WSS serve a single camera, so only it is advertised
     if settings.get("canAdopt", True):
         disc_log = setup_logger("discovery", disc_log_level)
-        responder = DiscoveryResponder(settings, logger=disc_log)
-        threading.Thread(target=responder.start, daemon=True, name="DiscoveryThread").start()
-        disc_log.info("Discovery responder started")
+        discovery = DiscoveryServer(
+            logger=disc_log,
+            stop_when_empty=True,
+            bind=settings.get("discovery.bind") or ("0.0.0.0",),    # e.g. ["0.0.0.0", "192.168.1.61"]
+            reuse_port=bool(settings.get("discovery.reusePort", False)),
+            interface=settings.get("discovery.interface"),
+        )
+        discovery.add_camera(settings)
+        runtime.add("discovery", discovery.serve)     # finishes once every camera is adopted
+        disc_log.info("Discovery responder registered for %d camera(s)", len(discovery.cameras()))
     else:
         main_log.warning("Discovery responder skipped as it was previously completed")
 
-    # Token event & stop event
-    token_event = threading.Event()
-    stop_event = threading.Event()
-
-    # API server (passes token_event so it can .set() when token arrives)
+    # API server (WSS manager subscribes to the mgmt.* settings it writes)
     api_log = setup_logger("api_https", api_log_level)
-    api_server = VerboseAPIServer(port=443, use_ssl=True, settings=settings, logger=api_log, token_event=token_event)
-    threading.Thread(target=api_server.start, daemon=True, name="APIServerThread").start()
-    api_log.info("HTTPS API server started on port 443")
+    api_server = VerboseAPIServer(port=443, use_ssl=True, settings=settings, logger=api_log, tls=tls,
+                                  metrics=metrics)
+    runtime.add("api", api_server.serve)
 
-    # start Upload server
+    # Upload server
     upload_server_log = setup_logger("upload_server", upload_server_log_level)
-    start_upload_server(logger=upload_server_log)
+    upload_server = UploadServer(logger=upload_server_log, tls=tls)
+    runtime.add("upload", upload_server.serve)
 
     # WSS manager (waits for token/host)
     wss_log = setup_logger("wss", wss_log_level)
-    wss_mgr = WssManager(settings, token_event, stop_event, wss_log)
-    wss_mgr.start()
+    wss_mgr = WssManager(settings, wss_log, tls=tls, metrics=metrics)
+    runtime.add("wss", wss_mgr.run)
 
-    # Shutdown handling
-    def handle_sig(sig, frame):
-        main_log.info("Shutting down...")
-        stop_event.set()
+    export_http_stats(metrics, {"api": api_server.server, "upload": upload_server.server})
+    export_tls_stats(metrics, tls)
+    export_runtime_health(metrics, runtime)
+    export_system_stats(metrics, wss_mgr.system_stats)
+    metrics_port = int(os.environ.get("METRICS_PORT") or 0)
+    if metrics_port:
+        runtime.add("metrics", MetricsServer(metrics, port=metrics_port, logger=main_log).serve)
 
-    signal.signal(signal.SIGINT, handle_sig)
-    signal.signal(signal.SIGTERM, handle_sig)
-    stop_event.wait()
+    # Blocks until SIGINT/SIGTERM, then cancels wss, upload, api, discovery, tls-reload
+    runtime.run_forever()
+    main_log.info("TLS stats: %s", tls.stats())
+    settings.close()
     main_log.info("Bye!")
 
 if __name__ == "__main__":
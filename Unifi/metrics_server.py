@@ -0,0 +1,99 @@
+import logging
+from typing import Dict
+
+from utils.http_server import AsyncHTTPServer, HttpRequest, HttpResponse
+from utils.metrics import CONTENT_TYPE, MetricsRegistry
+
+METRICS_PATH = "/metrics"
+
+# AsyncHTTPServer.stats keys -> (metric suffix, type, help)
+_HTTP_STATS = (
+    ("connections", "connections_total", "counter", "Connections accepted"),
+    ("requests", "requests_total", "counter", "Requests served"),
+    ("errors", "errors_total", "counter", "Requests that failed with a handler error"),
+    ("timeouts", "timeouts_total", "counter", "Connections closed on a timeout"),
+    ("active", "active_connections", "gauge", "Connections currently open"),
+)
+
+
+class MetricsServer:
+    """
+    Plain-HTTP /metrics listener for scrapers that should not need to
+    talk TLS to the camera port (the API server also serves /metrics).
+
+    Usage:
+        runtime.add("metrics", MetricsServer(metrics, port=9102, logger=log).serve)
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "0.0.0.0", port: int = 9102, logger=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.log = logger or logging.getLogger(__name__)
+        self.server = AsyncHTTPServer(self.handle, host, port, None, self.log,
+                                      request_timeout=10.0, keep_alive_timeout=60.0)
+
+    async def handle(self, request: HttpRequest) -> HttpResponse:
+        if request.method != "GET":
+            return HttpResponse(405, headers={"Allow": "GET"})
+        if request.path.split("?", 1)[0] != METRICS_PATH:
+            return HttpResponse(404)
+        return HttpResponse(200, self.registry.render().encode(), {"Content-Type": CONTENT_TYPE})
+
+    async def serve(self):
+        self.log.info("Metrics listening on http://%s:%d%s", self.host, self.port, METRICS_PATH)
+        await self.server.serve()
+
+
+def export_http_stats(registry: MetricsRegistry, servers: Dict[str, AsyncHTTPServer]):
+    """http_* families from each server's stats dict, labelled server="<name>"."""
+    for key, suffix, kind, doc in _HTTP_STATS:
+        registry.add_collector(
+            f"http_{suffix}", kind, doc,
+            lambda k=key: [({"server": name}, srv.stats[k]) for name, srv in servers.items()],
+        )
+
+
+def export_tls_stats(registry: MetricsRegistry, tls):
+    """TLS handshake counters (server full vs resumed; client handshakes are always full) and reloads."""
+    def handshakes():
+        stats = tls.stats()
+        yield {"side": "server", "mode": "full"}, stats["server"]["full"]
+        yield {"side": "server", "mode": "resumed"}, stats["server"]["resumed"]
+        yield {"side": "client", "mode": "full"}, stats["client"]["handshakes"]
+
+    registry.add_collector("tls_handshakes_total", "counter", "TLS handshakes by side and mode", handshakes)
+    registry.add_collector("tls_reloads_total", "counter", "Certificate reloads",
+                           lambda: [({}, tls.stats()["reloads"])])
+    registry.add_collector("tls_reload_errors_total", "counter", "Certificate reloads that failed",
+                           lambda: [({}, tls.stats()["reload_errors"])])
+
+
+def export_system_stats(registry: MetricsRegistry, sampler):
+    """Host and process figures from the GetSystemStats sampler (absent until measured)."""
+    def value(source, key):
+        return lambda: [({}, getattr(sampler, source)[key])] if key in getattr(sampler, source) else []
+
+    registry.add_collector("system_cpu_percent", "gauge", "Host CPU busy over the last sample interval",
+                           value("host", "cpu"))
+    registry.add_collector("system_memory_percent", "gauge", "Host memory in use (MemTotal - MemAvailable)",
+                           value("host", "memory"))
+    registry.add_collector("system_temperature_celsius", "gauge", "Hottest thermal zone",
+                           value("host", "temperature"))
+    registry.add_collector("process_cpu_percent", "gauge", "This process's CPU use, as a share of all cores",
+                           value("process", "cpu"))
+    registry.add_collector("process_resident_memory_bytes", "gauge", "This process's resident set size",
+                           value("process", "rss"))
+
+
+def export_runtime_health(registry: MetricsRegistry, runtime):
+    """Per-service up/restart figures from Runtime.health()."""
+    registry.add_collector(
+        "service_up", "gauge", "1 while the supervised service is running",
+        lambda: [({"service": name}, 1 if h["state"] == "running" else 0)
+                 for name, h in runtime.health().items()],
+    )
+    registry.add_collector(
+        "service_restarts_total", "counter", "Restarts after a failure",
+        lambda: [({"service": name}, h["restarts"]) for name, h in runtime.health().items()],
+    )
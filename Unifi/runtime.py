@@ -0,0 +1,151 @@
+import time
+import signal
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+
+class Service:
+    """One supervised subsystem: a coroutine factory plus its health record."""
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable], restart: bool = True,
+                 backoff_s: float = 1.0, max_backoff_s: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.restart = restart
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.task: Optional[asyncio.Task] = None
+        self.state = "pending"      # pending|running|restarting|failed|finished|stopped
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    def health(self) -> dict:
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "uptime_s": round(time.monotonic() - self.started_at, 1)
+            if self.started_at is not None and self.state == "running" else 0.0,
+        }
+
+
+class Runtime:
+    """
+    Single asyncio runtime hosting every subsystem as a supervised task.
+
+    Services start in registration order. A service that raises is restarted
+    with exponential backoff (restart=False leaves it failed); one that returns
+    normally is marked finished (e.g. discovery after adoption). SIGINT/SIGTERM
+    or request_stop() cancel the services in reverse order, each given
+    `stop_timeout` seconds to unwind.
+
+    Usage:
+        runtime = Runtime(logger=log)
+        runtime.add("api", api_server.serve)
+        runtime.add("wss", wss_mgr.run)
+        runtime.run_forever()
+    """
+
+    def __init__(self, logger=None, stop_timeout: float = 5.0):
+        self.log = logger or logging.getLogger(__name__)
+        self.stop_timeout = stop_timeout
+        self.services = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def add(self, name: str, factory: Callable[[], Awaitable], **kwargs) -> Service:
+        """Register `factory` (called again on every restart) under `name`."""
+        svc = Service(name, factory, **kwargs)
+        self.services.append(svc)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._start, svc)
+        return svc
+
+    def health(self) -> dict:
+        return {svc.name: svc.health() for svc in self.services}
+
+    def request_stop(self):
+        """Begin an ordered shutdown; safe to call from any thread or signal handler."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    # -------------------- supervision --------------------
+
+    def _start(self, svc: Service):
+        svc.task = asyncio.create_task(self._supervise(svc), name=svc.name)
+
+    async def _supervise(self, svc: Service):
+        backoff = svc.backoff_s
+        while True:
+            svc.state = "running"
+            svc.started_at = time.monotonic()
+            try:
+                await svc.factory()
+            except asyncio.CancelledError:
+                svc.state = "stopped"
+                raise
+            except Exception as e:
+                svc.last_error = f"{type(e).__name__}: {e}"
+                if time.monotonic() - svc.started_at > 60:
+                    backoff = svc.backoff_s     # ran healthy for a while; start over
+                if not svc.restart:
+                    svc.state = "failed"
+                    self.log.error("Service %s failed: %s", svc.name, svc.last_error)
+                    return
+                svc.state = "restarting"
+                svc.restarts += 1
+                self.log.warning("Service %s failed (%s); restarting in %.1fs",
+                                 svc.name, svc.last_error, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, svc.max_backoff_s)
+                continue
+            svc.state = "finished"
+            self.log.info("Service %s finished", svc.name)
+            return
+
+    # -------------------- lifecycle --------------------
+
+    async def run(self):
+        """Start every service, wait for a stop request, then shut down in reverse order."""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._on_signal, sig)
+            except (NotImplementedError, RuntimeError):
+                pass    # not the main thread / unsupported platform
+
+        for svc in self.services:
+            self._start(svc)
+        try:
+            await self._stop.wait()
+        finally:
+            await self._shutdown()
+            self._loop = None
+
+    def _on_signal(self, sig):
+        self.log.info("Shutting down (%s)...", signal.Signals(sig).name)
+        self._stop.set()
+
+    async def _shutdown(self):
+        for svc in reversed(self.services):
+            task = svc.task
+            if task is None or task.done():
+                continue
+            task.cancel()
+            try:
+                await asyncio.wait_for(asyncio.shield(task), self.stop_timeout)
+            except asyncio.CancelledError:
+                pass
+            except asyncio.TimeoutError:
+                self.log.warning("Service %s did not stop within %.0fs", svc.name, self.stop_timeout)
+            except Exception as e:
+                self.log.warning("Service %s raised during shutdown: %s", svc.name, e)
+            svc.state = "stopped"
+        self.log.info("Runtime health at shutdown: %s", self.health())
+
+    def run_forever(self):
+        """Blocking entry point: run the runtime on a new event loop in this thread."""
+        asyncio.run(self.run())
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import hashlib
+import logging
+import pathlib
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+DEFAULT_DIR = "debug_snaps"     # SNAPSHOT_DEBUG_DIR, relative to the working directory
+DEFAULT_KEEP = 5                # SNAPSHOT_DEBUG_KEEP
+DEFAULT_QUEUE = 4               # JPEGs waiting for the writer before new ones are dropped
+PATTERN = "snapshot_*.jpg"
+
+
+class SnapshotDebugWriter:
+    """
+    Writes a copy of each camera snapshot to disk for inspection, off the
+    event loop.
+
+    submit() only queues the JPEG (bounded; when the writer falls behind
+    new snapshots are dropped and counted), so the WSS loop never waits on
+    disk. One writer task hashes and writes each JPEG in a worker thread.
+    Written files are kept in an in-memory index, oldest first, so
+    retention deletes exactly the files past `keep` without listing the
+    directory; files left from an earlier run are indexed once, before
+    the first write.
+
+    Names are snapshot_<UTC time to the ms>_<sequence>_<sha256 prefix>.jpg,
+    unique within a run and sorting in write order.
+
+    ENV overrides
+      SNAPSHOT_DEBUG=true → enable the writer
+      SNAPSHOT_DEBUG_DIR=debug_snaps → where copies are written
+      SNAPSHOT_DEBUG_KEEP=5 → newest copies kept
+
+    Usage:
+        debug = SnapshotDebugWriter(logger=log)
+        debug.start()
+        debug.submit(jpeg)
+        ...
+        await debug.close()
+    """
+
+    def __init__(self, directory: Optional[str] = None, keep: Optional[int] = None, logger=None, *,
+                 queue_size: int = DEFAULT_QUEUE):
+        self.directory = pathlib.Path(directory or os.environ.get("SNAPSHOT_DEBUG_DIR") or DEFAULT_DIR)
+        self.keep = max(1, int(keep or os.environ.get("SNAPSHOT_DEBUG_KEEP") or DEFAULT_KEEP))
+        self.log = logger or logging.getLogger(__name__)
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._index = deque()       # written paths, oldest first
+        self._ready = False         # directory created and existing files indexed
+        self._seq = 0
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,       # queue full
+            "pruned": 0,
+            "errors": 0,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(self.queue_size)
+            self._task = asyncio.create_task(self._run(), name="snapshot-debug")
+
+    def submit(self, jpeg: bytes) -> bool:
+        """Queue a copy of `jpeg`; never blocks. False if the writer is not running or is behind."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(jpeg)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    async def _run(self):
+        while True:
+            jpeg = await self._queue.get()
+            self._seq += 1
+            try:
+                await asyncio.to_thread(self._write, self._seq, jpeg)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log.warning("Snapshot debug failed: %s", e)
+
+    # -------------------- worker thread --------------------
+
+    def _prepare(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(self.directory.glob(PATTERN), key=lambda f: f.stat().st_mtime)
+        self._index.extend(existing)
+        self._ready = True
+
+    def _write(self, seq: int, jpeg: bytes):
+        if not self._ready:
+            self._prepare()
+        sha = hashlib.sha256(jpeg).hexdigest()
+        self.log.info("Snapshot debug: len=%d sha256=%s… head=%s", len(jpeg), sha[:12], jpeg[:8].hex())
+
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")[:-3]
+        out = self.directory / f"snapshot_{stamp}_{seq:06d}_{sha[:12]}.jpg"
+        out.write_bytes(jpeg)
+        self._index.append(out)
+        self.stats["written"] += 1
+        self.log.info("Saved snapshot for debug: %s (%d bytes)", out, len(jpeg))
+        self._prune()
+
+    def _prune(self):
+        while len(self._index) > self.keep:
+            old = self._index.popleft()
+            try:
+                old.unlink()
+                self.stats["pruned"] += 1
+                self.log.debug("Snapshot debug: pruned %s", old)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.log.warning("Snapshot debug: failed to prune %s: %s", old, e)
+
+    async def close(self):
+        """Stop the writer; snapshots still queued are dropped."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._queue = None
@@ -0,0 +1,226 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+DEFAULT_TTL_MS = 1000                   # SNAPSHOT_TTL_MS
+DEFAULT_PREFETCH_MIN_MS = 1000          # SNAPSHOT_PREFETCH_MIN_MS
+DEFAULT_PREFETCH_MAX_MS = 8000          # SNAPSHOT_PREFETCH_MAX_MS
+DEFAULT_PREFETCH_MAX_AGE_MS = 10000     # SNAPSHOT_PREFETCH_MAX_AGE_MS
+DEFAULT_PREFETCH_IDLE_S = 300           # SNAPSHOT_PREFETCH_IDLE_S
+PREFETCH_TIMEOUT_S = 5                  # driver timeout for background refreshes
+
+
+def _env_ms(name: str, default: int) -> float:
+    return int(os.environ.get(name) or default) / 1000
+
+
+def _consume(fut: asyncio.Future):
+    # every caller may have timed out already; keep asyncio from warning
+    if not fut.cancelled():
+        fut.exception()
+
+
+class SnapshotService:
+    """
+    Snapshot source shared by every GetRequest: sits between WssManager and
+    the camera driver so a burst of requests costs one camera fetch.
+
+      - a JPEG fetched less than `ttl` seconds ago is served from memory
+      - while a fetch is running, further callers join it instead of
+        starting their own; the fetch is shielded, so a caller that gives
+        up (timeout, connection closed) does not cancel it for the others
+      - failures are passed to every joined caller and never cached
+
+    With `prefetch`, a background task (start()) keeps the JPEG fresh so
+    requests are answered from memory while it is under `max_age`. The
+    refresh interval drops to `min_interval` whenever a request arrives
+    and doubles after each refresh with no request in between, up to
+    `max_interval`; after `idle_pause` seconds without requests it stops
+    until the next one. Refreshes share the single-flight fetch, and a
+    failed refresh keeps the previous JPEG until it ages out.
+
+    ENV overrides
+      SNAPSHOT_TTL_MS=1000 → serve a cached JPEG younger than this (0 = single-flight only)
+      SNAPSHOT_PREFETCH=false → keep a JPEG refreshed in the background
+      SNAPSHOT_PREFETCH_MIN_MS=1000 → refresh interval while the controller is asking
+      SNAPSHOT_PREFETCH_MAX_MS=8000 → slowest refresh interval while it is not
+      SNAPSHOT_PREFETCH_MAX_AGE_MS=10000 → oldest prefetched JPEG served without a fetch
+      SNAPSHOT_PREFETCH_IDLE_S=300 → stop refreshing after this long without requests
+
+    Usage:
+        snapshots = SnapshotService(lambda t: driver.get_snapshot_jpeg(timeout_s=t), logger=log)
+        snapshots.start()       # prefetch task, when enabled
+        jpeg = await snapshots.get(timeout_s=5)
+        ...
+        await snapshots.close()
+    """
+
+    def __init__(self, fetch: Callable[[int], Awaitable[bytes]], logger=None, *,
+                 ttl: Optional[float] = None, prefetch: Optional[bool] = None,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 max_age: Optional[float] = None, idle_pause: Optional[float] = None,
+                 on_fetch: Optional[Callable[[float, bool, bool], None]] = None,
+                 on_serve: Optional[Callable[[float], None]] = None):
+        self._fetch = fetch     # (timeout_s) -> JPEG bytes
+        self.log = logger or logging.getLogger(__name__)
+        if ttl is None:
+            ttl = _env_ms("SNAPSHOT_TTL_MS", DEFAULT_TTL_MS)
+        self.ttl = max(0.0, float(ttl))
+        if prefetch is None:
+            prefetch = os.getenv("SNAPSHOT_PREFETCH", "").strip().lower() in {"true", "1"}
+        self.prefetch = prefetch
+        self.min_interval = min_interval or _env_ms("SNAPSHOT_PREFETCH_MIN_MS", DEFAULT_PREFETCH_MIN_MS)
+        self.max_interval = max(self.min_interval,
+                                max_interval or _env_ms("SNAPSHOT_PREFETCH_MAX_MS", DEFAULT_PREFETCH_MAX_MS))
+        self.max_age = max_age or _env_ms("SNAPSHOT_PREFETCH_MAX_AGE_MS", DEFAULT_PREFETCH_MAX_AGE_MS)
+        self.idle_pause = idle_pause or float(os.environ.get("SNAPSHOT_PREFETCH_IDLE_S") or DEFAULT_PREFETCH_IDLE_S)
+        self.on_fetch = on_fetch    # (seconds, background, ok) after each camera fetch
+        self.on_serve = on_serve    # (age of the JPEG handed out) for every get()
+        self._jpeg: Optional[bytes] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        self._interval = self.min_interval
+        self._last_request: Optional[float] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0,          # served from the cache
+            "misses": 0,        # started a camera fetch
+            "joins": 0,         # waited on a fetch another caller started
+            "errors": 0,        # fetches that failed
+            "prefetches": 0,    # background refreshes started
+        }
+
+    @property
+    def interval(self) -> float:
+        """Current prefetch refresh interval (0 while prefetch is off or paused)."""
+        if self._task is None or self._paused(time.monotonic()):
+            return 0.0
+        return self._interval
+
+    def age(self) -> Optional[float]:
+        """Seconds since the held JPEG was fetched, None if there is none."""
+        return time.monotonic() - self._fetched_at if self._jpeg is not None else None
+
+    def cached(self) -> Optional[bytes]:
+        """The held JPEG if it may still be served (TTL, or max_age while prefetching)."""
+        limit = max(self.ttl, self.max_age) if self._task is not None else self.ttl
+        if self._jpeg is not None and time.monotonic() - self._fetched_at < limit:
+            return self._jpeg
+        return None
+
+    async def get(self, timeout_s: int = 5) -> bytes:
+        """A JPEG no older than the TTL; raises what the driver raised, or TimeoutError."""
+        if self._task is not None:
+            self._note_request()
+        jpeg = self.cached()
+        if jpeg is not None:
+            self.stats["hits"] += 1
+            if self.on_serve is not None:
+                self.on_serve(time.monotonic() - self._fetched_at)
+            return jpeg
+
+        fut = self._inflight
+        if fut is None:
+            self.stats["misses"] += 1
+            fut = self._start_fetch(timeout_s, background=False)
+        else:
+            self.stats["joins"] += 1
+        jpeg = await asyncio.wait_for(asyncio.shield(fut), timeout_s)
+        if self.on_serve is not None:
+            self.on_serve(time.monotonic() - self._fetched_at)
+        return jpeg
+
+    def _start_fetch(self, timeout_s: int, background: bool) -> asyncio.Future:
+        fut = self._inflight = asyncio.ensure_future(self._run(timeout_s, background))
+        fut.add_done_callback(_consume)
+        return fut
+
+    async def _run(self, timeout_s: int, background: bool) -> bytes:
+        t0 = time.perf_counter()
+        try:
+            jpeg = await asyncio.wait_for(self._fetch(timeout_s), timeout_s)
+        except BaseException:
+            self.stats["errors"] += 1
+            if self.on_fetch is not None:
+                self.on_fetch(time.perf_counter() - t0, background, False)
+            raise
+        finally:
+            self._inflight = None
+        self._jpeg = jpeg
+        self._fetched_at = time.monotonic()
+        if self.on_fetch is not None:
+            self.on_fetch(time.perf_counter() - t0, background, True)
+        return jpeg
+
+    # -------------------- prefetch --------------------
+
+    def start(self):
+        """Start the prefetch task if prefetch is enabled (idle until the first request)."""
+        if self.prefetch and self._task is None:
+            self._task = asyncio.create_task(self._prefetch_loop(), name="snapshot-prefetch")
+
+    def _paused(self, now: float) -> bool:
+        return self._last_request is None or now - self._last_request >= self.idle_pause
+
+    def _note_request(self):
+        now = time.monotonic()
+        wake = self._paused(now) or self._interval > self.min_interval
+        self._last_request = now
+        self._interval = self.min_interval
+        if wake:
+            self._wake.set()
+
+    async def _prefetch_loop(self):
+        while True:
+            now = time.monotonic()
+            if self._paused(now):
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            # refresh once the held JPEG is `interval` old
+            delay = self._interval - (now - self._fetched_at) if self._jpeg is not None else 0.0
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+
+            before = self._last_request
+            fut = self._inflight
+            if fut is None:
+                self.stats["prefetches"] += 1
+                fut = self._start_fetch(PREFETCH_TIMEOUT_S, background=True)
+            try:
+                await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log.debug("Snapshot prefetch failed: %s", e)
+                await self._sleep(self._interval)
+            if self._last_request == before:
+                # nobody asked since the last refresh: back off
+                self._interval = min(self.max_interval, self._interval * 2)
+
+    async def _sleep(self, seconds: float):
+        """Sleep, cut short by a request that changes the schedule."""
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self):
+        """Stop prefetching, cancel a running fetch and drop the cached JPEG."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        fut, self._inflight = self._inflight, None
+        if fut is not None:
+            fut.cancel()
+            await asyncio.gather(fut, return_exceptions=True)
+        self._jpeg = None
+        self._last_request = None
+        self._interval = self.min_interval
+        self._wake = asyncio.Event()
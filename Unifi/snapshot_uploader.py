@@ -0,0 +1,147 @@
+import time
+import asyncio
+import logging
+from typing import Dict, NamedTuple, Optional, Set, Union
+
+import aiohttp
+
+from Unifi.utils.tls_utils import TLSContexts
+
+Body = Union[bytes, bytearray, memoryview]
+
+
+class UploadResult(NamedTuple):
+    status: Optional[int]       # HTTP status, None if the request failed
+    bytes: int
+    seconds: float              # request start to response read
+    reused: bool                # went over a pooled keep-alive connection
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (200, 204)
+
+
+class SnapshotUploader:
+    """
+    Long-lived aiohttp client for snapshot PUTs to the controller.
+
+    Connections are pooled per controller host and kept alive between
+    uploads, so a snapshot normally costs one request on a warm TLS
+    connection instead of TCP + TLS handshakes and a thread hop (asyncio
+    cannot resume TLS sessions, so keep-alive is what saves the handshake;
+    new connections are counted in TLSContexts client stats). Bodies
+    (bytes/bytearray/memoryview) are written as-is, without a copy.
+
+    The session is created on first use on the running loop and rebuilt
+    when the TLS client context changes (certificate reload); the old one
+    is closed as soon as its last in-flight upload finishes.
+
+    Usage:
+        uploader = SnapshotUploader(tls, logger=log)
+        result = await uploader.upload(uri, jpeg, timeout_s=10)
+        ...
+        await uploader.close()
+    """
+
+    def __init__(self, tls: TLSContexts, logger=None, *, limit_per_host: int = 4,
+                 keepalive_timeout: float = 60.0):
+        self.tls = tls
+        self.log = logger or logging.getLogger(__name__)
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight: Dict[aiohttp.ClientSession, int] = {}
+        self._retired: Set[aiohttp.ClientSession] = set()   # replaced, closed once idle
+        self._closing: Set[asyncio.Task] = set()
+        self._ssl = None
+        self.stats = {
+            "uploads": 0,
+            "errors": 0,
+            "bytes": 0,
+            "connections": 0,       # new TCP/TLS connections opened
+            "reused": 0,            # uploads that rode an existing connection
+        }
+
+    async def _on_create(self, session, ctx, params):
+        ctx.trace_request_ctx["reused"] = False
+        self.stats["connections"] += 1
+        if ctx.trace_request_ctx["tls"]:
+            self.tls.record_client_handshake()
+
+    async def _on_reuse(self, session, ctx, params):
+        ctx.trace_request_ctx["reused"] = True
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        ssl_ctx = self.tls.client_context()
+        if self._session is not None and not self._session.closed and ssl_ctx is self._ssl:
+            return self._session
+        if self._session is not None and not self._session.closed:
+            # certificate reloaded: in-flight uploads finish on the old pool,
+            # which is closed after the last of them
+            self.log.debug("Snapshot uploader: TLS context changed; new connection pool")
+            if self._in_flight.get(self._session):
+                self._retired.add(self._session)
+            else:
+                self._close_soon(self._session)
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_create)
+        trace.on_connection_reuseconn.append(self._on_reuse)
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_ctx,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._ssl = ssl_ctx
+        self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace],
+                                              auto_decompress=False)
+        return self._session
+
+    def _close_soon(self, session: aiohttp.ClientSession):
+        task = asyncio.get_running_loop().create_task(session.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def upload(self, uri: str, body: Body, timeout_s: float = 10.0,
+                     content_type: str = "image/jpeg") -> UploadResult:
+        """PUT `body` to `uri`; never raises for HTTP/network errors (see UploadResult.error)."""
+        session = self._get_session()
+        size = len(body) if not isinstance(body, memoryview) else body.nbytes
+        trace_ctx = {"reused": False, "tls": uri.startswith("https:")}
+        t0 = time.perf_counter()
+        self.stats["uploads"] += 1
+        self._in_flight[session] = self._in_flight.get(session, 0) + 1
+        try:
+            async with session.put(
+                uri, data=body, headers={"Content-Type": content_type},
+                timeout=aiohttp.ClientTimeout(total=timeout_s), trace_request_ctx=trace_ctx,
+            ) as resp:
+                await resp.read()       # drain so the connection goes back to the pool
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            self.stats["errors"] += 1
+            return UploadResult(None, size, time.perf_counter() - t0, trace_ctx["reused"],
+                                f"{type(e).__name__}: {e}")
+        finally:
+            self._release(session)
+        self.stats["bytes"] += size
+        if trace_ctx["reused"]:
+            self.stats["reused"] += 1
+        return UploadResult(status, size, time.perf_counter() - t0, trace_ctx["reused"])
+
+    def _release(self, session: aiohttp.ClientSession):
+        left = self._in_flight.pop(session) - 1
+        if left:
+            self._in_flight[session] = left
+        elif session in self._retired:
+            self._retired.discard(session)
+            self._close_soon(session)
+
+    async def close(self):
+        sessions = [*self._retired, self._session]
+        self._session, self._retired = None, set()
+        for session in sessions:
+            if session is not None and not session.closed:
+                await session.close()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
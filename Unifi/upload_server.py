@@ -1,127 +1,393 @@
 import os
-import ssl
+import json
 import time
+import shutil
+import asyncio
 import hashlib
+import tempfile
 import threading
+from collections import deque
 from datetime import datetime, timezone
-from http.server import HTTPServer, BaseHTTPRequestHandler
 from typing import Optional
 
+from utils.http_server import AsyncHTTPServer, HttpError, HttpRequest, HttpResponse
+from utils.tls_utils import TLSContexts
+
 SNAP_PREFIX = "/internal/camera-upload/"
 DEBUG_LAST_PATH = "/debug/last-snapshot"
+DEBUG_RING_PATH = "/debug/snapshots"
+
+CHUNK_BYTES = 64 * 1024
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024       # UPLOAD_MAX_BYTES
+DEFAULT_SPOOL_BYTES = 1024 * 1024          # UPLOAD_SPOOL_BYTES
+DEFAULT_RING_SIZE = 8                      # UPLOAD_RING_SIZE
+DEFAULT_RING_BYTES = 32 * 1024 * 1024      # UPLOAD_RING_BYTES
+
 
 def _utc_ts() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-def _safe_int(s: str, default: int = 0) -> int:
+
+def _int_option(value, env: str, default: int) -> int:
+    """Explicit value (0 included), else the ENV override, else the default."""
+    if value is not None:
+        return int(value)
+    return int(os.environ.get(env) or default)
+
+
+def _copy_to_path(src, path: str):
+    src.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(src, f, CHUNK_BYTES)
+
+
+def _pread_and_close(fd: int, length: int) -> bytes:
     try:
-        return int(s)
-    except Exception:
-        return default
-
-def _make_handler(logger, save_dir: Optional[str], preview_bytes: int):
-    class _UploadHandler(BaseHTTPRequestHandler):
-        # give handler access to logger/config
-        _logger = logger
-        _save_dir = save_dir
-        _preview_bytes = max(0, preview_bytes)
-
-        def do_GET(self):
-            # Simple debug endpoint to fetch the last snapshot the server saw
-            if self.path == DEBUG_LAST_PATH:
-                data = getattr(self.server, "last_snapshot_bytes", None)
-                meta = getattr(self.server, "last_snapshot_meta", {})
-                if not data:
-                    self.send_response(404); self.end_headers()
-                    return
-                self.send_response(200)
-                self.send_header("Content-Type", "image/jpeg")
-                self.send_header("X-Bytes", str(len(data)))
-                # bubble some context in headers for quick checks
-                for k, v in meta.items():
-                    self.send_header(f"X-Meta-{k}", str(v))
-                self.end_headers()
-                self.wfile.write(data)
-                return
-
-            self.send_response(404); self.end_headers()
-
-            # Log at DEBUG so it doesn’t spam unless enabled
-            if self._logger:
-                self._logger.debug("GET %s from %s -> 404",
-                                   self.path, self.client_address[0])
-
-        def do_PUT(self):
-            # Basic routing
-            if not self.path.startswith(SNAP_PREFIX):
-                self.send_response(404); self.end_headers()
-                if self._logger:
-                    self._logger.warning("PUT %s from %s -> 404 (unknown path)",
-                                         self.path, self.client_address[0])
-                return
-
-            try:
-                # Read request info
-                length = _safe_int(self.headers.get("Content-Length", "0"))
-                ctype  = self.headers.get("Content-Type", "")
-                agent  = self.headers.get("User-Agent", "")
-
-                # Drain body
-                body = self.rfile.read(length) if length > 0 else b""
-
-                # Quick fingerprint
-                sha256 = hashlib.sha256(body).hexdigest() if body else "-"
-                head_preview = body[:self._preview_bytes] if self._preview_bytes else b""
-
-                # Persist for debug endpoint
-                self.server.last_snapshot_bytes = body
-                self.server.last_snapshot_meta = {
-                    "when": _utc_ts(),
-                    "length": length,
-                    "sha256": sha256,
-                    "path": self.path,
-                    "client": self.client_address[0],
-                }
-
-                # Optional save-to-disk
-                saved_path = None
-                if self._save_dir:
-                    os.makedirs(self._save_dir, exist_ok=True)
-                    token = self.path.split("/")[-1] or "snapshot"
+        return os.pread(fd, length, 0)
+    finally:
+        os.close(fd)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value covers `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class SnapshotEntry:
+    """
+    One stored upload: `data` for uploads that stayed in memory, `file` (the
+    upload's spool, already on disk) for larger ones.
+    """
+
+    __slots__ = ("seq", "data", "file", "length", "meta", "etag")
+
+    def __init__(self, seq: int, body, meta: dict):
+        self.seq = seq
+        self.data = body if isinstance(body, bytes) else None
+        self.file = None if self.data is not None else body
+        self.length = meta["length"]
+        self.meta = meta
+        self.etag = f'"{meta["sha256"]}"'
+
+    async def read(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        # The worker reads its own duplicate of the descriptor (pread leaves the
+        # shared position alone), so the ring can evict and close the entry
+        # mid-read without the number being reused under the reader.
+        fd = os.dup(self.file.fileno())
+        return await asyncio.to_thread(_pread_and_close, fd, self.length)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class SnapshotRing:
+    """
+    The last `capacity` uploads (bytes or spool file + metadata), oldest
+    evicted first once the stored bytes would exceed `max_bytes`. Entries
+    get an increasing sequence number that stays valid until they are
+    evicted; the ring owns (and closes) the spool files it is given.
+    Only touched from the event loop.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RING_SIZE, max_bytes: int = DEFAULT_RING_BYTES):
+        self.capacity = max(1, capacity)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self._entries = deque()
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, body, meta: dict) -> Optional[SnapshotEntry]:
+        """
+        Store one snapshot (bytes, or a spool file of meta["length"] bytes);
+        returns None, without taking the file, if it alone exceeds the byte
+        budget.
+        """
+        length = meta["length"]
+        if length > self.max_bytes:
+            return None
+        self._seq += 1
+        entry = SnapshotEntry(self._seq, body, meta)
+        entries = self._entries
+        while entries and (len(entries) >= self.capacity or self.bytes + length > self.max_bytes):
+            old = entries.popleft()
+            old.close()
+            self.bytes -= old.length
+            self.evicted += 1
+        entries.append(entry)
+        self.bytes += length
+        return entry
+
+    def clear(self):
+        while self._entries:
+            self._entries.popleft().close()
+        self.bytes = 0
+
+    def latest(self) -> Optional[SnapshotEntry]:
+        return self._entries[-1] if self._entries else None
+
+    def find(self, key: str) -> Optional[SnapshotEntry]:
+        """
+        Look up by sequence number ("12"), "latest", or sha256 (full or a
+        prefix of at least 8 hex digits).
+        """
+        if key == "latest":
+            return self.latest()
+        if key.isdigit() and len(key) < 8:
+            seq = int(key)
+            for entry in self._entries:
+                if entry.seq == seq:
+                    return entry
+            return None
+        if len(key) >= 8:
+            key = key.lower()
+            for entry in reversed(self._entries):
+                if entry.meta["sha256"].startswith(key):
+                    return entry
+        return None
+
+    def index(self) -> dict:
+        return {
+            "latest": self._seq,
+            "count": len(self._entries),
+            "bytes": self.bytes,
+            "capacity": self.capacity,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "entries": [dict(entry.meta, seq=entry.seq) for entry in reversed(self._entries)],
+        }
+
+
+class UploadServer:
+    """
+    HTTPS upload server used by the controller for snapshots.
+
+    Bodies (Content-Length or Transfer-Encoding: chunked) are streamed in
+    CHUNK_BYTES pieces: hashed incrementally and written to a spooled file
+    that stays in memory up to `spool_bytes` and moves to disk past it, so
+    memory per upload is bounded whatever the image size. Writes that
+    touch the disk (the rollover and everything after) run in a worker
+    thread. The debug ring keeps spooled uploads as their files, so it
+    holds at most `spool_bytes` in memory per entry. Uploads larger
+    than `max_bytes` are answered 413.
+
+    Adds:
+      - /debug/last-snapshot  (GET): returns the most recently uploaded JPEG
+      - /debug/snapshots      (GET): JSON index of the snapshot ring (newest first)
+      - /debug/snapshots/{seq|sha|latest} (GET): one snapshot from the ring
+      - Detailed per-upload logging (length, sha256, path, client, saved file)
+      - Optional on-disk saving for inspection (save_dir)
+      - Hex preview of the first few bytes to confirm JPEG SOI (FFD8)
+
+    Debug GETs carry an ETag (the snapshot sha256; the latest sequence
+    number for the index) and answer If-None-Match with 304, so pollers
+    only download frames they have not seen.
+
+    ENV overrides
+      UPLOAD_MAX_BYTES=16777216 → largest accepted upload
+      UPLOAD_SPOOL_BYTES=1048576 → in-memory size before spooling to disk
+      UPLOAD_RING_SIZE=8 → snapshots kept for the debug endpoints
+      UPLOAD_RING_BYTES=33554432 → byte budget of the snapshot ring
+    """
+
+    def __init__(self, cert: str = "cert.pem", key: str = "key.pem", host: str = "0.0.0.0",
+                 port: int = 7444, logger=None, *, save_dir: Optional[str] = None,
+                 preview_bytes: int = 8, tls: Optional[TLSContexts] = None,
+                 max_bytes: Optional[int] = None, spool_bytes: Optional[int] = None,
+                 ring_size: Optional[int] = None, ring_bytes: Optional[int] = None):
+        self.log = logger
+        self.host = host
+        self.port = port
+        self.save_dir = save_dir
+        self.preview_bytes = max(0, preview_bytes)
+        self.max_bytes = _int_option(max_bytes, "UPLOAD_MAX_BYTES", DEFAULT_MAX_BYTES)
+        self.spool_bytes = _int_option(spool_bytes, "UPLOAD_SPOOL_BYTES", DEFAULT_SPOOL_BYTES)
+        self.tls = tls or TLSContexts(cert, key, logger)
+
+        # Recent uploads for the debug endpoints
+        self.snapshots = SnapshotRing(
+            _int_option(ring_size, "UPLOAD_RING_SIZE", DEFAULT_RING_SIZE),
+            _int_option(ring_bytes, "UPLOAD_RING_BYTES", DEFAULT_RING_BYTES),
+        )
+
+        self.server = AsyncHTTPServer(
+            self.handle, host, port, self.tls.server_context(), logger,
+            on_handshake=self.tls.record_handshake,
+        )
+
+    async def serve(self):
+        if self.log:
+            self.log.info("Upload server listening on https://%s:%d", self.host, self.port)
+            if self.save_dir:
+                self.log.info("Upload server will save snapshots to %s", self.save_dir)
+            self.log.debug("Debug endpoints available at GET %s and %s[/{seq|sha}]",
+                           DEBUG_LAST_PATH, DEBUG_RING_PATH)
+        try:
+            await self.server.serve()
+        finally:
+            self.snapshots.clear()
+
+    # -------------------- routes --------------------
+
+    async def handle(self, request: HttpRequest) -> HttpResponse:
+        if request.method == "GET":
+            return await self._get(request)
+        if request.method == "PUT":
+            return await self._put(request)
+        return HttpResponse(501)
+
+    async def _get(self, request: HttpRequest) -> HttpResponse:
+        path = request.path.split("?", 1)[0]
+        if_none_match = request.headers.get("If-None-Match")
+
+        # Simple debug endpoint to fetch the last snapshot the server saw
+        if path == DEBUG_LAST_PATH:
+            return await self._snapshot_response(self.snapshots.latest(), if_none_match, "no-cache", True)
+
+        if path == DEBUG_RING_PATH or path == DEBUG_RING_PATH + "/":
+            index = self.snapshots.index()
+            etag = f'"ring-{index["latest"]}-{index["evicted"]}"'
+            if _etag_matches(if_none_match, etag):
+                return HttpResponse(304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+            body = json.dumps(index).encode()
+            return HttpResponse(200, body, {"Content-Type": "application/json",
+                                            "ETag": etag, "Cache-Control": "no-cache"})
+
+        if path.startswith(DEBUG_RING_PATH + "/"):
+            key = path[len(DEBUG_RING_PATH) + 1:]
+            entry = self.snapshots.find(key)
+            # a sha names fixed content; a sequence number or "latest" may move on
+            by_sha = len(key) >= 8 and not key.isdigit() and key != "latest"
+            cache = "public, max-age=31536000, immutable" if by_sha else "no-cache"
+            return await self._snapshot_response(entry, if_none_match, cache, False)
+
+        # Log at DEBUG so it doesn’t spam unless enabled
+        if self.log:
+            self.log.debug("GET %s from %s -> 404", request.path, request.client_address[0])
+        return HttpResponse(404)
+
+    @staticmethod
+    async def _snapshot_response(entry: Optional[SnapshotEntry], if_none_match: Optional[str],
+                           cache_control: str, meta_headers: bool) -> HttpResponse:
+        if entry is None:
+            return HttpResponse(404)
+        headers = {"ETag": entry.etag, "Cache-Control": cache_control, "X-Snapshot-Seq": str(entry.seq)}
+        if _etag_matches(if_none_match, entry.etag):
+            return HttpResponse(304, headers=headers)
+        headers["Content-Type"] = "image/jpeg"
+        if meta_headers:
+            # bubble some context in headers for quick checks
+            for k, v in entry.meta.items():
+                headers[f"X-Meta-{k}"] = str(v)
+        return HttpResponse(200, await entry.read(), headers)
+
+    async def _put(self, request: HttpRequest) -> HttpResponse:
+        # Basic routing
+        if not request.path.startswith(SNAP_PREFIX):
+            if self.log:
+                self.log.warning("PUT %s from %s -> 404 (unknown path)",
+                                 request.path, request.client_address[0])
+            return HttpResponse(404)
+
+        client = request.client_address[0]
+        if request.content_length is not None and request.content_length > self.max_bytes:
+            if self.log:
+                self.log.warning("PUT %s from %s -> 413 (Content-Length %d > %d)",
+                                 request.path, client, request.content_length, self.max_bytes)
+            raise HttpError(413)
+
+        ctype = request.headers.get("Content-Type", "")
+        agent = request.headers.get("User-Agent", "")
+        digest = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        length = 0
+        head_preview = b""
+        try:
+            if not self.spool_bytes:
+                await asyncio.to_thread(spool.rollover)     # straight to disk
+            async for data in request.iter_body(CHUNK_BYTES):
+                length += len(data)
+                if length > self.max_bytes:
+                    if self.log:
+                        self.log.warning("PUT %s from %s -> 413 (body > %d bytes)",
+                                         request.path, client, self.max_bytes)
+                    raise HttpError(413)
+                if len(head_preview) < self.preview_bytes:
+                    head_preview += data[:self.preview_bytes - len(head_preview)]
+                digest.update(data)
+                if length > self.spool_bytes:
+                    # this write rolls the spool over to disk, or it is there already
+                    await asyncio.to_thread(spool.write, data)
+                else:
+                    spool.write(data)
+        except BaseException:
+            spool.close()
+            raise
+
+        sha256 = digest.hexdigest()
+
+        spooled = length > self.spool_bytes
+        try:
+            # Optional save-to-disk (off the event loop)
+            saved_path = None
+            if self.save_dir:
+                try:
+                    os.makedirs(self.save_dir, exist_ok=True)
+                    token = request.path.split("/")[-1] or "snapshot"
                     ts = time.strftime("%Y%m%d_%H%M%S")
-                    saved_path = os.path.join(self._save_dir, f"{ts}_{token}.jpg")
-                    with open(saved_path, "wb") as f:
-                        f.write(body)
-
-                # Respond OK to controller
-                self.send_response(200)
-                self.end_headers()
-
-                # Structured log line
-                if self._logger:
-                    msg = (f"PUT snapshot OK len={length} sha256={sha256[:12]}… "
-                           f"path={self.path} from={self.client_address[0]} "
-                           f"ctype='{ctype}' ua='{agent}'")
-                    if saved_path:
-                        msg += f" saved='{saved_path}'"
-                    if head_preview:
-                        # print first bytes as hex for quick SOI check (FFD8)
-                        msg += f" head={head_preview.hex()}"
-                    self._logger.debug(msg)
-
-            except Exception as e:
-                self.send_response(500); self.end_headers()
-                if self._logger:
-                    self._logger.exception("Upload handler error for %s: %s",
-                                           self.path, e)
-
-        # Silence default BaseHTTPRequestHandler prints (we log ourselves)
-        def log_message(self, fmt, *args):
-            if self._logger:
-                # Drop to TRACE-like detail: use .debug
-                self._logger.debug("http.server: " + fmt, *args)
-
-    return _UploadHandler
+                    saved_path = os.path.join(self.save_dir, f"{ts}_{token}.jpg")
+                    await asyncio.to_thread(_copy_to_path, spool, saved_path)
+                except OSError as e:
+                    if self.log:
+                        self.log.exception("Upload handler error for %s: %s", request.path, e)
+                    return HttpResponse(500)
+
+            # Keep for the debug endpoints (the ring evicts by count and bytes).
+            # In-memory uploads are stored as bytes; spooled ones keep their
+            # file, so the ring never reads a large upload back into memory.
+            meta = {
+                "when": _utc_ts(),
+                "length": length,
+                "sha256": sha256,
+                "path": request.path,
+                "client": client,
+            }
+            if spooled:
+                if self.snapshots.add(spool, meta) is not None:
+                    spool = None
+            else:
+                spool.seek(0)
+                self.snapshots.add(spool.read(), meta)
+        finally:
+            if spool is not None:
+                spool.close()
+
+        # Structured log line
+        if self.log:
+            msg = (f"PUT snapshot OK len={length} sha256={sha256[:12]}… "
+                   f"path={request.path} from={client} "
+                   f"ctype='{ctype}' ua='{agent}' spooled={spooled}")
+            if saved_path:
+                msg += f" saved='{saved_path}'"
+            if head_preview:
+                # print first bytes as hex for quick SOI check (FFD8)
+                msg += f" head={head_preview.hex()}"
+            self.log.debug(msg)
+
+        # Respond OK to controller
+        return HttpResponse(200)
 
 
 def start_upload_server(
@@ -133,38 +399,19 @@ def start_upload_server(
     *,
     # new optional knobs:
     save_dir: Optional[str] = None,          # e.g. "/tmp/unifi-uploads"
-    preview_bytes: int = 8                   # show first N bytes as hex in logs (0 = off)
+    preview_bytes: int = 8,                  # show first N bytes as hex in logs (0 = off)
+    tls: Optional[TLSContexts] = None,       # shared TLS contexts (loads cert/key when omitted)
+    max_bytes: Optional[int] = None,         # 413 above this (UPLOAD_MAX_BYTES)
+    spool_bytes: Optional[int] = None,       # spool to disk above this (UPLOAD_SPOOL_BYTES)
+    ring_size: Optional[int] = None,         # snapshots kept for /debug (UPLOAD_RING_SIZE)
+    ring_bytes: Optional[int] = None,        # byte budget for those (UPLOAD_RING_BYTES)
 ):
     """
-    Start the HTTPS upload server used by the controller for snapshots.
-
-    Adds:
-      - /debug/last-snapshot  (GET): returns the most recently uploaded JPEG
-      - Detailed per-upload logging (length, sha256, path, client, saved file)
-      - Optional on-disk saving for inspection (save_dir)
-      - Hex preview of the first few bytes to confirm JPEG SOI (FFD8)
+    Start the HTTPS upload server on its own thread and event loop; returns
+    the UploadServer. Under the runtime, add UploadServer(...).serve instead.
     """
-    Handler = _make_handler(logger, save_dir, preview_bytes)
-    httpd = HTTPServer((host, port), Handler)
-    httpd.last_snapshot_bytes = None
-    httpd.last_snapshot_meta = {}
-
-    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-    try:
-        ctx.load_cert_chain(certfile=cert, keyfile=key)
-    except Exception as e:
-        if logger:
-            logger.error("Failed to load TLS cert/key (%s, %s): %s", cert, key, e)
-        raise
-    httpd.socket = ctx.wrap_socket(httpd.socket, server_side=True)
-
-    t = threading.Thread(target=httpd.serve_forever, daemon=True, name="UploadServer")
-    t.start()
-
-    if logger:
-        logger.info("Upload server listening on https://%s:%d", host, port)
-        if save_dir:
-            logger.info("Upload server will save snapshots to %s", save_dir)
-        logger.debug("Debug endpoint available at GET %s", DEBUG_LAST_PATH)
-
-    return httpd
+    server = UploadServer(cert, key, host, port, logger, save_dir=save_dir, preview_bytes=preview_bytes,
+                          tls=tls, max_bytes=max_bytes, spool_bytes=spool_bytes,
+                          ring_size=ring_size, ring_bytes=ring_bytes)
+    threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True, name="UploadServer").start()
+    return server
@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import ssl
+from email.utils import formatdate
+from http import HTTPStatus
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+
+
+class HttpError(Exception):
+    """Raised while reading a request; answered with `status` and the connection is closed."""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+class Headers:
+    """Request headers: case-insensitive lookups, original order/case kept for logging."""
+
+    __slots__ = ("_items", "_map")
+
+    def __init__(self, items: Iterable[Tuple[str, str]] = ()):
+        self._items = list(items)
+        self._map = {}
+        for k, v in self._items:
+            self._map.setdefault(k.lower(), v)
+
+    def get(self, key: str, default=None):
+        return self._map.get(key.lower(), default)
+
+    def __getitem__(self, key: str) -> str:
+        return self._map[key.lower()]
+
+    def __contains__(self, key) -> bool:
+        return key.lower() in self._map
+
+    def items(self):
+        return list(self._items)
+
+
+class HttpRequest:
+    """One parsed request; the body is read on demand from the connection."""
+
+    def __init__(self, method, path, version, headers: Headers, reader: asyncio.StreamReader,
+                 client_address, deadline: float, writer: Optional[asyncio.StreamWriter] = None):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.client_address = client_address
+        self._reader = reader
+        self._writer = writer
+        self._deadline = deadline      # loop time by which the whole body must be in
+        self._consumed = False
+        # "Expect: 100-continue" clients wait for a go-ahead before sending
+        # the body; it is only sent once the handler starts reading, so an
+        # early rejection (404/413) never makes them upload
+        self._expect_continue = (headers.get("Expect") or "").lower() == "100-continue"
+
+        te = (headers.get("Transfer-Encoding") or "").lower()
+        self.chunked = "chunked" in te
+        if self.chunked:
+            self.content_length = None
+        else:
+            try:
+                self.content_length = int(headers.get("Content-Length", 0))
+            except ValueError:
+                raise HttpError(400, "invalid Content-Length")
+            if self.content_length < 0:
+                raise HttpError(400, "invalid Content-Length")
+
+    @property
+    def keep_alive(self) -> bool:
+        conn = (self.headers.get("Connection") or "").lower()
+        if self.version == "HTTP/1.0":
+            return conn == "keep-alive"
+        return conn != "close"
+
+    async def _within_deadline(self, aw):
+        """Await `aw`, raising asyncio.TimeoutError once the request deadline has passed."""
+        left = self._deadline - asyncio.get_running_loop().time()
+        if left <= 0:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(aw, left)
+
+    async def iter_body(self, chunk_size: int = 64 * 1024):
+        """
+        Yield the body in pieces of at most `chunk_size` (Content-Length or
+        chunked). The whole body shares the request's deadline, so a client
+        trickling bytes cannot hold the connection past it.
+        """
+        if self._consumed:
+            return
+        self._consumed = True
+        reader, within = self._reader, self._within_deadline
+        if self._expect_continue and self._writer is not None:
+            self._writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await within(self._writer.drain())
+        if not self.chunked:
+            remaining = self.content_length
+            while remaining > 0:
+                data = await within(reader.read(min(chunk_size, remaining)))
+                if not data:
+                    raise HttpError(400, "body shorter than Content-Length")
+                remaining -= len(data)
+                yield data
+            return
+        while True:
+            line = await within(reader.readline())
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpError(400, "malformed chunk size")
+            if size == 0:
+                # trailers (ignored) up to the blank line
+                while (await within(reader.readline())).strip():
+                    pass
+                return
+            while size > 0:
+                data = await within(reader.read(min(chunk_size, size)))
+                if not data:
+                    raise HttpError(400, "truncated chunk")
+                size -= len(data)
+                yield data
+            if await within(reader.readline()) not in (b"\r\n", b"\n"):
+                raise HttpError(400, "missing chunk terminator")
+
+    async def read_body(self, limit: Optional[int] = None) -> bytes:
+        """Whole body as bytes; raises HttpError(413) past `limit` bytes."""
+        if limit is not None and self.content_length is not None and self.content_length > limit:
+            raise HttpError(413)
+        parts = []
+        total = 0
+        async for data in self.iter_body():
+            total += len(data)
+            if limit is not None and total > limit:
+                raise HttpError(413)
+            parts.append(data)
+        return b"".join(parts)
+
+    async def discard_body(self):
+        """Skip any unread body; returns False when the connection cannot be reused."""
+        if self._expect_continue and not self._consumed:
+            # body never asked for: the client may or may not still send it
+            self._consumed = True
+            return self.content_length == 0
+        async for _ in self.iter_body():
+            pass
+        return True
+
+
+class HttpResponse:
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(self, status: int = 200, body: bytes = b"", headers: Optional[dict] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class AsyncHTTPServer:
+    """
+    Minimal HTTP/1.1 server on asyncio streams: TLS, keep-alive and
+    per-connection timeouts. Every connection is its own task, so one slow
+    or stalled client never holds up the others.
+
+    Timeouts:
+      handshake_timeout   TLS handshake (handled by the event loop)
+      request_timeout     reading one request head/body and writing its reply
+      keep_alive_timeout  idle time allowed between requests on a connection
+
+    Each request gets one deadline for its head and body together
+    (request_timeout, plus keep_alive_timeout of idle time before a
+    follow-up request), not a timeout per read, so a client sending a
+    byte at a time cannot hold a connection open indefinitely.
+
+    Usage:
+        server = AsyncHTTPServer(handle, port=443, ssl_context=ctx, logger=log)
+        await server.serve()
+    """
+
+    SERVER_NAME = "unifi-cam-proxy"
+
+    def __init__(self, handler: Handler, host: str = "0.0.0.0", port: int = 443,
+                 ssl_context: Optional[ssl.SSLContext] = None, logger=None, *,
+                 handshake_timeout: float = 10.0, request_timeout: float = 30.0,
+                 keep_alive_timeout: float = 15.0, max_header_bytes: int = 16 * 1024,
+                 max_keep_alive_requests: int = 1000,
+                 on_handshake: Optional[Callable[[ssl.SSLObject], None]] = None):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.log = logger or logging.getLogger(__name__)
+        self.handshake_timeout = handshake_timeout
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_header_bytes = max_header_bytes
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.on_handshake = on_handshake        # called with the SSLObject of each new connection
+        self.server = None
+        self.stats = {
+            "connections": 0,
+            "active": 0,
+            "requests": 0,
+            "errors": 0,
+            "timeouts": 0,
+        }
+
+    async def start(self):
+        """Bind and start accepting; returns once listening."""
+        self.server = await asyncio.start_server(
+            self._on_client, self.host, self.port,
+            ssl=self.ssl_context,
+            ssl_handshake_timeout=self.handshake_timeout if self.ssl_context else None,
+            limit=self.max_header_bytes,
+            reuse_address=True,
+        )
+        return self.server
+
+    async def serve(self):
+        """Serve until cancelled."""
+        if self.server is None:
+            await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.server = None
+
+    # -------------------- connection --------------------
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        stats = self.stats
+        stats["connections"] += 1
+        stats["active"] += 1
+        peer = writer.get_extra_info("peername") or ("?", 0)
+        if self.on_handshake is not None:
+            self.on_handshake(writer.get_extra_info("ssl_object"))
+        try:
+            served = 0
+            while served < self.max_keep_alive_requests:
+                try:
+                    request = await self._read_request(reader, writer, peer, first=served == 0)
+                except HttpError as e:
+                    await self._write(writer, HttpResponse(e.status, str(e).encode()), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                served += 1
+                stats["requests"] += 1
+                try:
+                    response = await self.handler(request)
+                    # keep the stream aligned for the next request
+                    reusable = await request.discard_body()
+                except HttpError as e:
+                    response, request_keep_alive = HttpResponse(e.status, str(e).encode()), False
+                else:
+                    request_keep_alive = request.keep_alive and reusable
+                keep_alive = request_keep_alive and served < self.max_keep_alive_requests
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # server shutting down; finish quietly (a cancelled connection
+            # task is reported as an unhandled error by asyncio.streams)
+            pass
+        except Exception as e:
+            stats["errors"] += 1
+            self.log.exception("HTTP handler error for %s: %s", peer[0], e)
+            try:
+                await self._write(writer, HttpResponse(500, b"Internal Server Error"), keep_alive=False)
+            except Exception:
+                pass
+        finally:
+            stats["active"] -= 1
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), 1.0)
+            except (Exception, asyncio.CancelledError):
+                pass
+
+    async def _read_request(self, reader, writer, peer, first: bool) -> Optional[HttpRequest]:
+        """
+        Read one request head and set the deadline its body shares: the
+        first request on a connection gets request_timeout in all, a
+        follow-up keep_alive_timeout to start plus request_timeout.
+        """
+        head_timeout = self.request_timeout if first else self.keep_alive_timeout
+        deadline = asyncio.get_running_loop().time() + self.request_timeout
+        if not first:
+            deadline += self.keep_alive_timeout
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), head_timeout)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HttpError(400, "incomplete request head")
+            return None     # client closed between requests
+        except asyncio.LimitOverrunError:
+            raise HttpError(431)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        if not version.startswith("HTTP/1."):
+            raise HttpError(505)
+        items = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise HttpError(400, "malformed header")
+            items.append((name.strip(), value.strip()))
+        return HttpRequest(method.upper(), path, version, Headers(items), reader, peer,
+                           deadline, writer)
+
+    async def _write(self, writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool):
+        status = HTTPStatus(response.status)
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Server: {self.SERVER_NAME}",
+            f"Date: {formatdate(usegmt=True)}",
+        ]
+        for k, v in response.headers.items():
+            lines.append(f"{k}: {v}")
+        body = response.body or b""
+        if status.value not in (204, 304):
+            lines.append(f"Content-Length: {len(body)}")
+        else:
+            body = b""
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await asyncio.wait_for(writer.drain(), self.request_timeout)
@@ -0,0 +1,52 @@
+import os
+import json
+from typing import Optional
+
+try:
+    import orjson  # type: ignore
+except ImportError:     # optional: pip install orjson
+    orjson = None
+
+
+class JsonCodec:
+    """
+    loads()/dumps() pair for the WSS message paths, backed by orjson or
+    stdlib json: dumps() returns compact UTF-8 bytes and loads() takes str
+    or bytes. Parse errors are ValueError subclasses with either backend.
+    The stdlib codec escapes non-ASCII (ensure_ascii) like the json.dumps
+    calls it replaces; orjson writes it as UTF-8, which decodes to the
+    same values.
+    """
+
+    __slots__ = ("name", "loads", "dumps")
+
+    def __init__(self, name: str):
+        if name == "orjson":
+            if orjson is None:
+                raise ValueError("orjson is not installed")
+            self.loads = orjson.loads
+            self.dumps = orjson.dumps
+        elif name == "json":
+            encode = json.JSONEncoder(separators=(",", ":")).encode
+            self.loads = json.loads
+            self.dumps = lambda obj: encode(obj).encode("utf-8")
+        else:
+            raise ValueError(f"unknown JSON codec {name!r} (expected 'orjson' or 'json')")
+        self.name = name
+
+    def __repr__(self):
+        return f"JsonCodec({self.name!r})"
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """
+    Codec by name; default is orjson when installed, else stdlib json.
+
+    ENV overrides
+      JSON_CODEC=json → force the stdlib codec
+    """
+    name = (name or os.environ.get("JSON_CODEC") or "").strip().lower()
+    if not name:
+        name = "orjson" if orjson is not None else "json"
+    return JsonCodec(name)
+
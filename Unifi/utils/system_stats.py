@@ -0,0 +1,184 @@
+import os
+import glob
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+DEFAULT_INTERVAL_S = 5      # SYSTEM_STATS_INTERVAL_S
+# Placeholder figures GetSystemStats has always sent; the lowest layer of every reply
+DEFAULT_STATS = {"cpu": 5, "memory": 20, "temperature": 45}
+
+
+def _read(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("ascii", "replace")
+
+
+class SystemStatsSampler:
+    """
+    Host and process resource usage for GetSystemStats, sampled in the
+    background so the handler answers from memory.
+
+    Every `interval` seconds a worker thread reads /proc/stat (system CPU),
+    /proc/self/stat (this process: CPU time and RSS), /proc/meminfo and
+    the thermal zones (found once at start), turns the CPU counters into
+    percentages over the interval, and publishes a new `current` dict.
+    `extra` (the camera driver's stats) is called on the same cadence.
+
+    `current` is what GetSystemStats sends, so the controller sees the
+    proxy's own usage: cpu and memory are this process's CPU (share of
+    all cores) and RSS (share of MemTotal); temperature is the host's
+    hottest thermal zone. It is layered defaults < extra < measured
+    values, so it always has every default key: before the first sample,
+    and where a source does not exist here (no /proc, no thermal zones in
+    a container), the driver's figure or the default stands in.
+    Host-wide cpu/memory are kept in `host` (exported on /metrics).
+
+      current → {"cpu": %, "memory": %, "temperature": °C, ...}
+      host    → host-wide {"cpu": %, "memory": %, "temperature": °C} measured
+      process → {"cpu": % of all cores, "memory": % of MemTotal, "rss": bytes}
+
+    ENV overrides
+      SYSTEM_STATS_INTERVAL_S=5 → sampling cadence
+
+    Usage:
+        sampler = SystemStatsSampler(log, extra=driver.get_system_stats)
+        sampler.start()
+        stats = sampler.current
+        ...
+        await sampler.close()
+    """
+
+    def __init__(self, logger=None, *, interval: Optional[float] = None,
+                 extra: Optional[Callable[[], Awaitable[Dict]]] = None,
+                 defaults: Optional[Dict] = None,
+                 proc: str = "/proc", thermal: str = "/sys/class/thermal"):
+        self.log = logger or logging.getLogger(__name__)
+        self.interval = float(interval or os.environ.get("SYSTEM_STATS_INTERVAL_S") or DEFAULT_INTERVAL_S)
+        self.extra = extra
+        self.defaults = dict(DEFAULT_STATS if defaults is None else defaults)
+        self.proc = proc
+        self._zones = sorted(glob.glob(os.path.join(thermal, "thermal_zone*", "temp")))
+        self._clk_tck = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._ncpu = os.cpu_count() or 1
+        self._mem_total = 0         # bytes, from /proc/meminfo
+        # previous counters: (busy ticks, total ticks) and (process ticks, monotonic time);
+        # the first system CPU figure is the average since boot, the first
+        # process sample only sets the baseline
+        self._cpu_prev = (0, 0)
+        self._proc_prev = (0, None)
+        self._extra: Dict = {}
+        self._task: Optional[asyncio.Task] = None
+        self.current: Dict = dict(self.defaults)
+        self.host: Dict = {}
+        self.process: Dict = {}
+        self.stats = {
+            "samples": 0,
+            "errors": 0,        # sources that failed to read or parse
+            "extra_errors": 0,  # driver stats calls that failed
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="system-stats")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                self.log.debug("System stats sample failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def sample(self) -> Dict:
+        """Take one sample now and publish it."""
+        if self.extra is not None:
+            try:
+                self._extra = dict(await asyncio.wait_for(self.extra(), self.interval) or {})
+            except Exception as e:
+                self.stats["extra_errors"] += 1
+                self.log.debug("Driver system stats failed: %s", e)
+        host, process = await asyncio.to_thread(self._read_all)
+        merged = dict(self.defaults)
+        merged.update(self._extra)
+        if "temperature" in host:
+            merged["temperature"] = host["temperature"]
+        for key in ("cpu", "memory"):
+            if key in process:
+                merged[key] = process[key]
+        self.current = merged
+        self.host = host
+        self.process = process
+        self.stats["samples"] += 1
+        return merged
+
+    # -------------------- worker thread --------------------
+
+    def _read_all(self):
+        host, process = {}, {}
+        for read in (self._read_cpu, self._read_memory, self._read_temperature):
+            try:
+                read(host)
+            except (OSError, ValueError, IndexError) as e:
+                self.stats["errors"] += 1
+                self.log.debug("System stats: %s failed: %s", read.__name__, e)
+        try:
+            self._read_process(process)
+        except (OSError, ValueError, IndexError) as e:
+            self.stats["errors"] += 1
+            self.log.debug("System stats: process stats failed: %s", e)
+        return host, process
+
+    def _read_cpu(self, out: Dict):
+        # cpu  user nice system idle iowait irq softirq steal guest guest_nice
+        fields = [int(v) for v in _read(os.path.join(self.proc, "stat")).split("\n", 1)[0].split()[1:9]]
+        total = sum(fields)
+        busy = total - fields[3] - fields[4]
+        prev_busy, prev_total = self._cpu_prev
+        self._cpu_prev = (busy, total)
+        if total > prev_total:
+            out["cpu"] = round(100 * (busy - prev_busy) / (total - prev_total))
+
+    def _read_memory(self, out: Dict):
+        info = {}
+        for line in _read(os.path.join(self.proc, "meminfo")).splitlines():
+            name, _, value = line.partition(":")
+            if name in ("MemTotal", "MemAvailable"):
+                info[name] = int(value.split()[0])
+        total = info["MemTotal"]
+        self._mem_total = total * 1024
+        if total:
+            out["memory"] = round(100 * (total - info["MemAvailable"]) / total)
+
+    def _read_temperature(self, out: Dict):
+        temps = []
+        for zone in self._zones:
+            try:
+                temps.append(int(_read(zone)) / 1000)
+            except (OSError, ValueError):
+                pass
+        if temps:
+            out["temperature"] = round(max(temps))
+
+    def _read_process(self, out: Dict):
+        # comm (field 2) may contain spaces; fields after it start at state (field 3)
+        raw = _read(os.path.join(self.proc, "self", "stat"))
+        fields = raw[raw.rindex(")") + 2:].split()
+        ticks = int(fields[11]) + int(fields[12])       # utime + stime
+        now = time.monotonic()
+        prev_ticks, prev_at = self._proc_prev
+        self._proc_prev = (ticks, now)
+        if prev_at is not None and now > prev_at:
+            seconds = (ticks - prev_ticks) / self._clk_tck
+            out["cpu"] = round(100 * seconds / ((now - prev_at) * self._ncpu), 1)
+        out["rss"] = int(fields[21]) * self._page
+        if self._mem_total:
+            out["memory"] = round(100 * out["rss"] / self._mem_total, 1)
+
+    async def close(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,240 @@
+import os
+import ssl
+import asyncio
+import datetime
+import ipaddress
+import logging
+import threading
+from typing import Optional
+
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+
+def generate_self_signed(certfile: str, keyfile: str, key_type: str = "ec", rsa_bits: int = 2048,
+                         host: Optional[str] = None, mac: Optional[str] = None, days: int = 365):
+    """
+    Write a self-signed cert/key pair (PEM). key_type "ec" is P-256, "rsa"
+    uses `rsa_bits`. SANs cover `host` (IP or DNS name), the MAC as a hex
+    name and localhost; the CN is the MAC (or localhost).
+    """
+    if key_type == "rsa":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=int(rsa_bits))
+    elif key_type == "ec":
+        key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"unsupported key type {key_type!r} (expected 'ec' or 'rsa')")
+
+    mac_name = (mac or "").replace(":", "").replace("-", "").upper()
+    sans = [x509.DNSName("localhost")]
+    if mac_name:
+        sans.append(x509.DNSName(mac_name))
+    if host:
+        try:
+            sans.append(x509.IPAddress(ipaddress.ip_address(host)))
+        except ValueError:
+            sans.append(x509.DNSName(host))
+
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, mac_name or "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.SubjectAlternativeName(sans), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    # key first and private (0600); the cert lands last so watchers never see a half pair
+    fd = os.open(keyfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key_pem)
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+
+class TLSContexts:
+    """
+    One place that loads cert.pem/key.pem and hands out TLS contexts to the
+    API server, upload server, WSS client and snapshot uploader.
+
+    - server_context() is a long-lived "front" context; its SNI callback
+      switches every new handshake to the latest loaded context, so reload()
+      swaps certificates atomically without restarting listeners.
+    - client_context() is shared by all outbound connections (controller
+      certs are self-signed, so no verification, as before).
+    - stats() reports server handshakes with the full vs resumed split, and
+      the number of client handshakes.
+
+    Outbound connections do not resume TLS sessions: asyncio (and so the
+    WSS client and the aiohttp snapshot uploader) cannot offer a saved
+    session. They rely on keep-alive instead; the uploader pools its
+    connections, so repeated uploads skip the handshake altogether.
+
+    Missing certificates are generated in-process (see generate_self_signed).
+
+    ENV overrides
+      TLS_KEY_TYPE=rsa → generate RSA instead of ECDSA P-256 (default "ec")
+      TLS_RSA_BITS=3072 → RSA key size (default 2048)
+
+    Usage:
+        tls = TLSContexts(logger=log)
+        tls.ensure_cert(host=settings.get("host"), mac=settings.get("mac"))
+        ctx = tls.server_context()
+        loop_thread.submit(tls.watch(), name="tls-reload")
+    """
+
+    def __init__(self, certfile: str = "cert.pem", keyfile: str = "key.pem", logger=None,
+                 key_type: Optional[str] = None, rsa_bits: Optional[int] = None):
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.log = logger or logging.getLogger(__name__)
+        self.key_type = (key_type or os.environ.get("TLS_KEY_TYPE") or "ec").lower()
+        self.rsa_bits = int(rsa_bits or os.environ.get("TLS_RSA_BITS") or 2048)
+        self._lock = threading.Lock()
+        self._server_ctx = None        # latest loaded server context (swapped on reload)
+        self._front_ctx = None         # context handed to listeners; delegates via SNI callback
+        self._client_ctx = None
+        self._mtimes = None
+        self._stats = {
+            "server": {"handshakes": 0, "resumed": 0},
+            "client": {"handshakes": 0},    # always full; see the class docstring
+            "reloads": 0,
+            "reload_errors": 0,
+        }
+
+    # -------------------- certificates --------------------
+
+    def ensure_cert(self, host: Optional[str] = None, mac: Optional[str] = None):
+        if os.path.exists(self.certfile) and os.path.exists(self.keyfile):
+            return
+
+        self.log.warning("[!] cert.pem or key.pem not found. Generating self-signed certificate...")
+        generate_self_signed(self.certfile, self.keyfile, self.key_type, self.rsa_bits, host=host, mac=mac)
+        label = "ECDSA P-256" if self.key_type == "ec" else f"RSA-{self.rsa_bits}"
+        self.log.info("[+] Self-signed %s certificate generated.", label)
+
+    def _cert_mtimes(self):
+        try:
+            return os.stat(self.certfile).st_mtime_ns, os.stat(self.keyfile).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build_server(self) -> ssl.SSLContext:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(certfile=self.certfile, keyfile=self.keyfile)
+        ctx.num_tickets = 2                        # TLS 1.3 session tickets
+        ctx.options &= ~ssl.OP_NO_TICKET           # TLS 1.2 tickets
+        return ctx
+
+    def _build_client(self) -> ssl.SSLContext:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        # optional client certs if present
+        if os.path.exists(self.certfile) and os.path.exists(self.keyfile):
+            try:
+                ctx.load_cert_chain(self.certfile, self.keyfile)
+            except Exception as e:
+                self.log.warning("TLS: could not load client cert/key: %s", e)
+        return ctx
+
+    def reload(self) -> bool:
+        """Load cert/key into fresh contexts and swap them in; False if loading failed."""
+        mtimes = self._cert_mtimes()
+        try:
+            server_ctx = self._build_server()
+        except (OSError, ssl.SSLError) as e:
+            self._stats["reload_errors"] += 1
+            self.log.error("TLS: failed to load cert/key (%s, %s): %s", self.certfile, self.keyfile, e)
+            return False
+        client_ctx = self._build_client()
+        with self._lock:
+            first = self._server_ctx is None
+            self._server_ctx = server_ctx
+            self._client_ctx = client_ctx
+            self._mtimes = mtimes
+        if not first:
+            self._stats["reloads"] += 1
+            self.log.info("TLS: certificate reloaded from %s", self.certfile)
+        return True
+
+    def reload_if_changed(self) -> bool:
+        mtimes = self._cert_mtimes()
+        if mtimes is None or mtimes == self._mtimes:
+            return False
+        return self.reload()
+
+    async def watch(self, interval: float = 30.0):
+        """Poll cert/key modification times and reload on change (run on the event loop)."""
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+    def _ensure_loaded(self):
+        if self._server_ctx is None and not self.reload():
+            raise ssl.SSLError(f"cannot load {self.certfile}/{self.keyfile}")
+
+    # -------------------- contexts --------------------
+
+    def server_context(self) -> ssl.SSLContext:
+        """Context for listeners; new handshakes always use the latest certificate."""
+        self._ensure_loaded()
+        with self._lock:
+            if self._front_ctx is None:
+                front = self._build_server()
+                front.sni_callback = self._on_client_hello
+                self._front_ctx = front
+            return self._front_ctx
+
+    def _on_client_hello(self, ssl_obj, server_name, front_ctx):
+        ctx = self._server_ctx
+        if ctx is not None and ssl_obj.context is not ctx:
+            ssl_obj.context = ctx
+        return None
+
+    def client_context(self) -> ssl.SSLContext:
+        self._ensure_loaded()
+        return self._client_ctx
+
+    # -------------------- stats --------------------
+
+    def record_handshake(self, ssl_obj, side: str = "server"):
+        """Count a completed handshake (side 'server' or 'client') on an SSLSocket/SSLObject."""
+        if ssl_obj is None:
+            return
+        counters = self._stats[side]
+        counters["handshakes"] += 1
+        if side == "server" and ssl_obj.session_reused:
+            counters["resumed"] += 1
+
+    def record_client_handshake(self):
+        """Count an outbound handshake whose SSL object is not exposed (aiohttp pools)."""
+        self._stats["client"]["handshakes"] += 1
+
+    def stats(self) -> dict:
+        c = self._stats["server"]
+        return {
+            "reloads": self._stats["reloads"],
+            "reload_errors": self._stats["reload_errors"],
+            "server": {
+                "handshakes": c["handshakes"],
+                "full": c["handshakes"] - c["resumed"],
+                "resumed": c["resumed"],
+                "resumed_ratio": round(c["resumed"] / c["handshakes"], 3) if c["handshakes"] else 0.0,
+            },
+            "client": {"handshakes": self._stats["client"]["handshakes"]},
+        }
+
@@ -0,0 +1,148 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+# Snapshots hold a driver fetch plus an upload; two at once is plenty
+DEFAULT_FN_LIMITS = {"GetRequest": 2}
+
+# Handlers that change camera state: applied and answered in arrival order
+DEFAULT_ORDERED = frozenset({
+    "ChangeVideoSettings",
+    "ChangeIspSettings",
+    "ChangeOsdSettings",
+    "ChangeSoundLedSettings",
+    "ChangeTalkbackSettings",
+    "ChangeAnalyticsSettings",
+    "ChangeDeviceSettings",
+    "UpdateUsernamePassword",
+})
+
+DEFAULT_MAX_IN_FLIGHT = 32
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """"GetRequest=2,AnalyticsTest=1" -> {"GetRequest": 2, "AnalyticsTest": 1}"""
+    limits = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            try:
+                limits[name.strip()] = max(1, int(value))
+            except ValueError:
+                pass
+    return limits
+
+
+class WssDispatcher:
+    """
+    Runs WSS message handlers as tasks so a slow one (a snapshot waiting on
+    the driver and the upload) never delays the others (timeSync, stats).
+
+      - `ordered` functions share one lane: they run one at a time, in the
+        order the controller sent them (settings changes)
+      - `limits` caps concurrent handlers per function name
+      - at most `max_in_flight` handlers are queued or running; submit()
+        waits for a slot beyond that, which stops the read loop (and lets
+        the websocket apply backpressure) instead of growing without bound
+
+    A failing handler is logged and does not end the connection. close()
+    cancels whatever is still pending (connection gone).
+
+    ENV overrides
+      WSS_MAX_IN_FLIGHT=32 → cap on queued + running handlers
+      WSS_FN_LIMITS="GetRequest=2" → per-function concurrency (merged over the defaults)
+
+    Usage:
+        dispatcher = WssDispatcher(log)
+        await dispatcher.submit(fn, lambda: handler(ws, msg, need))
+        ...
+        await dispatcher.close()
+    """
+
+    def __init__(self, logger=None, *, max_in_flight: Optional[int] = None,
+                 limits: Optional[Dict[str, int]] = None, ordered: Optional[Iterable[str]] = None):
+        self.log = logger or logging.getLogger(__name__)
+        self.max_in_flight = int(max_in_flight or os.environ.get("WSS_MAX_IN_FLIGHT") or DEFAULT_MAX_IN_FLIGHT)
+        if limits is None:
+            limits = dict(DEFAULT_FN_LIMITS, **_parse_limits(os.environ.get("WSS_FN_LIMITS", "")))
+        self.ordered = frozenset(DEFAULT_ORDERED if ordered is None else ordered)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._fn_sems = {fn: asyncio.Semaphore(n) for fn, n in limits.items()}
+        self._lane: asyncio.Queue = asyncio.Queue()
+        self._lane_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self.stats = {
+            "dispatched": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "errors": 0,
+            "cancelled": 0,
+        }
+
+    async def submit(self, fn: str, factory: Callable[[], Awaitable]):
+        """Schedule `factory()` for `fn`; waits only while the in-flight cap is reached."""
+        await self._slots.acquire()
+        stats = self.stats
+        stats["dispatched"] += 1
+        stats["in_flight"] += 1
+        if stats["in_flight"] > stats["peak_in_flight"]:
+            stats["peak_in_flight"] = stats["in_flight"]
+
+        if fn in self.ordered:
+            if self._lane_task is None:
+                self._lane_task = asyncio.create_task(self._run_lane(), name="wss-ordered")
+            self._lane.put_nowait((fn, factory))
+            return
+
+        task = asyncio.create_task(self._run(fn, factory), name=f"wss-{fn}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, fn: str, factory: Callable[[], Awaitable]):
+        try:
+            sem = self._fn_sems.get(fn)
+            if sem is None:
+                await self._call(fn, factory)
+            else:
+                async with sem:
+                    await self._call(fn, factory)
+        finally:
+            self._release()
+
+    async def _run_lane(self):
+        while True:
+            fn, factory = await self._lane.get()
+            try:
+                await self._call(fn, factory)
+            finally:
+                self._release()
+
+    async def _call(self, fn: str, factory: Callable[[], Awaitable]):
+        try:
+            await factory()
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.log.exception("WSS: handler for %s failed: %s", fn, e)
+
+    def _release(self):
+        self.stats["in_flight"] -= 1
+        self._slots.release()
+
+    async def close(self):
+        """Cancel queued and running handlers and wait for them to unwind."""
+        tasks = list(self._tasks)
+        if self._lane_task is not None:
+            tasks.append(self._lane_task)
+            self._lane_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # handlers still queued on the ordered lane never ran; give back their slots
+        while not self._lane.empty():
+            self._lane.get_nowait()
+            self.stats["cancelled"] += 1
+            self._release()
@@ -0,0 +1,52 @@
+from typing import Dict, Hashable, Optional
+
+from Unifi.utils.json_codec import JsonCodec, get_codec
+
+REPLY_FROM = "ubnt_avclient"
+REPLY_TO = "UniFiVideo"
+
+
+class ReplyTemplates:
+    """
+    Byte templates for outgoing WSS replies.
+
+    A reply is always
+        {"from":..,"to":..,"functionName":FN,"messageId":N,"inResponseTo":M,"payload":P}
+    so the envelope up to "messageId" is serialised once per function name
+    and only the two ids (and the payload) are spliced in per message.
+    Payloads that never change (status acks) are cached too, under a key
+    chosen by the caller.
+    """
+
+    def __init__(self, codec: Optional[JsonCodec] = None):
+        self.codec = codec or get_codec()
+        self._heads: Dict[Optional[str], bytes] = {}
+        self._payloads: Dict[Hashable, bytes] = {}
+
+    def _head(self, fn: Optional[str]) -> bytes:
+        head = self._heads.get(fn)
+        if head is None:
+            dumps = self.codec.dumps
+            head = (b'{"from":' + dumps(REPLY_FROM) + b',"to":' + dumps(REPLY_TO)
+                    + b',"functionName":' + dumps(fn) + b',"messageId":')
+            self._heads[fn] = head
+        return head
+
+    def payload(self, key: Hashable, payload: dict) -> bytes:
+        """Serialised `payload`, cached under `key` (use only for constant payloads)."""
+        data = self._payloads.get(key)
+        if data is None:
+            data = self._payloads[key] = self.codec.dumps(payload)
+        return data
+
+    def reply(self, fn: Optional[str], msg_id: int, in_response_to, payload: bytes) -> bytes:
+        """Complete reply frame around an already serialised payload."""
+        if type(in_response_to) is int:
+            in_response_to = str(in_response_to).encode()
+        else:
+            in_response_to = self.codec.dumps(in_response_to)
+        return b"".join((
+            self._head(fn), str(int(msg_id)).encode(),
+            b',"inResponseTo":', in_response_to,
+            b',"payload":', payload, b"}",
+        ))
@@ -1,15 +1,23 @@
 import asyncio
-import json
+import inspect
 import logging
 import os
-import ssl
-import threading
 import time
 from datetime import datetime, timezone
 from typing import Optional, Tuple
 import websockets  # type: ignore
 from websockets.client import WebSocketClientProtocol  # type: ignore
 from Unifi.drivers.camera_factory import build_camera_driver
+from Unifi.snapshot_debug import SnapshotDebugWriter
+from Unifi.snapshot_service import SnapshotService
+from Unifi.snapshot_uploader import SnapshotUploader
+from Unifi.utils.json_codec import get_codec
+from Unifi.utils.metrics import SIZE_BUCKETS, MetricsRegistry
+from Unifi.utils.system_stats import SystemStatsSampler
+from Unifi.utils.tls_utils import TLSContexts
+from Unifi.wss_dispatcher import WssDispatcher
+from Unifi.wss_frames import ReplyTemplates
+from Unifi.wss_outbound import BULK_BYTES, LANE_BULK, LANE_HIGH, LANE_NAMES, LANE_NORMAL, OutboundQueue
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -25,12 +33,92 @@ def _parse_hostport(hostport: str) -> Tuple[str, int]:
     return hostport, 7442
 
 
-class WssManager(threading.Thread):
+def _adopted(snap) -> bool:
+    return bool(snap.get("mgmt.token") and snap.get("mgmt.connectionHost"))
+
+
+class _FunctionMetrics:
+    """The per-functionName children, looked up once per function."""
+
+    __slots__ = ("received", "replies", "errors", "receive_to_reply", "handler", "serialize", "send")
+
+    def __init__(self, m: "WssMetrics", fn: str):
+        for name in self.__slots__:
+            setattr(self, name, getattr(m, name).labels(fn))
+
+
+class WssMetrics:
+    """WSS metric families (per functionName where it makes sense)."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self._by_fn = {}
+        fn = ("function",)
+        self.received = registry.counter("wss_messages_received_total", "Controller messages received", fn)
+        self.replies = registry.counter("wss_replies_total", "Replies sent to the controller", fn)
+        self.errors = registry.counter("wss_handler_errors_total", "Handlers that raised", fn)
+        self.receive_to_reply = registry.histogram(
+            "wss_receive_to_reply_seconds", "Frame received to reply sent (controller-visible latency)", fn)
+        self.handler = registry.histogram("wss_handler_seconds", "Handler run time, reply included", fn)
+        self.serialize = registry.histogram("wss_serialize_seconds", "Reply serialisation time", fn)
+        self.send = registry.histogram("wss_send_seconds", "Reply queued to written to the socket", fn)
+        self.connections = registry.counter("wss_connections_total", "Controller connections established")
+        self.reconnects = registry.counter("wss_reconnects_total", "Connections established after the first")
+        self.failures = registry.counter("wss_connection_failures_total", "Connections that failed or dropped")
+        self.connected = registry.gauge("wss_connected", "1 while connected to the controller")
+        self.connected_seconds = registry.counter(
+            "wss_connected_seconds_total", "Time spent connected (closed connections plus the current one)")
+        self.connection_uptime = registry.gauge("wss_connection_uptime_seconds", "Age of the current connection")
+        self.in_flight = registry.gauge("wss_handlers_in_flight", "Handlers queued or running")
+        self.send_depth = registry.gauge("wss_send_queue_depth", "Frames waiting for the writer")
+        self.send_queued_bytes = registry.gauge("wss_send_queue_bytes", "Bytes waiting for the writer")
+        self.send_drain = registry.gauge("wss_send_drain_bytes_per_second", "Writer throughput over the last second")
+        self.sent_frames = registry.counter("wss_sent_frames_total", "Frames written, by priority lane", ("lane",))
+        self.sent_bytes = registry.counter("wss_sent_bytes_total", "Bytes written, by priority lane", ("lane",))
+        self.send_waits = registry.counter(
+            "wss_send_backpressure_waits_total", "Times a handler waited on the send high-water mark")
+        self.snapshot_bytes = registry.histogram(
+            "wss_snapshot_bytes", "Snapshot JPEG sizes from the driver", buckets=SIZE_BUCKETS)
+        self.snapshot_requests = registry.counter(
+            "wss_snapshot_requests_total",
+            "Snapshot requests by source (hit = cache, miss = camera fetch, join = shared fetch)", ("result",))
+        self.snapshot_fetch_errors = registry.counter(
+            "wss_snapshot_fetch_errors_total", "Camera snapshot fetches that failed or timed out")
+        self.snapshot_fetch_seconds = registry.histogram(
+            "wss_snapshot_fetch_seconds", "Camera snapshot fetch time (request = on demand, prefetch = background)",
+            ("mode",))
+        self.snapshot_prefetches = registry.counter(
+            "wss_snapshot_prefetches_total", "Background snapshot refreshes started")
+        self.snapshot_age = registry.histogram(
+            "wss_snapshot_served_age_seconds", "Age of the JPEG handed to each snapshot request")
+        self.snapshot_cache_age = registry.gauge(
+            "wss_snapshot_cache_age_seconds", "Age of the held JPEG (0 when there is none)")
+        self.snapshot_prefetch_interval = registry.gauge(
+            "wss_snapshot_prefetch_interval_seconds", "Current refresh interval (0 while prefetch is off or idle)")
+        self.upload_seconds = registry.histogram(
+            "wss_snapshot_upload_seconds", "Snapshot PUT to the controller, request to response")
+        self.uploads = registry.counter(
+            "wss_snapshot_uploads_total", "Snapshot uploads by result (ok, http_error, failed)", ("result",))
+        self.upload_connections = registry.counter(
+            "wss_snapshot_upload_connections_total", "New connections opened by the snapshot uploader")
+        self.upload_reused = registry.counter(
+            "wss_snapshot_upload_reused_total", "Snapshot uploads sent on a pooled keep-alive connection")
+        self.lane_frames = [self.sent_frames.labels(name) for name in LANE_NAMES]
+        self.lane_bytes = [self.sent_bytes.labels(name) for name in LANE_NAMES]
+
+    def for_function(self, fn: str) -> _FunctionMetrics:
+        fm = self._by_fn.get(fn)
+        if fm is None:
+            fm = self._by_fn[fn] = _FunctionMetrics(self, fn)
+        return fm
+
+
+class WssManager:
     """
-    Hello-only WSS client:
+    Hello-only WSS client, run as a task on the shared event loop (run()):
       - connects
       - sends ubnt_avclient_hello
       - logs everything else (no responses)
+      - reconnects when mgmt.token / mgmt.connectionHost change
     Expects settings:
       settings["mgmt.token"] (str)
       settings["mgmt.connectionHost"] like "192.168.0.1:7442"
@@ -39,26 +127,73 @@ class WssManager(threading.Thread):
 
     USE_SECURE_TRANSFER_SUBPROTOCOL = True  # keep what worked for you
 
-    def __init__(self, settings, token_event: threading.Event, stop_event: threading.Event, logger: logging.Logger):
-        super().__init__(daemon=True, name="WSSManager")
+    def __init__(self, settings, logger: logging.Logger, tls: Optional[TLSContexts] = None,
+                 metrics: Optional[MetricsRegistry] = None):
         self.settings = settings
-        self.token_event = token_event
-        self.stop_event = stop_event
+        # Shared TLS contexts; snapshot uploads go over pooled keep-alive connections
+        self.tls = tls or TLSContexts(logger=logger)
+        self.uploader = SnapshotUploader(self.tls, logger)
+        # Woken by settings changes under mgmt.* (token/host from adoption);
+        # both are bound to the running loop in run()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
         self.log = logger
         self._msg_id = 0
+        # orjson when installed (JSON_CODEC=json forces stdlib); replies are
+        # spliced into cached byte templates and sent without a str round trip
+        self._codec = get_codec()
+        self._frames = ReplyTemplates(self._codec)
+        self._send_text_bytes = False
+        # Metrics (exported on /metrics when a shared registry is passed in);
+        # receive times of messages being handled, keyed by id(msg)
+        self.metrics = WssMetrics(metrics or MetricsRegistry())
+        self._rx_times = {}
+        self._connected_at: Optional[float] = None
+        self._closed_seconds = 0.0
+        self._dispatcher: Optional[WssDispatcher] = None
+        self.metrics.in_flight.set_function(
+            lambda: self._dispatcher.stats["in_flight"] if self._dispatcher is not None else 0)
+        # One writer per connection drains replies in priority order
+        self._outbound: Optional[OutboundQueue] = None
+        self._send_waits_closed = 0
+        self.metrics.send_depth.set_function(lambda: self._outbound_stat("depth"))
+        self.metrics.send_queued_bytes.set_function(lambda: self._outbound_stat("bytes"))
+        self.metrics.send_drain.set_function(lambda: self._outbound_stat("drain_bps"))
+        self.metrics.send_waits.labels().set_function(
+            lambda: self._send_waits_closed + self._outbound_stat("backpressure_waits"))
+        self.metrics.upload_connections.labels().set_function(lambda: self.uploader.stats["connections"])
+        self.metrics.upload_reused.labels().set_function(lambda: self.uploader.stats["reused"])
+        self.metrics.connected_seconds.labels().set_function(self._connected_seconds)
+        self.metrics.connection_uptime.set_function(
+            lambda: time.monotonic() - self._connected_at if self._connected_at is not None else 0.0)
         self.driver = build_camera_driver(settings, logger)
-        SNAPSHOT_DEBUG_DIR = "/workspaces/unifi-cam-proxy/debug_snaps"  # static path
-        MAX_SNAPSHOT_FILES = 5
+        # Concurrent snapshot requests share one driver fetch; recent JPEGs
+        # are served from memory for SNAPSHOT_TTL_MS, or kept fresh in the
+        # background with SNAPSHOT_PREFETCH=true
+        self.snapshots = SnapshotService(self._fetch_snapshot, logger,
+                                         on_fetch=self._on_snapshot_fetch,
+                                         on_serve=self.metrics.snapshot_age.observe)
+        for result, key in (("hit", "hits"), ("miss", "misses"), ("join", "joins")):
+            self.metrics.snapshot_requests.labels(result).set_function(
+                lambda k=key: self.snapshots.stats[k])
+        self.metrics.snapshot_fetch_errors.labels().set_function(lambda: self.snapshots.stats["errors"])
+        self.metrics.snapshot_prefetches.labels().set_function(lambda: self.snapshots.stats["prefetches"])
+        self.metrics.snapshot_cache_age.set_function(lambda: self.snapshots.age() or 0.0)
+        self.metrics.snapshot_prefetch_interval.set_function(lambda: self.snapshots.interval)
+        # GetSystemStats answers from the last background sample: this process's
+        # cpu/memory, host temperature, driver stats underneath
+        self.system_stats = SystemStatsSampler(logger, extra=lambda: self.driver.get_system_stats())
+        # Debug copies of fetched snapshots, written off the loop
         self._snapshot_debug = os.getenv("SNAPSHOT_DEBUG", "").strip().lower() in {"true"}
-        self._snapshot_debug_dir = SNAPSHOT_DEBUG_DIR               # static dir
-        self._snapshot_keep = MAX_SNAPSHOT_FILES                    # max files to keep
+        self.snapshot_debug = SnapshotDebugWriter(logger=logger)
 
         '''
         ENV overrides
         WSS_LOG_ONLY="GetRequest,ChangeIspSettings" → only log these fns
         WSS_SILENCE="NetworkStatus,GetSystemStats" → additionally silence these
         WSS_THROTTLE=60 → only log NetworkStatus/GetSystemStats at most once per 60s
-        SNAPSHOT_DEBUG=True → set to True to enable snapshot DIR
+        SNAPSHOT_DEBUG=True → set to True to save fetched snapshots
+        SNAPSHOT_DEBUG_DIR=debug_snaps → where they are saved (newest SNAPSHOT_DEBUG_KEEP=5 kept)
         '''
         self._last_log_ts = {}
         self._throttle_secs = float(os.getenv("WSS_THROTTLE", "0"))  # 0 = no throttle
@@ -127,76 +262,107 @@ class WssManager(threading.Thread):
             return True
         return False
 
-    def _log_rx(self, fn: str, raw: str):
+    def _log_rx(self, fn: str, raw):
         if self._should_log(fn) and self._throttle_ok(fn):
+            if isinstance(raw, (bytes, bytearray)):
+                raw = raw.decode("utf-8", "replace")
             self.log.debug("WSS <- %s: %s", fn or "?", raw)
 
-    def _log_tx(self, fn: str, raw: str):
+    def _log_tx(self, fn: str, raw):
         if self._should_log(fn) and self._throttle_ok(fn):
+            if isinstance(raw, (bytes, bytearray)):
+                raw = raw.decode("utf-8", "replace")
             self.log.debug("WSS -> %s: %s", fn or "?", raw)
 
-    # ---------------- Snap shot log helpers ---------------
+    # -------------------- task entry --------------------
 
-    def _prune_snapshot_dir(self):
-        import pathlib
-        p = pathlib.Path(self._snapshot_debug_dir)
-        if not p.exists():
-            return
-        # newest first, delete the rest
-        files = sorted(p.glob("snapshot_*.jpg"),
-                    key=lambda f: f.stat().st_mtime,
-                    reverse=True)
-        for old in files[self._snapshot_keep:]:
-            try:
-                old.unlink()
-                self.log.debug("Snapshot debug: pruned %s", old)
-            except Exception as e:
-                self.log.warning("Snapshot debug: failed to prune %s: %s", old, e)
-    
-    # -------------------- thread entry --------------------
+    def _on_mgmt_change(self, keys, snap):
+        # settings callbacks run on the writer's thread
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            loop.call_soon_threadsafe(wake.set)
 
-    def run(self):
+    async def _sleep_or_wake(self, timeout: Optional[float] = None):
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        """Connect, serve and reconnect until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        mgmt_sub = self.settings.subscribe("mgmt.*", self._on_mgmt_change)
+        self.snapshots.start()
+        self.system_stats.start()
+        if self._snapshot_debug:
+            self.snapshot_debug.start()
         current_key: Optional[Tuple[str, int, str]] = None
+        try:
+            while True:
+                self._wake.clear()
+                s = self.settings.snapshot()
+                token = s.get("mgmt.token")
+                hostport = s.get("mgmt.connectionHost")
+
+                if not token or not hostport:
+                    self.log.debug("WSS: waiting for token/host...")
+                    await self.settings.wait_for("mgmt.*", _adopted)
+                    continue
 
-        while not self.stop_event.is_set():
-            token = self.settings.get("mgmt.token")
-            hostport = self.settings.get("mgmt.connectionHost")
-
-            if not token or not hostport:
-                self.log.debug("WSS: waiting for token/host...")
-                self.token_event.wait(timeout=10)
-                self.token_event.clear()
-                continue
-
-            host, port = _parse_hostport(str(hostport))
-            key = (host, port, token)
+                host, port = _parse_hostport(str(hostport))
+                key = (host, port, token)
 
-            if key != current_key:
-                self.log.info("WSS: (re)connecting to %s:%s (token/host changed)", host, port)
-                current_key = key
+                if key != current_key:
+                    self.log.info("WSS: (re)connecting to %s:%s (token/host changed)", host, port)
+                    current_key = key
 
-            try:
-                asyncio.run(self._connect_and_serve(host, port, token))
-            except Exception as e:
-                self.log.warning("WSS: connection failed: %s; retrying in 5s", e)
-                self.token_event.wait(timeout=5)
-                self.token_event.clear()
+                try:
+                    await self._serve_until_changed(host, port, token, key)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.metrics.failures.inc()
+                    self.log.warning("WSS: connection failed: %s; retrying in 5s", e)
+                    await self._sleep_or_wake(timeout=5)
+        finally:
+            mgmt_sub.cancel()
+            await self.snapshots.close()
+            await self.snapshot_debug.close()
+            await self.system_stats.close()
+            await self.uploader.close()
+            self._loop = None
+
+    async def _serve_until_changed(self, host: str, port: int, token: str, key):
+        """Run one connection; drop it early if the token/host it was opened with changes."""
+        conn = asyncio.ensure_future(self._connect_and_serve(host, port, token))
+        try:
+            while not conn.done():
+                wake = asyncio.ensure_future(self._wake.wait())
+                await asyncio.wait({conn, wake}, return_when=asyncio.FIRST_COMPLETED)
+                wake.cancel()
+                if conn.done():
+                    break
+                self._wake.clear()
+                s = self.settings.snapshot()
+                new_key = _parse_hostport(str(s.get("mgmt.connectionHost"))) + (s.get("mgmt.token"),)
+                if new_key != key:
+                    self.log.info("WSS: token/host changed; dropping current connection")
+                    conn.cancel()
+                    await asyncio.gather(conn, return_exceptions=True)
+                    return
+            conn.result()
+        finally:
+            if not conn.done():
+                conn.cancel()
+                await asyncio.gather(conn, return_exceptions=True)
 
     # -------------------- async client --------------------
 
     async def _connect_and_serve(self, host: str, port: int, token: str):
         url = f"wss://{host}:{port}/camera/1.0/ws?token={token}"
 
-        ssl_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        ssl_ctx.check_hostname = False
-        ssl_ctx.verify_mode = ssl.CERT_NONE
-
-        # optional client certs if present
-        if os.path.exists("cert.pem") and os.path.exists("key.pem"):
-            try:
-                ssl_ctx.load_cert_chain("cert.pem", "key.pem")
-            except Exception as e:
-                self.log.warning("WSS: could not load client cert/key: %s", e)
+        ssl_ctx = self.tls.client_context()
 
         headers = {
             "Camera-Mac": (self.settings.get("mac") or "").lower(),
@@ -212,44 +378,78 @@ class WssManager(threading.Thread):
         self.log.debug("WSS: URL=%s subprotocols=%s headers=%s", url, kwargs.get("subprotocols"), headers)
 
         async with websockets.connect(url, **kwargs) as ws:
+            transport = getattr(ws, "transport", None)
+            if transport is not None:
+                self.tls.record_handshake(transport.get_extra_info("ssl_object"), "client")
             self.log.info("WSS: connected (agreed subprotocol=%s)", ws.subprotocol)
             try:
                 self.log.debug("WSS: response headers: %s", dict(ws.response_headers))
             except Exception:
                 pass
-            await self._serve_loop(ws)
+            self._on_connected()
+            try:
+                await self._serve_loop(ws)
+            finally:
+                self._on_disconnected()
+
+    def _on_connected(self):
+        m = self.metrics
+        if m.connections.labels().get() > 0:
+            m.reconnects.inc()
+        m.connections.inc()
+        m.connected.set(1)
+        self._connected_at = time.monotonic()
+
+    def _on_disconnected(self):
+        if self._connected_at is not None:
+            self._closed_seconds += time.monotonic() - self._connected_at
+            self._connected_at = None
+        self.metrics.connected.set(0)
+
+    def _connected_seconds(self) -> float:
+        current = time.monotonic() - self._connected_at if self._connected_at is not None else 0.0
+        return self._closed_seconds + current
 
     async def _serve_loop(self, ws: WebSocketClientProtocol):
+        # websockets >= 14 sends UTF-8 bytes as a text frame (text=True)
+        # without decoding; older clients get str
+        try:
+            self._send_text_bytes = "text" in inspect.signature(ws.send).parameters
+        except (TypeError, ValueError):
+            self._send_text_bytes = False
+
+        # replies go through one writer task (priority lanes + backpressure)
+        outbound = self._outbound = OutboundQueue(
+            lambda frame: self._write(ws, frame), on_sent=self._on_sent, logger=self.log)
+        outbound.start()
+
         # 1) send hello
         await self._send_hello(ws)
 
-        # 2) read & dispatch
+        # 2) read & dispatch; handlers run as tasks so a slow snapshot never
+        #    holds up timeSync/stats replies (settings changes stay ordered)
+        dispatcher = self._dispatcher = WssDispatcher(self.log)
         try:
+            loads = self._codec.loads
             async for incoming in ws:
-                # Keep an untouched copy only for logging if JSON fails
-                raw = incoming
-
-                # If binary, try to decode; otherwise log & skip
-                if isinstance(incoming, (bytes, bytearray)):
-                    try:
-                        incoming = incoming.decode("utf-8")
-                    except Exception:
-                        self._log_rx("", f"(binary {len(raw)} bytes)")
-                        continue
-
-                # Parse JSON first
+                t_rx = time.perf_counter()
+                # Parse JSON first (text or binary frames, no decode step)
                 try:
-                    msg = json.loads(incoming)
-                except Exception:
-                    preview = f"(non-JSON, {len(raw)} bytes)" if isinstance(raw, (bytes, bytearray)) else (raw[:500])
+                    msg = loads(incoming)
+                except (ValueError, TypeError):
+                    preview = f"(non-JSON, {len(incoming)} bytes)" if isinstance(incoming, (bytes, bytearray)) else (incoming[:500])
                     self._log_rx("", preview)
                     continue
+                if not isinstance(msg, dict):
+                    self._log_rx("", f"(unexpected JSON {type(msg).__name__})")
+                    continue
 
                 # Now we can safely read fields and do filtered logging
                 fn   = msg.get("functionName", "")
                 mid  = msg.get("messageId", 0)
                 need = bool(msg.get("responseExpected"))
                 self._log_rx(fn, incoming)
+                self._fn_metrics(fn).received.inc()
 
                 if fn == "ubnt_avclient_hello":
                     self.log.debug("WSS: controller hello received (msgId=%s)", mid)
@@ -257,11 +457,12 @@ class WssManager(threading.Thread):
 
                 handler = self.handlers.get(fn)
                 if handler:
-                    await handler(ws, msg, need)
+                    await dispatcher.submit(
+                        fn, lambda h=handler, m=msg, n=need, t=t_rx: self._handle(h, ws, m, n, t))
                 else:
                     # Safety ACK if needed
                     if fn == "ubnt_avclient_paramAgreement" and need:
-                        await self._reply(ws, msg, {"statusCode": 0, "status": "ok"})
+                        await self._reply_status(ws, msg, device_id=False)
                         continue
                     self.log.debug("WSS: unhandled %s (expect=%s): %s", fn, need, msg)
 
@@ -272,6 +473,33 @@ class WssManager(threading.Thread):
         except Exception:
             self.log.exception("WSS: serve_loop crashed")
             raise
+        finally:
+            await dispatcher.close()
+            self._dispatcher = None
+            await outbound.close()
+            self._outbound = None
+            self._send_waits_closed += outbound.stats["backpressure_waits"]
+            self.log.debug("WSS: dispatcher stats: %s; send queue stats: %s", dispatcher.stats, outbound.stats)
+
+    def _fn_metrics(self, fn: Optional[str]) -> _FunctionMetrics:
+        # bound label cardinality to the functions we know
+        known = fn in self.handlers or fn == "ubnt_avclient_hello"
+        return self.metrics.for_function(fn if known else "other")
+
+    async def _handle(self, handler, ws, msg: dict, need: bool, t_rx: float):
+        """Run one handler with timing; replies it sends are matched to `t_rx`."""
+        fm = self._fn_metrics(msg.get("functionName"))
+        key = id(msg)
+        self._rx_times[key] = t_rx
+        t0 = time.perf_counter()
+        try:
+            await handler(ws, msg, need)
+        except Exception:
+            fm.errors.inc()
+            raise
+        finally:
+            fm.handler.observe(time.perf_counter() - t0)
+            self._rx_times.pop(key, None)
 
     # -------------------- hello --------------------
 
@@ -279,18 +507,63 @@ class WssManager(threading.Thread):
         self._msg_id += 1
         return self._msg_id
     
-    async def _reply(self, ws: WebSocketClientProtocol, in_msg: dict, payload: dict):
-        out = {
-            "from": "ubnt_avclient",
-            "to": "UniFiVideo",
-            "functionName": in_msg.get("functionName"),
-            "messageId": self._next_msg_id(),
-            "inResponseTo": in_msg.get("messageId", 0),
-            "payload": payload,
-        }
-        s = json.dumps(out, separators=(",", ":"))
-        self._log_tx(out["functionName"], s)
-        await ws.send(s)
+    def _outbound_stat(self, key: str):
+        return self._outbound.stats[key] if self._outbound is not None else 0
+
+    async def _write(self, ws: WebSocketClientProtocol, frame: bytes):
+        if self._send_text_bytes:
+            await ws.send(frame, text=True)
+        else:
+            await ws.send(frame.decode("utf-8"))
+
+    async def _send(self, ws: WebSocketClientProtocol, fn: str, frame: bytes,
+                    lane: Optional[int] = None, ctx=None):
+        """Queue `frame` for the writer (waits if the queue is over its high-water mark)."""
+        self._log_tx(fn, frame)
+        if lane is None:
+            lane = LANE_BULK if len(frame) > BULK_BYTES else LANE_NORMAL
+        outbound = self._outbound
+        if outbound is None:        # not serving (no writer): write straight through
+            await self._write(ws, frame)
+            return
+        await outbound.put(frame, lane, ctx)
+
+    def _on_sent(self, lane: int, frame: bytes, queued_at: float, ctx):
+        m = self.metrics
+        m.lane_frames[lane].inc()
+        m.lane_bytes[lane].inc(len(frame))
+        if ctx is None:
+            return
+        fm, t_rx = ctx
+        now = time.perf_counter()
+        fm.send.observe(now - queued_at)
+        fm.replies.inc()
+        if t_rx is not None:
+            fm.receive_to_reply.observe(now - t_rx)
+
+    async def _reply(self, ws: WebSocketClientProtocol, in_msg: dict, payload: dict,
+                     lane: Optional[int] = None):
+        t0 = time.perf_counter()
+        await self._reply_raw(ws, in_msg, self._codec.dumps(payload), t0, lane)
+
+    async def _reply_raw(self, ws: WebSocketClientProtocol, in_msg: dict, payload: bytes,
+                         t0: Optional[float] = None, lane: Optional[int] = None):
+        fn = in_msg.get("functionName")
+        if t0 is None:
+            t0 = time.perf_counter()
+        frame = self._frames.reply(fn, self._next_msg_id(), in_msg.get("messageId", 0), payload)
+        fm = self._fn_metrics(fn)
+        fm.serialize.observe(time.perf_counter() - t0)
+        await self._send(ws, fn, frame, lane, (fm, self._rx_times.get(id(in_msg))))
+
+    async def _reply_status(self, ws: WebSocketClientProtocol, in_msg: dict, ok: bool = True,
+                            device_id: bool = True):
+        """Constant ack {"statusCode", "status"[, "deviceID"]} from the template cache."""
+        dev = self._device_id() if device_id else None
+        payload = {"statusCode": 0, "status": "ok"} if ok else {"statusCode": 1, "status": "error"}
+        if dev is not None:
+            payload["deviceID"] = dev
+        await self._reply_raw(ws, in_msg, self._frames.payload(("status", ok, dev), payload), lane=LANE_HIGH)
 
     async def _reply_ok(self, ws: WebSocketClientProtocol, in_msg: dict, extra: dict | None = None):
         payload = {"status": "ok"}
@@ -312,22 +585,17 @@ class WssManager(threading.Thread):
                 "protocolVersion": 1,
             },
         }
-        s = json.dumps(hello, separators=(",", ":"))
-        self._log_tx("ubnt_avclient_hello", s)
-        await ws.send(s)
+        await self._send(ws, "ubnt_avclient_hello", self._codec.dumps(hello), LANE_HIGH)
 
     async def _on_param_agreement(self, ws, msg, expect):
         if expect:
-            await self._reply(ws, msg, {"statusCode": 0, "status": "ok"})
+            await self._reply_status(ws, msg, device_id=False)
 
     async def _on_get_system_stats(self, ws: WebSocketClientProtocol, msg: dict, expect: bool):
         if expect:
-            await self._reply(ws, msg, {
-                "cpu": 5,
-                "memory": 20,
-                "temperature": 45,
-                "uptime": int(self.settings.get("uptime", 0) or 0)
-            })
+            payload = dict(self.system_stats.current)
+            payload["uptime"] = int(self.settings.get("uptime", 0) or 0)
+            await self._reply(ws, msg, payload)
 
     async def _on_network_status(self, ws: WebSocketClientProtocol, msg: dict, expect: bool):
         if expect:
@@ -381,9 +649,7 @@ class WssManager(threading.Thread):
     async def _on_update_username_password(self, ws, msg, expect: bool):
         if expect:
             # Stub OK (you can actually apply OS creds later)
-            await self._reply(ws, msg, {
-                "statusCode": 0, "status": "ok", "deviceID": self._device_id()
-            })
+            await self._reply_status(ws, msg)
 
     async def _on_analytics_test(self, ws, msg, expect: bool):
         if expect:
@@ -392,11 +658,24 @@ class WssManager(threading.Thread):
                 "statusCode": 0, "status": "ok", "deviceID": self._device_id(), **incoming
             })
 
+    def _on_snapshot_fetch(self, seconds: float, background: bool, ok: bool):
+        self.metrics.snapshot_fetch_seconds.labels("prefetch" if background else "request").observe(seconds)
+
+    async def _fetch_snapshot(self, timeout_s: int) -> bytes:
+        """One camera fetch for the SnapshotService (misses and prefetch refreshes)."""
+        jpeg = await self.driver.get_snapshot_jpeg(timeout_s=timeout_s)
+        self.metrics.snapshot_bytes.observe(len(jpeg))
+
+        # DEBUG: queue a copy for the writer if SNAPSHOT_DEBUG is set
+        if self._snapshot_debug:
+            self.snapshot_debug.submit(jpeg)
+        return jpeg
+
     async def _on_get_request(self, ws, msg, expect: bool):
         payload = msg.get("payload") or {}
         if payload.get("what") != "snapshot":
             if expect:
-                await self._reply(ws, msg, {"statusCode": 0, "status": "ok", "deviceID": self._device_id()})
+                await self._reply_status(ws, msg)
             return
 
         uri = payload.get("uri")
@@ -406,38 +685,12 @@ class WssManager(threading.Thread):
         try:
             # Give the driver ~half the time to fetch the JPEG
             driver_timeout = max(1, timeout_s // 2)
-            jpeg = await self.driver.get_snapshot_jpeg(timeout_s=driver_timeout)
-
-            # DEBUG: write a copy locally if SNAPSHOT_DEBUG_DIR is set
-            debug_dir = os.getenv("SNAPSHOT_DEBUG_DIR")
-            if self._snapshot_debug:
-                try:
-                    import hashlib, time as _time, pathlib
-                    sha = hashlib.sha256(jpeg).hexdigest()
-                    head = jpeg[:8].hex()
-
-                    # log some quick visibility
-                    self.log.info(
-                        "Snapshot debug: len=%d sha256=%s… head=%s",
-                        len(jpeg), sha[:12], head
-                    )
-
-                    # write file to static dir and prune to last N
-                    p = pathlib.Path(self._snapshot_debug_dir)
-                    p.mkdir(parents=True, exist_ok=True)
-                    out = p / f"snapshot_{int(_time.time())}.jpg"
-                    out.write_bytes(jpeg)
-                    self._prune_snapshot_dir()
-                    self.log.info("Saved snapshot for debug: %s (%d bytes)", out, len(jpeg))
-
-                except Exception as _e:
-                    self.log.warning("Snapshot debug failed: %s", _e)
-
+            jpeg = await self.snapshots.get(timeout_s=driver_timeout)
             await self._upload_snapshot_and_ack(ws, msg, jpeg, uri, timeout_s)
         except Exception as e:
             self.log.error("get_snapshot_jpeg failed: %s", e)
             if expect:
-                await self._reply(ws, msg, {"statusCode": 1, "status": "error", "deviceID": self._device_id()})
+                await self._reply_status(ws, msg, ok=False)
 
     async def _on_change_video_settings(self, ws, msg, expect: bool):
         if not expect: return
@@ -459,37 +712,27 @@ class WssManager(threading.Thread):
         # Controller expects camera to echo current time in ms
         now_ms = int(time.time() * 1000)
         # Most firmwares reply with { t1, t2 }; either is fine for basic sync
-        await self._reply(ws, msg, {"t1": now_ms, "t2": now_ms})
+        await self._reply(ws, msg, {"t1": now_ms, "t2": now_ms}, LANE_HIGH)
 
     async def _upload_snapshot_and_ack(self, ws: WebSocketClientProtocol, in_msg: dict, jpeg_bytes: bytes, uri: str, timeout_s: int):
         """
         PUT raw JPEG to the controller-provided HTTPS URI, then reply OK/ERROR.
         """
-        from urllib import request as _u, error as _e
-        import ssl as _ssl
-
-        ctx = _ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = _ssl.CERT_NONE
-
-        req = _u.Request(uri, data=jpeg_bytes, method="PUT")
-        req.add_header("Content-Type", "image/jpeg")
-        req.add_header("Content-Length", str(len(jpeg_bytes)))
-
-        try:
-            opener = _u.build_opener(_u.HTTPSHandler(context=ctx))
-            resp = await asyncio.to_thread(opener.open, req, timeout=timeout_s)
-            code = getattr(resp, "code", None)
-            self.log.debug("Snapshot upload HTTP status=%s (len=%d)", code, len(jpeg_bytes))
-
-            if code in (200, 204):
-                await self._reply(ws, in_msg, {"statusCode": 0, "status": "ok", "deviceID": self._device_id()})
-            else:
-                self.log.error("Snapshot upload unexpected status=%s", code)
-                await self._reply(ws, in_msg, {"statusCode": 1, "status": "error", "deviceID": self._device_id()})
-        except _e.URLError as e:
-            self.log.error("Snapshot upload failed: %s", e)
-            await self._reply(ws, in_msg, {"statusCode": 1, "status": "error", "deviceID": self._device_id()})
-        except Exception as e:
-            self.log.error("Snapshot upload exception: %s", e)
-            await self._reply(ws, in_msg, {"statusCode": 1, "status": "error", "deviceID": self._device_id()})
+        result = await self.uploader.upload(uri, jpeg_bytes, timeout_s=timeout_s)
+        m = self.metrics
+        m.upload_seconds.observe(result.seconds)
+
+        if result.ok:
+            m.uploads.labels("ok").inc()
+            self.log.debug("Snapshot upload HTTP status=%s (len=%d, %.1f ms, %s connection)",
+                           result.status, result.bytes, result.seconds * 1e3,
+                           "pooled" if result.reused else "new")
+            await self._reply_status(ws, in_msg)
+        elif result.status is not None:
+            m.uploads.labels("http_error").inc()
+            self.log.error("Snapshot upload unexpected status=%s", result.status)
+            await self._reply_status(ws, in_msg, ok=False)
+        else:
+            m.uploads.labels("failed").inc()
+            self.log.error("Snapshot upload failed: %s", result.error)
+            await self._reply_status(ws, in_msg, ok=False)
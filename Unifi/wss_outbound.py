@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+# Priority lanes, drained highest first
+LANE_HIGH = 0       # time sync, status acks, hello: tiny and latency-sensitive
+LANE_NORMAL = 1     # ordinary replies
+LANE_BULK = 2       # large payloads
+LANE_NAMES = ("high", "normal", "bulk")
+
+DEFAULT_HIGH_WATER = 1024 * 1024        # WSS_SEND_HIGH_WATER
+BULK_BYTES = 16 * 1024                  # replies above this go to the bulk lane
+FAIRNESS = 8                            # after this many higher-lane frames, let one lower through
+
+
+class OutboundQueue:
+    """
+    Single-writer send queue for one WSS connection.
+
+    Handlers put() frames; one writer task sends them, so sends never
+    interleave on the socket. Lanes are drained in priority order (with a
+    little fairness so bulk frames cannot starve). Once `high_water` bytes
+    are queued, put() on the normal and bulk lanes waits until the writer
+    has drained below half of it; the high lane is never held back.
+
+    If the socket fails, queued frames are dropped and every pending or
+    later put() raises the error.
+
+    ENV overrides
+      WSS_SEND_HIGH_WATER=1048576 → queued bytes before handlers wait
+
+    Usage:
+        out = OutboundQueue(ws.send, on_sent=record)
+        out.start()
+        await out.put(frame, LANE_HIGH)
+        ...
+        await out.close()
+    """
+
+    def __init__(self, send: Callable[[bytes], Awaitable], *, high_water: Optional[int] = None,
+                 on_sent: Optional[Callable[[int, bytes, float, object], None]] = None, logger=None):
+        self._send = send
+        self.high_water = int(high_water or os.environ.get("WSS_SEND_HIGH_WATER") or DEFAULT_HIGH_WATER)
+        self.low_water = self.high_water // 2
+        self.on_sent = on_sent      # (lane, frame, queued_at, ctx) after each frame is written
+        self.log = logger or logging.getLogger(__name__)
+        self._lanes = tuple(deque() for _ in LANE_NAMES)
+        self._bytes = 0
+        self._blocked = False
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._streak = 0
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self.stats = {
+            "depth": 0,
+            "bytes": 0,
+            "sent_frames": 0,
+            "sent_bytes": 0,
+            "backpressure_waits": 0,
+            "drain_bps": 0.0,
+            "dropped": 0,
+        }
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="wss-writer")
+
+    async def put(self, frame: bytes, lane: int = LANE_NORMAL, ctx=None):
+        """Queue `frame`; waits while the queue is over the high-water mark (not for LANE_HIGH)."""
+        if self._error is not None:
+            raise self._error
+        if lane != LANE_HIGH:
+            while self._blocked:
+                self.stats["backpressure_waits"] += 1
+                await self._room.wait()
+                if self._error is not None:
+                    raise self._error
+        self._lanes[lane].append((frame, time.perf_counter(), ctx))
+        self._bytes += len(frame)
+        self.stats["depth"] += 1
+        self.stats["bytes"] = self._bytes
+        if self._bytes >= self.high_water and not self._blocked:
+            self._blocked = True
+            self._room.clear()
+        self._ready.set()
+
+    def _pop(self):
+        lanes = self._lanes
+        first = next(i for i, q in enumerate(lanes) if q)
+        if self._streak >= FAIRNESS:
+            lower = next((i for i in range(first + 1, len(lanes)) if lanes[i]), None)
+            if lower is not None:
+                self._streak = 0
+                return lower, lanes[lower].popleft()
+        self._streak = self._streak + 1 if first < len(lanes) - 1 else 0
+        return first, lanes[first].popleft()
+
+    async def _run(self):
+        stats = self.stats
+        try:
+            while True:
+                if not stats["depth"]:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                lane, (frame, queued_at, ctx) = self._pop()
+                await self._send(frame)
+
+                n = len(frame)
+                self._bytes -= n
+                stats["depth"] -= 1
+                stats["bytes"] = self._bytes
+                stats["sent_frames"] += 1
+                stats["sent_bytes"] += n
+                if self._blocked and self._bytes <= self.low_water:
+                    self._blocked = False
+                    self._room.set()
+                self._update_drain(n)
+                if self.on_sent is not None:
+                    self.on_sent(lane, frame, queued_at, ctx)
+        except asyncio.CancelledError:
+            self._fail(ConnectionError("WSS connection closed"))
+            raise
+        except Exception as e:
+            self._fail(e)
+
+    def _update_drain(self, n: int):
+        self._window_bytes += n
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.stats["drain_bps"] = round(self._window_bytes / elapsed, 1)
+            self._window_start = now
+            self._window_bytes = 0
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        dropped = sum(len(q) for q in self._lanes)
+        if dropped:
+            self.stats["dropped"] += dropped
+            self.log.debug("WSS: dropped %d queued frame(s): %s", dropped, error)
+        for q in self._lanes:
+            q.clear()
+        self._bytes = 0
+        self.stats["depth"] = 0
+        self.stats["bytes"] = 0
+        self._room.set()        # wake blocked put()s so they see the error
+
+    async def close(self):
+        """Stop the writer; queued frames are dropped."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._fail(ConnectionError("WSS connection closed"))
@@ -0,0 +1,171 @@
+"""
+Concurrency benchmark for the adoption API server (VerboseAPIServer).
+
+Starts the HTTPS server on a local port with a throwaway self-signed cert
+and settings file, parks STALLED clients that connect and never send a
+request, then runs CLIENTS simultaneous keep-alive clients issuing GET /
+and POST /api/1.2/manage. Reports throughput, latency percentiles and the
+server's connection stats.
+
+Then checks slow clients against a bare AsyncHTTPServer with a short
+request timeout: one trickling its request head, one its body, a byte
+every TRICKLE_GAP seconds. Both must be cut off at the request deadline
+instead of being kept alive by each new byte.
+
+    CAMERA_MODEL=UVC_G4_DOME python test-dev/API-server-concurrency-benchmark.py
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import asyncio
+import logging
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+os.environ.setdefault("CAMERA_MODEL", "UVC_G4_DOME")
+os.environ.setdefault("FIRMWARE_API_URL", "http://127.0.0.1:9/graphql")   # keep the lookup offline
+
+from camera_data.camera_settings import CameraSettings  # noqa: E402
+from api_server import VerboseAPIServer  # noqa: E402
+from utils.http_server import AsyncHTTPServer, HttpResponse  # noqa: E402
+
+CLIENTS = 100
+REQUESTS_PER_CLIENT = 20
+STALLED = 5
+PORT = 44300
+TRICKLE_PORT = 44301
+TRICKLE_TIMEOUT = 1.0
+TRICKLE_GAP = 0.2
+
+MANAGE_BODY = json.dumps({
+    "mgmt": {"token": "bench-token", "hosts": ["127.0.0.1:7442"], "protocol": "wss"},
+}).encode()
+
+
+async def request(reader, writer, method, path, body=b""):
+    head = (f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+    writer.write(head.encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def client(idx, ctx, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT, ssl=ctx)
+    try:
+        for i in range(REQUESTS_PER_CLIENT):
+            t = time.perf_counter()
+            if i % 4 == 0:
+                status = await request(reader, writer, "POST", "/api/1.2/manage", MANAGE_BODY)
+            else:
+                status = await request(reader, writer, "GET", "/")
+            latencies.append(time.perf_counter() - t)
+            assert status == 200, status
+    finally:
+        writer.close()
+
+
+async def trickle(head: bytes, body: bytes = b"") -> float:
+    """
+    Trickle `body` a byte at a time after sending `head` whole (or `head`
+    itself when there is no body); seconds until the server hangs up.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", TRICKLE_PORT)
+    slow = body or head
+    if body:
+        writer.write(head)
+    t = time.perf_counter()
+    try:
+        for i in range(len(slow)):
+            writer.write(slow[i:i + 1])
+            await writer.drain()
+            try:
+                if await asyncio.wait_for(reader.read(1024), TRICKLE_GAP) == b"":
+                    break       # server closed the connection
+            except asyncio.TimeoutError:
+                pass
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    return time.perf_counter() - t
+
+
+async def slow_clients():
+    async def handle(request):
+        await request.read_body()
+        return HttpResponse(200)
+
+    server = AsyncHTTPServer(handle, "127.0.0.1", TRICKLE_PORT, request_timeout=TRICKLE_TIMEOUT)
+    task = asyncio.create_task(server.serve())
+    await asyncio.sleep(0.1)
+    body = b"x" * 200
+    head = f"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+    slow_head = await trickle(head[:-2] + b"X-Pad: " + b"p" * 200 + b"\r\n\r\n")
+    slow_body = await trickle(head, body)
+    limit = TRICKLE_TIMEOUT + 2 * TRICKLE_GAP
+    print(f"slow clients (request_timeout={TRICKLE_TIMEOUT}s, a byte every {TRICKLE_GAP}s): "
+          f"head cut off after {slow_head:.2f}s, body after {slow_body:.2f}s; {server.stats}")
+    assert slow_head < limit and slow_body < limit, (slow_head, slow_body)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger("api-bench")
+    log.setLevel(logging.WARNING)
+    tmp = tempfile.mkdtemp()
+    settings_file = os.path.join(tmp, "settings.json")
+    with open(settings_file, "w") as f:
+        json.dump({"mac": "aa:bb:cc:dd:ee:ff", "host": "127.0.0.1"}, f)
+    settings = CameraSettings(settings_file=settings_file)
+    api = VerboseAPIServer(port=PORT, settings=settings, logger=log,
+                           certfile=os.path.join(tmp, "cert.pem"), keyfile=os.path.join(tmp, "key.pem"))
+    server_task = asyncio.create_task(api.serve())
+    await asyncio.sleep(0.3)
+
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+
+    # connections that never send a request (they would block a serial server)
+    stalled = [await asyncio.open_connection("127.0.0.1", PORT, ssl=ctx) for _ in range(STALLED)]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i, ctx, latencies) for i in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n = len(latencies)
+    print(f"{CLIENTS} clients x {REQUESTS_PER_CLIENT} keep-alive requests, {STALLED} stalled connections")
+    print(f"  total {n} requests in {elapsed:.2f}s -> {n / elapsed:,.0f} req/s")
+    print(f"  latency p50={latencies[n // 2] * 1e3:.1f}ms p99={latencies[int(n * 0.99)] * 1e3:.1f}ms "
+          f"max={latencies[-1] * 1e3:.1f}ms")
+    print(f"  server stats: {api.server.stats}")
+
+    for _, w in stalled:
+        w.close()
+    server_task.cancel()
+    await asyncio.gather(server_task, return_exceptions=True)
+    settings.close()
+    await slow_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
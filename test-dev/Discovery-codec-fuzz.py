@@ -0,0 +1,104 @@
+"""
+Fuzz the discovery codec with mutations of the seed packets in
+test-dev/discovery-corpus/ (bit flips, truncation, splices, corrupted
+length fields, random bytes).
+
+Every input must either decode or raise DiscoveryCodecError; valid seeds
+must also decode to the same values after a decode -> encode round trip.
+
+    python test-dev/Discovery-codec-fuzz.py [iterations] [seed]
+"""
+import os
+import sys
+import random
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+
+import discovery_codec as codec  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "discovery-corpus")
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".bin"):
+            with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def plain(msg):
+    """Message fields with views copied out, so two decodes can be compared."""
+    out = []
+    for fid, value in msg.fields:
+        if isinstance(value, memoryview):
+            value = bytes(value)
+        elif isinstance(value, list):       # nested TLV block: (sub id, view) pairs
+            value = [(sid, bytes(v)) for sid, v in value]
+        out.append((fid, value))
+    return out
+
+
+def round_trip(data: bytes):
+    msg = codec.decode(data)
+    again = codec.decode(codec.encode(plain(msg), msg.version, msg.cmd))
+    return plain(msg), plain(again)
+
+
+def mutate(rng: random.Random, data: bytes, corpus: list) -> bytes:
+    buf = bytearray(data)
+    op = rng.randrange(6)
+    if op == 0 and buf:                                 # bit flips
+        for _ in range(rng.randint(1, 4)):
+            i = rng.randrange(len(buf))
+            buf[i] ^= 1 << rng.randrange(8)
+    elif op == 1:                                       # truncate
+        del buf[rng.randrange(len(buf) + 1):]
+    elif op == 2:                                       # append junk
+        buf += bytes(rng.randrange(256) for _ in range(rng.randint(1, 16)))
+    elif op == 3 and len(buf) >= 4:                     # corrupt a length field
+        i = rng.randrange(2, len(buf) - 1)
+        buf[i:i + 2] = rng.randrange(0x10000).to_bytes(2, "big")
+    elif op == 4:                                       # splice two seeds
+        other = rng.choice(corpus)
+        buf = buf[:rng.randrange(len(buf) + 1)] + other[rng.randrange(len(other) + 1):]
+    else:                                               # random bytes
+        buf = bytearray(rng.randrange(256) for _ in range(rng.randint(0, 64)))
+    return bytes(buf)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    corpus = load_corpus()
+
+    for name, data in corpus.items():
+        try:
+            before, after = round_trip(data)
+        except codec.DiscoveryCodecError as e:
+            assert name.startswith("bad_"), f"{name}: {e}"
+            print(f"seed {name:<28} rejected: {e}")
+            continue
+        assert not name.startswith("bad_"), f"{name} should have been rejected"
+        assert before == after, f"{name}: round trip changed {before} -> {after}"
+        print(f"seed {name:<28} round trip ok")
+
+    seeds = list(corpus.values())
+    decoded = rejected = 0
+    for _ in range(iterations):
+        data = mutate(rng, rng.choice(seeds), seeds)
+        try:
+            codec.decode(data)
+            decoded += 1
+        except codec.DiscoveryCodecError:
+            rejected += 1
+        except Exception as e:
+            raise AssertionError(f"unexpected {type(e).__name__} for {data.hex()}: {e}")
+    print(f"OK: {iterations} mutated inputs, {decoded} decoded, {rejected} rejected")
+
+
+if __name__ == "__main__":
+    main()
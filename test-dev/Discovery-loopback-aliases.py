@@ -0,0 +1,107 @@
+"""
+Discovery binding check using several loopback aliases (Linux routes all of
+127.0.0.0/8 to lo, so no interface setup is needed).
+
+Registers four cameras: two on 127.0.0.2, one each on 127.0.0.3 and
+127.0.0.4. Then, on two high test ports:
+  - one server with a listener per alias: a probe to an alias must be
+    answered from that alias, once for each camera it owns and for no other
+  - one wildcard server: a probe to any local address is answered once for
+    every camera
+Finally moves a camera to another alias (CameraIdentity.update) and checks
+that the alias listeners follow it.
+
+    python test-dev/Discovery-loopback-aliases.py
+"""
+import os
+import sys
+import socket
+import asyncio
+import logging
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+
+from discovery_responder import DiscoveryServer, CameraIdentity  # noqa: E402
+
+ALIAS_PORT = 41001
+WILDCARD_PORT = 41002
+PROBE = b"\x01\x00\x00\x00"
+HOSTS = ("127.0.0.2", "127.0.0.2", "127.0.0.3", "127.0.0.4")
+
+
+def identity(idx: int, host: str) -> CameraIdentity:
+    return CameraIdentity.from_dict({
+        "mac": f"f4:92:bf:00:00:{idx:02x}", "host": host, "marketName": "UVC_G4_DOME",
+    })
+
+
+def mac_of(packet: bytes) -> str:
+    # PRIMARY_ADDRESS is the first field: header(4) + id/len(3) + MAC(6)
+    return packet[7:13].hex(":")
+
+
+async def probe(host: str, port: int):
+    """Send one probe to host:port; return sorted [(responder address, camera mac), ...]."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.bind(("127.0.0.1", 0))
+    try:
+        await loop.sock_sendto(sock, PROBE, (host, port))
+        got = []
+        while True:
+            try:
+                data, addr = await asyncio.wait_for(loop.sock_recvfrom(sock, 2048), 0.3)
+            except asyncio.TimeoutError:
+                return sorted(got)
+            got.append((addr[0], mac_of(data)))
+    finally:
+        sock.close()
+
+
+def expected(cameras, host):
+    return sorted((host, c.get("mac")) for c in cameras if c.get("host") == host)
+
+
+async def main():
+    log = logging.getLogger("discovery-test")
+    cameras = [identity(idx, host) for idx, host in enumerate(HOSTS)]
+    aliases = DiscoveryServer(log, bind=sorted(set(HOSTS)), port=ALIAS_PORT, dedup_window=0)
+    wildcard = DiscoveryServer(log, port=WILDCARD_PORT, dedup_window=0)
+    for camera in cameras:
+        aliases.add_camera(camera)
+        wildcard.add_camera(camera)
+
+    tasks = [asyncio.create_task(s.serve()) for s in (aliases, wildcard)]
+    await asyncio.sleep(0.1)
+    try:
+        for host in sorted(set(HOSTS)):
+            got = await probe(host, ALIAS_PORT)
+            assert got == expected(cameras, host), (host, got)
+        print("OK: each alias answered once per camera it owns, from the alias")
+
+        all_macs = sorted(c.get("mac") for c in cameras)
+        for host in ("127.0.0.1", "127.0.0.3"):
+            got = await probe(host, WILDCARD_PORT)
+            # the kernel picks the source address of a wildcard socket's replies
+            assert [m for _, m in got] == all_macs, (host, got)
+        print("OK: the wildcard listener answered once for every camera")
+
+        cameras[0].update({"host": "127.0.0.4"})
+        for host in ("127.0.0.2", "127.0.0.4"):
+            got = await probe(host, ALIAS_PORT)
+            assert got == expected(cameras, host), (host, got)
+        print("OK: alias listeners followed a host change")
+
+        print(f"  aliases  bind={aliases.bind} stats={aliases.stats}")
+        print(f"  wildcard bind={wildcard.bind} stats={wildcard.stats}")
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Microbenchmark: CameraSettings read throughput under concurrent writers.
+
+Compares the lock-free snapshot read path (settings.get / settings.snapshot)
+against the previous RLock + str.split read path, while WRITERS threads keep
+publishing changes.
+
+    CAMERA_MODEL=UVC_G4_DOME python test-dev/Settings-snapshot-benchmark.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+os.environ.setdefault("CAMERA_MODEL", "UVC_G4_DOME")
+
+from camera_data.camera_settings import CameraSettings  # noqa: E402
+
+READERS = 4
+WRITERS = 2
+DURATION_S = 2.0
+KEYS = ["mac", "host", "platform", "firmwareVersion", "sysid", "mgmt.token", "mgmt.connectionHost", "uptime"]
+
+
+def locked_get(settings, key, default=None):
+    """The pre-snapshot read path: RLock + re-split of the dotted key on every call."""
+    with settings._lock:
+        value = settings.settings
+        for part in key.split("."):
+            if not isinstance(value, dict) or part not in value:
+                return default
+            value = value[part]
+        return value
+
+
+def run(label, read_batch, settings):
+    stop = threading.Event()
+    counts = [0] * READERS
+
+    def reader(idx):
+        n = 0
+        while not stop.is_set():
+            read_batch(settings)
+            n += len(KEYS)
+        counts[idx] = n
+
+    def writer(idx):
+        i = 0
+        while not stop.is_set():
+            settings[f"bench.writer{idx}"] = i
+            i += 1
+            time.sleep(0.0005)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for t in threads:
+        t.start()
+    time.sleep(DURATION_S)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    total = sum(counts)
+    print(f"{label:<28} {total / DURATION_S:>14,.0f} reads/s  (version={settings.snapshot().version})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "settings.json")
+        with open(path, "w") as f:
+            json.dump({
+                "mac": "aa:bb:cc:dd:ee:ff", "host": "192.168.1.50", "firmwareVersion": "5.0.0",
+                "mgmt": {"token": "x" * 32, "connectionHost": "192.168.1.1:7442"},
+            }, f)
+
+        settings = CameraSettings(settings_file=path, flush_interval=1.0)
+        settings.update({"upSince": int(time.time() * 1000)})
+
+        print(f"{READERS} readers, {WRITERS} writers, {DURATION_S}s each")
+        run("locked (RLock + split)", lambda s: [locked_get(s, k) for k in KEYS], settings)
+        run("lock-free settings.get", lambda s: [s.get(k) for k in KEYS], settings)
+
+        def snapshot_batch(s):
+            snap = s.snapshot()  # one reference per message, as the hot paths do
+            return [snap.get(k) for k in KEYS]
+        run("one snapshot() per batch", snapshot_batch, settings)
+        settings.close()
+
+
+if __name__ == "__main__":
+    main()
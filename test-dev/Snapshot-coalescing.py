@@ -0,0 +1,72 @@
+"""
+Camera load under snapshot bursts (SnapshotService).
+
+VIEWERS callers ask for a snapshot at once, BURSTS times, spaced GAP
+seconds apart, against a driver stand-in whose fetch takes FETCH_DELAY.
+Reports how many camera fetches each policy cost and the hit/miss/join
+counters:
+
+  no coalescing    - one driver fetch per request (the original behaviour)
+  single-flight    - SNAPSHOT_TTL_MS=0: concurrent requests share a fetch
+  single-flight+TTL - SNAPSHOT_TTL_MS=1000: later bursts served from memory
+
+    python test-dev/Snapshot-coalescing.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from Unifi.snapshot_service import SnapshotService  # noqa: E402
+
+VIEWERS = 8
+BURSTS = 5
+GAP = 0.2
+FETCH_DELAY = 0.3
+
+
+class CountingDriver:
+    def __init__(self):
+        self.fetches = 0
+
+    async def get_snapshot_jpeg(self, *, timeout_s: int = 5) -> bytes:
+        self.fetches += 1
+        await asyncio.sleep(FETCH_DELAY)
+        return b"\xff\xd8" + os.urandom(1000) + b"\xff\xd9"
+
+
+async def run(label, get, driver, stats=None):
+    t0 = time.perf_counter()
+    waits = []
+
+    async def viewer():
+        t = time.perf_counter()
+        await get()
+        waits.append(time.perf_counter() - t)
+
+    for _ in range(BURSTS):
+        await asyncio.gather(*(viewer() for _ in range(VIEWERS)))
+        await asyncio.sleep(GAP)
+    waits.sort()
+    print(f"{label}: {BURSTS * VIEWERS} requests -> {driver.fetches} camera fetch(es) "
+          f"in {time.perf_counter() - t0:.2f}s, wait p50={waits[len(waits) // 2] * 1e3:.0f}ms")
+    if stats is not None:
+        print(f"  {stats}")
+
+
+async def main():
+    driver = CountingDriver()
+    await run("no coalescing", lambda: driver.get_snapshot_jpeg(timeout_s=5), driver)
+
+    for label, ttl in (("single-flight", 0.0), ("single-flight+TTL 1s", 1.0)):
+        driver = CountingDriver()
+        service = SnapshotService(lambda t, d=driver: d.get_snapshot_jpeg(timeout_s=t), ttl=ttl)
+        await run(label, lambda: service.get(timeout_s=5), driver, service.stats)
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
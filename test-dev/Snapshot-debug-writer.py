@@ -0,0 +1,99 @@
+"""
+Event-loop stalls from SNAPSHOT_DEBUG copies: inline vs SnapshotDebugWriter.
+
+Saves SNAPSHOTS JPEG-sized bodies, BURST at a time, into a temp directory
+while a ticker measures how late the loop wakes it (what a timeSync reply
+would wait). "inline" is the original path: sha256 + write_bytes on the
+loop, then glob/stat/sort the directory to prune. "writer" queues each
+copy for SnapshotDebugWriter. Also checks that every name was unique and
+that exactly KEEP files remain.
+
+    python test-dev/Snapshot-debug-writer.py
+"""
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+import pathlib
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from Unifi.snapshot_debug import SnapshotDebugWriter  # noqa: E402
+
+SNAPSHOTS = 200
+BURST = 4
+BODY_BYTES = 400_000
+KEEP = 5
+TICK = 0.001
+
+
+def save_inline(directory: pathlib.Path, jpeg: bytes):
+    hashlib.sha256(jpeg).hexdigest()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"snapshot_{int(time.time())}.jpg").write_bytes(jpeg)
+    files = sorted(directory.glob("snapshot_*.jpg"), key=lambda f: f.stat().st_mtime, reverse=True)
+    for old in files[KEEP:]:
+        old.unlink()
+
+
+async def measure(label, save, directory):
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - t - TICK)
+
+    tick = asyncio.create_task(ticker())
+    body = b"\xff\xd8" + os.urandom(BODY_BYTES) + b"\xff\xd9"
+    t0 = time.perf_counter()
+    for i in range(0, SNAPSHOTS, BURST):
+        for n in range(BURST):
+            save(body[:-4] + (i + n).to_bytes(4, "big"))
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - t0
+    done = True
+    await tick
+    lags.sort()
+    files = list(directory.glob("snapshot_*.jpg"))
+    print(f"{label}: {SNAPSHOTS} snapshots in {elapsed:.2f}s, loop lag "
+          f"p50={lags[len(lags) // 2] * 1e3:.2f}ms p99={lags[int(len(lags) * 0.99)] * 1e3:.2f}ms "
+          f"max={lags[-1] * 1e3:.1f}ms; {len(files)} file(s) kept")
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    tmp = pathlib.Path(tempfile.mkdtemp())
+
+    inline_dir = tmp / "inline"
+    await measure("inline", lambda jpeg: save_inline(inline_dir, jpeg), inline_dir)
+
+    writer_dir = tmp / "writer"
+    writer = SnapshotDebugWriter(str(writer_dir), keep=KEEP)
+    writer.start()
+    names = []
+    orig_write = writer._write
+
+    def record(seq, jpeg):
+        orig_write(seq, jpeg)
+        names.append(writer._index[-1].name)
+
+    writer._write = record
+    await measure("writer", writer.submit, writer_dir)
+    while writer._queue.qsize():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    await writer.close()
+    kept = len(list(writer_dir.glob("snapshot_*.jpg")))
+    print(f"  {writer.stats}")
+    print(f"  names unique: {len(names) == len(set(names))} ({len(names)} written), kept {kept} (KEEP={KEEP})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Snapshot request latency with and without background prefetch.
+
+A controller stand-in asks for a snapshot every REQUEST_GAP seconds for
+ACTIVE seconds, goes quiet for IDLE seconds, then asks a few more times.
+The driver stand-in takes FETCH_DELAY per fetch (an Amcrest snapshot.cgi
+round trip). Reports per-request latency, the age of the JPEGs served,
+the camera fetches spent, and how the refresh interval backed off while
+the controller was quiet.
+
+    python test-dev/Snapshot-prefetch.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from Unifi.snapshot_service import SnapshotService  # noqa: E402
+
+FETCH_DELAY = 0.25
+REQUEST_GAP = 0.5
+ACTIVE = 4.0
+IDLE = 6.0
+# scaled-down schedule so the run takes seconds
+MIN_INTERVAL, MAX_INTERVAL, MAX_AGE, IDLE_PAUSE = 0.4, 2.0, 2.5, 5.0
+
+
+class CountingDriver:
+    def __init__(self):
+        self.fetches = 0
+
+    async def get_snapshot_jpeg(self, *, timeout_s: int = 5) -> bytes:
+        self.fetches += 1
+        await asyncio.sleep(FETCH_DELAY)
+        return b"\xff\xd8" + os.urandom(1000) + b"\xff\xd9"
+
+
+def _p(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def run(label, prefetch):
+    driver = CountingDriver()
+    ages = []
+    service = SnapshotService(
+        lambda t: driver.get_snapshot_jpeg(timeout_s=t), ttl=0.0, prefetch=prefetch,
+        min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, max_age=MAX_AGE, idle_pause=IDLE_PAUSE,
+        on_serve=ages.append,
+    )
+    service.start()
+    latency = []
+
+    async def request():
+        t = time.perf_counter()
+        await service.get(timeout_s=5)
+        latency.append(time.perf_counter() - t)
+
+    stop = time.monotonic() + ACTIVE
+    while time.monotonic() < stop:
+        await request()
+        await asyncio.sleep(REQUEST_GAP)
+    active_fetches = driver.fetches
+
+    intervals = []
+    for _ in range(int(IDLE)):
+        await asyncio.sleep(1.0)
+        intervals.append(service.interval)
+    idle_fetches = driver.fetches - active_fetches
+
+    for _ in range(3):
+        await request()
+        await asyncio.sleep(REQUEST_GAP)
+    await service.close()
+
+    print(f"{label}: {len(latency)} requests, latency p50={_p(latency, 0.5) * 1e3:.1f}ms "
+          f"max={max(latency) * 1e3:.1f}ms")
+    print(f"  served age p50={_p(ages, 0.5) * 1e3:.0f}ms max={max(ages) * 1e3:.0f}ms")
+    print(f"  camera fetches: {active_fetches} while active, {idle_fetches} while idle, "
+          f"{driver.fetches} total; {service.stats}")
+    if prefetch:
+        print("  refresh interval while idle (1s samples): " + " ".join(f"{i:.1f}" for i in intervals))
+
+
+async def main():
+    await run("on demand", prefetch=False)
+    await run("prefetch", prefetch=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
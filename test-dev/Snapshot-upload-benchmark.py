@@ -0,0 +1,101 @@
+"""
+Snapshot upload latency: urllib per call vs the pooled SnapshotUploader.
+
+Uploads UPLOADS JPEG-sized bodies to a local UploadServer (standing in for
+the controller) two ways and reports p50/p99 per upload plus the TLS
+handshakes the server saw:
+
+  urllib, new context   - ssl context + urlopen per upload (the original code)
+  SnapshotUploader      - aiohttp keep-alive pool on the event loop
+
+    python test-dev/Snapshot-upload-benchmark.py
+"""
+import os
+import sys
+import ssl
+import time
+import asyncio
+import logging
+import tempfile
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+
+from upload_server import UploadServer  # noqa: E402
+from utils.tls_utils import TLSContexts  # noqa: E402
+from Unifi.snapshot_uploader import SnapshotUploader  # noqa: E402
+
+UPLOADS = 50
+BODY_BYTES = 200_000
+PORT = 47446
+URI = f"https://127.0.0.1:{PORT}/internal/camera-upload/bench"
+
+
+def _put(ctx: ssl.SSLContext, body: bytes):
+    req = urllib.request.Request(URI, data=body, method="PUT", headers={"Content-Type": "image/jpeg"})
+    with urllib.request.urlopen(req, context=ctx, timeout=10) as r:
+        return r.status
+
+
+async def bench_new_context(tls, body):
+    def once():
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        return _put(ctx, body)
+    return [await _timed(asyncio.to_thread(once)) for _ in range(UPLOADS)], None
+
+
+async def bench_pooled(tls, body):
+    uploader = SnapshotUploader(tls)
+    try:
+        times = []
+        for _ in range(UPLOADS):
+            result = await uploader.upload(URI, body)
+            assert result.ok, result
+            times.append(result.seconds)
+        return times, f"uploader: {uploader.stats}"
+    finally:
+        await uploader.close()
+
+
+async def _timed(coro):
+    t0 = time.perf_counter()
+    status = await coro
+    assert status in (200, 204), status
+    return time.perf_counter() - t0
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger("upload-bench")
+    tmp = tempfile.mkdtemp()
+    tls = TLSContexts(os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem"), log)
+    tls.ensure_cert(host="127.0.0.1")
+    server = UploadServer(host="127.0.0.1", port=PORT, logger=log, tls=tls)
+    task = asyncio.create_task(server.serve())
+    await asyncio.sleep(0.3)
+    body = b"\xff\xd8" + os.urandom(BODY_BYTES) + b"\xff\xd9"
+
+    for label, bench in (("urllib, new context", bench_new_context),
+                         ("SnapshotUploader", bench_pooled)):
+        before = tls.stats()["server"]
+        conns = server.server.stats["connections"]
+        times, extra = await bench(tls, body)
+        times.sort()
+        after = tls.stats()["server"]
+        print(f"{label}: {UPLOADS} x {BODY_BYTES // 1000} kB "
+              f"p50={times[len(times) // 2] * 1e3:.1f}ms p99={times[int(len(times) * 0.99)] * 1e3:.1f}ms")
+        print(f"  server: {server.server.stats['connections'] - conns} connection(s), "
+              f"{after['full'] - before['full']} full / {after['resumed'] - before['resumed']} resumed handshake(s)")
+        if extra:
+            print(f"  {extra}")
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
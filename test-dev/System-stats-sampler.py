@@ -0,0 +1,66 @@
+"""
+GetSystemStats figures from SystemStatsSampler.
+
+Samples every INTERVAL seconds while a thread burns CPU for part of the
+run, printing what GetSystemStats would report (this process's cpu and
+memory share, host temperature, driver extras) and the process figures
+it comes from. Then compares the cost of
+one background sample with the handler's per-request work (copying the
+cached dict).
+
+    python test-dev/System-stats-sampler.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from Unifi.utils.system_stats import SystemStatsSampler  # noqa: E402
+
+INTERVAL = 0.5
+SAMPLES = 8
+REQUESTS = 100_000
+
+
+def burn(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(10_000))
+
+
+async def driver_stats():
+    return {"temperature": 41, "sensorTemperature": 38}    # camera-side figures
+
+
+async def main():
+    sampler = SystemStatsSampler(interval=INTERVAL, extra=driver_stats)
+    sampler.start()
+    stop = threading.Event()
+    for i in range(SAMPLES):
+        if i == SAMPLES // 2:
+            threading.Thread(target=burn, args=(stop,), daemon=True).start()
+        await asyncio.sleep(INTERVAL)
+        print(f"{'burning' if i >= SAMPLES // 2 else 'idle':7s} current={sampler.current} process={sampler.process}")
+    stop.set()
+    await sampler.close()
+
+    n = 200
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await sampler.sample()
+    sample_us = (time.perf_counter() - t0) / n * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(REQUESTS):
+        payload = dict(sampler.current)
+        payload["uptime"] = 0
+    request_us = (time.perf_counter() - t0) / REQUESTS * 1e6
+    print(f"background sample {sample_us:.0f}us (every {INTERVAL}s), per request {request_us:.2f}us; "
+          f"{sampler.stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
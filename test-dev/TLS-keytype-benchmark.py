@@ -0,0 +1,112 @@
+"""
+Certificate startup and TLS handshake cost per key type.
+
+For ECDSA P-256, RSA-2048 and RSA-3072 this measures:
+  - in-process generation (generate_self_signed) vs the old `openssl req` fork
+  - full handshakes/s over in-memory BIOs (no sockets, server CPU dominated)
+  - resumed handshakes/s (session ticket), for reconnect churn
+
+    python test-dev/TLS-keytype-benchmark.py
+"""
+import os
+import sys
+import ssl
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+
+from utils.tls_utils import generate_self_signed  # noqa: E402
+
+HANDSHAKE_S = 1.0
+KEY_TYPES = [("ec", 0, "ec", "ECDSA P-256"),
+             ("rsa", 2048, "rsa:2048", "RSA-2048"),
+             ("rsa", 3072, "rsa:3072", "RSA-3072")]
+
+
+def handshake(server_ctx, client_ctx, session=None):
+    """One TLS handshake between two SSLObjects over memory BIOs; return the client SSLObject."""
+    c_in, c_out, s_in, s_out = (ssl.MemoryBIO() for _ in range(4))
+    client = client_ctx.wrap_bio(c_in, c_out, server_hostname="localhost", session=session)
+    server = server_ctx.wrap_bio(s_in, s_out, server_side=True)
+    done_c = done_s = False
+    while not (done_c and done_s):
+        if not done_c:
+            try:
+                client.do_handshake()
+                done_c = True
+            except ssl.SSLWantReadError:
+                pass
+        s_in.write(c_out.read())
+        if not done_s:
+            try:
+                server.do_handshake()
+                done_s = True
+            except ssl.SSLWantReadError:
+                pass
+        c_in.write(s_out.read())
+    # let the client process TLS 1.3 session tickets
+    try:
+        client.read(1)
+    except ssl.SSLWantReadError:
+        pass
+    return client
+
+
+def rate(fn):
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < HANDSHAKE_S:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - start)
+
+
+def openssl_time(spec, tmp):
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(tmp, "o.pem"), os.path.join(tmp, "o.key")
+    if spec == "ec":
+        args = ["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:P-256"]
+    else:
+        args = ["openssl", "req", "-x509", "-newkey", spec]
+    t = time.perf_counter()
+    subprocess.run(args + ["-nodes", "-keyout", key, "-out", cert, "-days", "365", "-subj", "/CN=localhost"],
+                   check=True, capture_output=True)
+    return time.perf_counter() - t
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ctx.check_hostname = False
+    client_ctx.verify_mode = ssl.CERT_NONE
+
+    print(f"{'key':<12} {'in-process':>11} {'openssl':>9} {'full hs/s':>10} {'resumed hs/s':>13}")
+    try:
+        for key_type, bits, spec, label in KEY_TYPES:
+            cert, key = os.path.join(tmp, f"{label}.pem"), os.path.join(tmp, f"{label}.key")
+            t = time.perf_counter()
+            generate_self_signed(cert, key, key_type, bits or 2048, host="192.168.1.10", mac="f4:92:bf:12:34:56")
+            gen_s = time.perf_counter() - t
+            fork_s = openssl_time(spec, tmp)
+
+            server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_ctx.load_cert_chain(cert, key)
+            full = rate(lambda: handshake(server_ctx, client_ctx))
+            session = handshake(server_ctx, client_ctx).session
+            resumed = rate(lambda: handshake(server_ctx, client_ctx, session))
+            assert handshake(server_ctx, client_ctx, session).session_reused
+
+            fork_txt = f"{fork_s * 1e3:7.0f}ms" if fork_s is not None else "      n/a"
+            print(f"{label:<12} {gen_s * 1e3:9.1f}ms {fork_txt} {full:10.0f} {resumed:13.0f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Memory check for streaming snapshot uploads (UploadServer).
+
+Starts the upload server on a local port with a throwaway self-signed cert,
+then PUTs synthetic "snapshots" of growing size, both with Content-Length
+and chunked. The client streams from a generator so the only large
+allocations traced are the server's. Reports the traced peak per upload
+(it should stay near the spool size whatever the upload size, even though
+the debug ring keeps every upload), checks that /debug/last-snapshot
+serves back the bytes sent and that uploads over UPLOAD_MAX_BYTES are
+answered 413. Finally evicts a large on-disk ring entry while it is being
+read (refilling the ring with new spool files that may reuse its file
+descriptor) and checks the reader still gets the evicted entry's bytes.
+
+    python test-dev/Upload-streaming-memory.py
+"""
+import os
+import sys
+import ssl
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+import tracemalloc
+import http.client
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+
+from upload_server import SnapshotRing, UploadServer  # noqa: E402
+from utils.tls_utils import TLSContexts  # noqa: E402
+
+PORT = 47444
+MAX_BYTES = 32 * 1024 * 1024
+SPOOL_BYTES = 1024 * 1024
+RING_BYTES = 64 * 1024 * 1024    # large uploads stay in the ring as spool files
+SIZES_MB = (1, 8, 24)
+PIECE = 64 * 1024
+
+
+def _pieces(total: int, digest):
+    block = os.urandom(PIECE)
+    sent = 0
+    while sent < total:
+        data = block[:min(PIECE, total - sent)]
+        digest.update(data)
+        sent += len(data)
+        yield data
+
+
+def _put(ctx, size: int, chunked: bool):
+    digest = hashlib.sha256()
+    conn = http.client.HTTPSConnection("127.0.0.1", PORT, context=ctx, timeout=60)
+    headers = {"Content-Type": "image/jpeg", "Expect": "100-continue"}
+    if not chunked:
+        headers["Content-Length"] = str(size)
+    try:
+        conn.request("PUT", f"/internal/camera-upload/bench-{size}", body=_pieces(size, digest),
+                     headers=headers, encode_chunked=chunked)
+        status = conn.getresponse().status
+    except (ConnectionError, ssl.SSLError):
+        status = "closed"       # server answered 413 and hung up mid-body
+    finally:
+        conn.close()
+    return status, digest.hexdigest()
+
+
+def _last_sha(ctx):
+    conn = http.client.HTTPSConnection("127.0.0.1", PORT, context=ctx, timeout=60)
+    try:
+        conn.request("GET", "/debug/last-snapshot")
+        return hashlib.sha256(conn.getresponse().read()).hexdigest()
+    finally:
+        conn.close()
+
+
+def _spool(size: int):
+    body = os.urandom(size)
+    f = tempfile.TemporaryFile()
+    f.write(body)
+    f.flush()
+    return f, {"length": size, "sha256": hashlib.sha256(body).hexdigest()}
+
+
+async def evict_while_reading(rounds: int = 20, size: int = 24 << 20):
+    ring = SnapshotRing(capacity=1, max_bytes=MAX_BYTES)
+    ok = 0
+    for _ in range(rounds):
+        entry = ring.add(*_spool(size))
+        read = asyncio.create_task(entry.read())
+        await asyncio.sleep(0)              # read() has handed the file to its worker
+        for _ in range(4):                  # evict it; new spools may get its fd number
+            ring.add(*_spool(64 << 10))
+        data = await read
+        ok += hashlib.sha256(data).hexdigest() == entry.meta["sha256"]
+    ring.clear()
+    print(f"evicted mid-read: {ok}/{rounds} reads returned the evicted entry's bytes")
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger("upload-bench")
+    tmp = tempfile.mkdtemp()
+    tls = TLSContexts(os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem"), log)
+    tls.ensure_cert(host="127.0.0.1")
+    server = UploadServer(host="127.0.0.1", port=PORT, logger=log, tls=tls,
+                          max_bytes=MAX_BYTES, spool_bytes=SPOOL_BYTES, ring_bytes=RING_BYTES)
+    threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True).start()
+    time.sleep(0.5)
+
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+
+    print(f"max={MAX_BYTES >> 20} MiB spool={SPOOL_BYTES >> 20} MiB")
+    print(f"{'size':>8} {'mode':>8} {'status':>7} {'peak MiB':>9} {'sha ok':>7} {'secs':>6}")
+    last_sha = None
+    tracemalloc.start()
+    for mb in SIZES_MB + (MAX_BYTES // (1 << 20) + 8,):
+        for chunked in (False, True):
+            tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+            status, sha = _put(ctx, mb << 20, chunked)
+            secs = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+            ok = status == 200 and server.snapshots.latest().meta["sha256"] == sha
+            if ok:
+                last_sha = sha
+            print(f"{mb:>6}MB {'chunked' if chunked else 'length':>8} {status!s:>7} "
+                  f"{peak:>9.1f} {str(ok):>7} {secs:>6.2f}")
+    tracemalloc.stop()
+    print(f"/debug/last-snapshot serves the last accepted upload: {_last_sha(ctx) == last_sha}")
+    asyncio.run(evict_while_reading())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Latency check for WSS message dispatch (WssManager + WssDispatcher).
+
+Feeds WssManager._serve_loop a scripted controller: one GetRequest snapshot
+whose driver takes SNAPSHOT_DELAY seconds (uploaded to a local
+UploadServer), then a ubnt_avclient_timeSync every 100 ms and a burst of
+settings changes. Measures how long each timeSync waits for its reply and
+checks that settings replies come back in the order they were sent.
+
+Runs twice: concurrent dispatch (default) and WSS_MAX_IN_FLIGHT=1, which
+serialises handlers the way the inline loop used to.
+
+    CAMERA_MODEL=UVC_G4_DOME python test-dev/WSS-dispatch-latency.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+os.environ.setdefault("CAMERA_MODEL", "UVC_G4_DOME")
+os.environ.setdefault("FIRMWARE_API_URL", "http://127.0.0.1:9/graphql")   # keep the lookup offline
+
+from camera_data.camera_settings import CameraSettings  # noqa: E402
+from upload_server import UploadServer  # noqa: E402
+from utils.tls_utils import TLSContexts  # noqa: E402
+from Unifi.wss_manager import WssManager  # noqa: E402
+
+SNAPSHOT_DELAY = 2.0
+TIME_SYNCS = 15
+SETTINGS_CHANGES = 5
+UPLOAD_PORT = 47445
+
+
+class SlowDriver:
+    """Driver stand-in whose snapshot takes SNAPSHOT_DELAY seconds."""
+
+    async def get_snapshot_jpeg(self, *, timeout_s: int = 5) -> bytes:
+        await asyncio.sleep(SNAPSHOT_DELAY)
+        return b"\xff\xd8" + os.urandom(200_000) + b"\xff\xd9"
+
+    async def apply_video_settings(self, payload):
+        await asyncio.sleep(0.05 * (1 + (payload.get("n", 0) % 2)))   # uneven, to tempt reordering
+        return {"video": payload.get("video", {})}
+
+
+class ScriptedSocket:
+    """Just enough of a websocket: iterate incoming frames, collect sent ones."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []      # (monotonic time, message)
+
+    async def send(self, data):
+        self.sent.append((time.monotonic(), json.loads(data)))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        msg = await self.incoming.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+
+async def run_once(mgr: WssManager) -> dict:
+    ws = ScriptedSocket()
+    loop_task = asyncio.create_task(mgr._serve_loop(ws))
+    sent_at = {}
+    mid = 0
+
+    def push(fn, payload, expect=True):
+        nonlocal mid
+        mid += 1
+        sent_at[mid] = time.monotonic()
+        ws.incoming.put_nowait(json.dumps({
+            "from": "UniFiVideo", "to": "ubnt_avclient", "functionName": fn,
+            "messageId": mid, "responseExpected": expect, "payload": payload,
+        }))
+        return mid
+
+    snap_id = push("GetRequest", {
+        "what": "snapshot", "timeoutMs": 10000,
+        "uri": f"https://127.0.0.1:{UPLOAD_PORT}/internal/camera-upload/bench",
+    })
+    sync_ids, change_ids = [], []
+    for i in range(TIME_SYNCS):
+        await asyncio.sleep(0.1)
+        sync_ids.append(push("ubnt_avclient_timeSync", {}))
+        if i < SETTINGS_CHANGES:
+            change_ids.append(push("ChangeVideoSettings", {"n": i, "video": {}}))
+
+    deadline = time.monotonic() + SNAPSHOT_DELAY * (TIME_SYNCS + 2)
+    while time.monotonic() < deadline:
+        if any(m.get("inResponseTo") == snap_id for _, m in ws.sent) and \
+                len(ws.sent) >= 1 + 1 + TIME_SYNCS + SETTINGS_CHANGES:
+            break
+        await asyncio.sleep(0.05)
+    ws.incoming.put_nowait(None)
+    await loop_task
+
+    replies = {m.get("inResponseTo"): (t, m) for t, m in ws.sent if m.get("inResponseTo")}
+    sync_ms = sorted((replies[i][0] - sent_at[i]) * 1e3 for i in sync_ids if i in replies)
+    change_order = [m["inResponseTo"] for _, m in ws.sent if m.get("inResponseTo") in change_ids]
+    return {
+        "snapshot_s": replies[snap_id][0] - sent_at[snap_id] if snap_id in replies else None,
+        "snapshot_status": replies[snap_id][1]["payload"]["status"] if snap_id in replies else "none",
+        "sync_ms": sync_ms,
+        "settings_in_order": change_order == change_ids,
+    }
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger("wss-bench")
+    tmp = tempfile.mkdtemp()
+    settings_file = os.path.join(tmp, "settings.json")
+    with open(settings_file, "w") as f:
+        json.dump({"mac": "aa:bb:cc:dd:ee:ff", "host": "127.0.0.1"}, f)
+    settings = CameraSettings(settings_file=settings_file)
+    tls = TLSContexts(os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem"), log)
+    tls.ensure_cert(host="127.0.0.1")
+    upload = asyncio.create_task(UploadServer(host="127.0.0.1", port=UPLOAD_PORT, logger=log, tls=tls).serve())
+    await asyncio.sleep(0.3)
+
+    mgr = WssManager(settings, log, tls=tls)
+    mgr.driver = SlowDriver()
+    mgr.snapshots.ttl = 0       # every run fetches from the driver
+
+    for label, cap in (("concurrent", None), ("serial (WSS_MAX_IN_FLIGHT=1)", "1")):
+        if cap:
+            os.environ["WSS_MAX_IN_FLIGHT"] = cap
+        else:
+            os.environ.pop("WSS_MAX_IN_FLIGHT", None)
+        r = await run_once(mgr)
+        ms = r["sync_ms"]
+        print(f"{label}:")
+        print(f"  snapshot ({SNAPSHOT_DELAY:.1f}s driver) answered in {r['snapshot_s']:.2f}s "
+              f"status={r['snapshot_status']}")
+        if ms:
+            print(f"  timeSync x{len(ms)}: p50={ms[len(ms) // 2]:.1f}ms max={ms[-1]:.1f}ms")
+        print(f"  settings replies in order: {r['settings_in_order']}")
+
+    await mgr.uploader.close()
+    upload.cancel()
+    await asyncio.gather(upload, return_exceptions=True)
+    settings.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
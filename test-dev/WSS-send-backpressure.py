@@ -0,0 +1,74 @@
+"""
+Backpressure check for the WSS outbound queue (OutboundQueue).
+
+A "slow controller" socket accepts SOCKET_BPS bytes per second. PRODUCERS
+handlers each push bulk 256 KiB frames as fast as put() lets them while a
+time-sync ticker puts a small high-priority frame every 50 ms. Reports the
+peak queued bytes (bounded by the high-water mark plus one frame per
+producer), how often producers were held back, the drain rate and the
+time-sync queue latency (which should stay around one frame's write time).
+
+    python test-dev/WSS-send-backpressure.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from Unifi.wss_outbound import LANE_BULK, LANE_HIGH, OutboundQueue  # noqa: E402
+
+SOCKET_BPS = 8 * 1024 * 1024
+HIGH_WATER = 1024 * 1024
+BULK_FRAME = 256 * 1024
+PRODUCERS = 4
+DURATION = 3.0
+
+
+async def main():
+    async def slow_send(frame: bytes):
+        await asyncio.sleep(len(frame) / SOCKET_BPS)
+
+    sync_latency = []
+
+    def on_sent(lane, frame, queued_at, ctx):
+        if lane == LANE_HIGH:
+            sync_latency.append(time.perf_counter() - queued_at)
+
+    out = OutboundQueue(slow_send, high_water=HIGH_WATER, on_sent=on_sent)
+    out.start()
+    peak = 0
+    stop = time.monotonic() + DURATION
+
+    async def producer():
+        nonlocal peak
+        frame = b"x" * BULK_FRAME
+        while time.monotonic() < stop:
+            await out.put(frame, LANE_BULK)
+            peak = max(peak, out.stats["bytes"])
+
+    async def ticker():
+        while time.monotonic() < stop:
+            await out.put(b'{"functionName":"ubnt_avclient_timeSync"}', LANE_HIGH)
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(ticker(), *(producer() for _ in range(PRODUCERS)))
+    stats = dict(out.stats)
+    await out.close()
+
+    sync_latency.sort()
+    n = len(sync_latency)
+    print(f"socket {SOCKET_BPS >> 20} MiB/s, high water {HIGH_WATER >> 10} KiB, "
+          f"{PRODUCERS} producers x {BULK_FRAME >> 10} KiB frames, {DURATION:.0f}s")
+    print(f"  peak queued {peak >> 10} KiB (bound {(HIGH_WATER + PRODUCERS * BULK_FRAME) >> 10} KiB)")
+    print(f"  sent {stats['sent_frames']} frames / {stats['sent_bytes'] >> 20} MiB, "
+          f"drain {stats['drain_bps'] / (1 << 20):.1f} MiB/s, backpressure waits {stats['backpressure_waits']}")
+    if n:
+        print(f"  timeSync queue latency p50={sync_latency[n // 2] * 1e3:.1f}ms "
+              f"max={sync_latency[-1] * 1e3:.1f}ms (one bulk frame = {BULK_FRAME / SOCKET_BPS * 1e3:.0f}ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Throughput benchmark for the WSS message path (WssManager._serve_loop).
+
+Pushes MESSAGES controller frames (a mix of timeSync, GetSystemStats,
+NetworkStatus, paramAgreement and settings acks) through _serve_loop on a
+mocked socket and reports messages per second for each JSON codec
+(orjson when installed, stdlib json). After a warm-up round the codecs
+take turns, ROUNDS times each with the GC paused, and the median and
+best rates are reported; the spread between them shows how noisy the
+host is. A second table times reply encoding alone: the old dict +
+json.dumps envelope against the byte templates.
+
+    CAMERA_MODEL=UVC_G4_DOME python test-dev/WSS-serve-loop-benchmark.py
+"""
+import gc
+import os
+import sys
+import json
+import time
+import statistics
+import asyncio
+import logging
+import tempfile
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "Unifi"))
+sys.path.append(ROOT)
+os.environ.setdefault("CAMERA_MODEL", "UVC_G4_DOME")
+os.environ.setdefault("FIRMWARE_API_URL", "http://127.0.0.1:9/graphql")   # keep the lookup offline
+
+from camera_data.camera_settings import CameraSettings  # noqa: E402
+from utils.json_codec import get_codec, orjson  # noqa: E402
+from Unifi.wss_frames import ReplyTemplates  # noqa: E402
+from Unifi.wss_manager import WssManager  # noqa: E402
+
+MESSAGES = 50_000
+ROUNDS = 7
+
+MIX = [
+    ("ubnt_avclient_timeSync", {}),
+    ("GetSystemStats", {}),
+    ("NetworkStatus", {}),
+    ("ubnt_avclient_paramAgreement", {"authToken": "x" * 32}),
+    ("ChangeOsdSettings", {"enableDate": 1, "enableLogo": 1, "tag": "Front door"}),
+    ("UpdateUsernamePassword", {"username": "ubnt", "password": "ubnt"}),
+]
+
+
+def _frames(n: int):
+    frames = []
+    for i in range(n):
+        fn, payload = MIX[i % len(MIX)]
+        frames.append(json.dumps({
+            "from": "UniFiVideo", "to": "ubnt_avclient", "functionName": fn,
+            "messageId": i + 1, "responseExpected": True, "payload": payload,
+        }))
+    return frames
+
+
+class MockSocket:
+    """Replays prepared frames and counts replies (websockets >= 14 send signature)."""
+
+    def __init__(self, frames, expected: int):
+        self._it = iter(frames)
+        self.expected = expected
+        self.replies = 0
+        self.bytes = 0
+        self.done = asyncio.Event()
+
+    async def send(self, message, *, text=None):
+        self.replies += 1
+        self.bytes += len(message)
+        if self.replies >= self.expected:
+            self.done.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            await self.done.wait()      # let queued handlers finish before the loop ends
+            raise StopAsyncIteration
+
+
+async def run_loop(mgr: WssManager, frames) -> float:
+    ws = MockSocket(frames, expected=len(frames) + 1)   # + hello
+    gc.collect()
+    gc.disable()
+    try:
+        t = time.perf_counter()
+        await mgr._serve_loop(ws)
+        secs = time.perf_counter() - t
+    finally:
+        gc.enable()
+    assert ws.replies == len(frames) + 1, ws.replies
+    return secs
+
+
+def bench_encode(codec_name: str):
+    codec = get_codec(codec_name)
+    frames = ReplyTemplates(codec)
+    ack = {"statusCode": 0, "status": "ok", "deviceID": "AABBCCDDEEFF"}
+    stats = {"cpu": 5, "memory": 20, "temperature": 45, "uptime": 12345}
+
+    def old(payload):
+        return json.dumps({"from": "ubnt_avclient", "to": "UniFiVideo", "functionName": "GetSystemStats",
+                           "messageId": 7, "inResponseTo": 9, "payload": payload}, separators=(",", ":"))
+
+    n = 200_000
+    rows = [
+        ("ack: dict + json.dumps", timeit.timeit(lambda: old(ack), number=n)),
+        ("ack: cached template", timeit.timeit(
+            lambda: frames.reply("UpdateUsernamePassword", 7, 9, frames.payload("ack", ack)), number=n)),
+        ("stats: dict + json.dumps", timeit.timeit(lambda: old(stats), number=n)),
+        ("stats: template + payload", timeit.timeit(
+            lambda: frames.reply("GetSystemStats", 7, 9, codec.dumps(stats)), number=n)),
+    ]
+    for label, secs in rows:
+        print(f"  {label:<28} {secs / n * 1e6:6.2f} us/reply")
+
+
+async def main():
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger("wss-bench")
+    tmp = tempfile.mkdtemp()
+    settings_file = os.path.join(tmp, "settings.json")
+    with open(settings_file, "w") as f:
+        json.dump({"mac": "aa:bb:cc:dd:ee:ff", "host": "127.0.0.1"}, f)
+    settings = CameraSettings(settings_file=settings_file)
+    frames = _frames(MESSAGES)
+
+    codecs = ["json"] + (["orjson"] if orjson is not None else [])
+    managers = {}
+    for name in codecs:
+        os.environ["JSON_CODEC"] = name
+        managers[name] = WssManager(settings, log)
+    os.environ.pop("JSON_CODEC", None)
+
+    for mgr in managers.values():
+        await run_loop(mgr, frames)                      # warm-up
+    times = {name: [] for name in codecs}
+    for _ in range(ROUNDS):
+        for name, mgr in managers.items():              # interleaved, so drift hits both
+            times[name].append(await run_loop(mgr, frames))
+
+    print(f"{MESSAGES:,} messages through _serve_loop ({ROUNDS} interleaved rounds)")
+    for name, secs in times.items():
+        print(f"  codec={name:<7} median {MESSAGES / statistics.median(secs):>8,.0f} msg/s, "
+              f"best {MESSAGES / min(secs):>8,.0f} msg/s")
+
+    for name in codecs:
+        print(f"reply encoding, codec={name}")
+        bench_encode(name)
+    settings.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())